@@ -48,18 +48,30 @@ def create_app() -> Flask:
         from .utils import get_csrf
         return {"get_csrf": get_csrf}
 
-    # データベース初期化
-    try:
-        from .utils import get_db
-        conn = get_db()
-        try:
-            conn.close()
-        except:
-            pass
+    # DBコネクションプール（リクエスト終了時に接続をプールへ返却）
+    from .utils import db_pool
+    db_pool.init_app(app)
+
+    # リクエストごとの計測（レイテンシ・クエリ数・DB/OpenAI の時間、/metrics で公開）
+    from .utils import metrics
+    metrics.init_app(app)
+
+    # データベース初期化（未適用のマイグレーションだけを起動時に1回適用）
+    # autocommit でない db_config の接続で適用し、失敗したマイグレーションはロールバックする
+    try:
+        from .migrations import run_migrations
+        run_migrations()
         print("✅ データベース初期化完了")
     except Exception as e:
         print(f"⚠️ データベース初期化エラー: {e}")
 
+    # サーバー側セッション（Cookie にはセッションIDだけを入れる、SESSION_BACKEND=cookie で従来どおり）
+    try:
+        from .utils import server_session
+        server_session.init_app(app)
+    except Exception as e:
+        print(f"⚠️ サーバー側セッション初期化エラー: {e}")
+
     # blueprints 登録
     try:
         from .blueprints.health import bp as health_bp
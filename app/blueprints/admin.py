@@ -6,6 +6,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from ..utils import require_roles, ROLES, get_db_connection
 from ..utils.db import _sql
+from ..utils.openai_clients import invalidate_openai_keys
+import store_db
 from werkzeug.security import generate_password_hash
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -107,6 +109,8 @@ def store_edit(store_id):
                     WHERE id = %s AND tenant_id = %s
                 '''), (name, slug, openai_api_key if openai_api_key else None, store_id, tenant_id))
                 conn.commit()
+                store_db.invalidate_store(store_id)
+                invalidate_openai_keys(store_id)
                 flash('店舗情報を更新しました', 'success')
                 conn.close()
                 return redirect(url_for('admin.store_info'))
@@ -146,6 +150,7 @@ def store_delete(store_id):
     else:
         cur.execute(_sql(conn, 'DELETE FROM "T_店舗" WHERE id = %s'), (store_id,))
         conn.commit()
+        store_db.invalidate_store(store_id)
         flash(f'{row[0]} を削除しました', 'success')
     
     conn.close()
@@ -1171,27 +1176,56 @@ def survey_results(store_id):
         'slug': store_row[2]
     }
     
-    # アンケート回答を取得（最新順）
-    cur.execute(_sql(conn, '''
-        SELECT 
-            id,
-            rating,
-            visit_purpose,
-            atmosphere,
-            recommend,
-            comment,
-            generated_review,
-            response_json,
-            created_at
+    # 統計情報は日別集計（T_アンケート集計_日別）を合計して取得（回答数ではなく日数に比例する）
+    stats = store_db.get_survey_stats(store_id)
+    rating_distribution = stats['rating_distribution']
+    total_responses = stats['total']
+    avg_rating = stats['average_rating']
+    
+    # アンケート回答を1ページ分だけ取得（(created_at, id) のキーセットページング、最新順）
+    per_page = _page_size(request.args.get('per_page'))
+    before = _decode_cursor(request.args.get('before'))
+    after = _decode_cursor(request.args.get('after'))
+    columns = '''
+        SELECT id, rating, visit_purpose, atmosphere, recommend, comment,
+               generated_review, response_json, created_at
         FROM "T_アンケート回答"
         WHERE store_id = %s
-        ORDER BY created_at DESC
-    '''), (store_id,))
+    '''
+    if after:
+        # 新しい方向へ戻る場合は昇順で取得して並べ替える
+        cur.execute(_sql(conn, columns + '''
+            AND (created_at, id) > (%s, %s)
+            ORDER BY created_at ASC, id ASC
+            LIMIT %s
+        '''), (store_id, after[0], after[1], per_page + 1))
+        rows = cur.fetchall()
+        has_newer = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_older = True
+    else:
+        if before:
+            cur.execute(_sql(conn, columns + '''
+                AND (created_at, id) < (%s, %s)
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            '''), (store_id, before[0], before[1], per_page + 1))
+        else:
+            cur.execute(_sql(conn, columns + '''
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            '''), (store_id, per_page + 1))
+        rows = cur.fetchall()
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_newer = before is not None
     
+    conn.close()
+    
+    # JSON のデコードは表示するページの行だけ
+    import json
     responses = []
-    for row in cur.fetchall():
-        import json
-        response_json = json.loads(row[7]) if row[7] else {}
+    for row in rows:
         responses.append({
             'id': row[0],
             'rating': row[1],
@@ -1200,24 +1234,51 @@ def survey_results(store_id):
             'recommend': row[4],
             'comment': row[5],
             'generated_review': row[6],
-            'response_json': response_json,
+            'response_json': json.loads(row[7]) if row[7] else {},
             'created_at': row[8]
         })
     
-    # 統計情報を計算
-    total_responses = len(responses)
-    avg_rating = sum(r['rating'] for r in responses) / total_responses if total_responses > 0 else 0
-    
-    # 評価分布
-    rating_distribution = {}
-    for i in range(1, 6):
-        rating_distribution[i] = sum(1 for r in responses if r['rating'] == i)
-    
-    conn.close()
+    older_cursor = _encode_cursor(rows[-1][8], rows[-1][0]) if rows and has_older else None
+    newer_cursor = _encode_cursor(rows[0][8], rows[0][0]) if rows and has_newer else None
     
     return render_template('admin_survey_results.html', 
                          store=store,
                          responses=responses,
                          total_responses=total_responses,
                          avg_rating=round(avg_rating, 2),
-                         rating_distribution=rating_distribution)
+                         rating_distribution=rating_distribution,
+                         per_page=per_page,
+                         page_sizes=SURVEY_PAGE_SIZES,
+                         older_cursor=older_cursor,
+                         newer_cursor=newer_cursor)
+
+
+# アンケート結果の1ページあたりの件数（選択肢）
+SURVEY_PAGE_SIZES = (20, 50, 100, 200)
+
+
+def _page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return 50
+    return max(1, min(size, SURVEY_PAGE_SIZES[-1]))
+
+
+def _encode_cursor(created_at, row_id):
+    """ページ位置 (created_at, id) を URL に載せる文字列にする"""
+    import base64
+    raw = f"{created_at}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(value):
+    """_encode_cursor の逆（不正な値は None）"""
+    if not value:
+        return None
+    import base64
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, int(row_id)
+    except Exception:
+        return None
@@ -1,4 +1,7 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, Response, abort, jsonify, current_app, request
+from ..utils.db_pool import pool_stats
+from ..utils.cache import cache_stats
+from ..utils import metrics
 
 bp = Blueprint("health", __name__)
 
@@ -12,4 +15,16 @@ def healthz():
         ok=True,
         env=current_app.config.get("ENVIRONMENT"),
         version=current_app.config.get("VERSION"),
+        db_pool=pool_stats(),
+        caches=cache_stats(),
     )
+
+@bp.get("/metrics")
+def metrics_endpoint():
+    """
+    リクエスト・DB・OpenAI の計測値を Prometheus テキスト形式で返します（このワーカーの値）。
+    METRICS_TOKEN が設定されていれば Bearer トークンが必要です。
+    """
+    if metrics.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        abort(401)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
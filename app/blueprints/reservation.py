@@ -3,19 +3,13 @@
 予約システム - 顧客向けBlueprint
 """
 from flask import Blueprint, render_template, request, jsonify, session
-from datetime import datetime, timedelta
-import secrets
 import store_db
 from db_config import get_db_connection, get_cursor, execute_query
+from ..utils.availability import load_availability, load_day_availability, date_range, parse_party_sizes
+from ..utils.booking import book_reservation, BookingUnavailable
 
 reservation_bp = Blueprint('reservation', __name__, url_prefix='/store/<store_slug>/reservation')
 
-def generate_reservation_number():
-    """予約番号を生成（例: RES20231221-ABC123）"""
-    date_str = datetime.now().strftime('%Y%m%d')
-    random_str = secrets.token_hex(3).upper()
-    return f"RES{date_str}-{random_str}"
-
 @reservation_bp.route('/')
 def index(store_slug):
     """予約フォーム表示"""
@@ -73,167 +67,40 @@ def check_availability(store_slug):
     if not store:
         return jsonify({'error': '店舗が見つかりません'}), 404
     
-    conn = get_db_connection()
-    cur = get_cursor(conn)
-    
-    # テーブル設定を取得
-    execute_query(cur, '''
-        SELECT * FROM "T_テーブル設定"
-        WHERE store_id = ? AND 有効 = 1 AND 座席数 >= ?
-        ORDER BY 座席数
-    ''', (store['id'], party_size))
-    available_tables = cur.fetchall()
-    
-    if not available_tables:
-        conn.close()
-        return jsonify({
-            'available': False,
-            'message': f'{party_size}名様のテーブルがありません'
-        })
-    
-    # 既存の予約を確認
-    execute_query(cur, '''
-        SELECT テーブル割当, COUNT(*) as count
-        FROM "T_予約"
-        WHERE store_id = ? 
-          AND 予約日 = ? 
-          AND 予約時刻 = ?
-          AND ステータス = 'confirmed'
-        GROUP BY テーブル割当
-    ''', (store['id'], reservation_date, reservation_time))
-    
-    reserved_tables = {}
-    for row in cur.fetchall():
-        if row['テーブル割当']:
-            reserved_tables[row['テーブル割当']] = row['count']
-    
-    conn.close()
-    
-    # 空席チェック
-    for table in available_tables:
-        table_name = table['テーブル名']
-        total_count = table['テーブル数']
-        reserved_count = reserved_tables.get(table_name, 0)
-        
-        if reserved_count < total_count:
-            return jsonify({
-                'available': True,
-                'table_type': table_name,
-                'seats': table['座席数'],
-                'available_count': total_count - reserved_count
-            })
-    
-    return jsonify({
-        'available': False,
-        'message': 'この時間帯は満席です'
-    })
+    day = load_day_availability(store['id'], reservation_date)
+    return jsonify(day.check(reservation_time, party_size))
 
 @reservation_bp.route('/api/time_slots', methods=['POST'])
 def get_time_slots(store_slug):
-    """指定日の予約可能時間枠を取得"""
+    """
+    指定日の予約可能時間枠を取得
+    days（先読みする日数）や party_sizes（人数の配列）を指定すると、
+    availability に {日付: {人数: 時間枠}} をまとめて返す（カレンダーの先読み用）
+    """
     data = request.get_json()
     reservation_date = data.get('date')
-    party_size = int(data.get('party_size', 1))
+    party_sizes = parse_party_sizes(data)
     
     # 店舗情報を取得
     store = store_db.get_store_by_slug(store_slug)
     if not store:
         return jsonify({'error': '店舗が見つかりません'}), 404
     
-    conn = get_db_connection()
-    cur = get_cursor(conn)
-    
-    # 予約設定を取得
-    execute_query(cur, '''
-        SELECT * FROM "T_店舗_予約設定"
-        WHERE store_id = ?
-    ''', (store['id'],))
-    settings = cur.fetchone()
-    
-    conn.close()
+    # 対象日の空席表を1回の読み込みで作り、すべての時間枠・人数に答える
+    dates = date_range(reservation_date, data.get('days', 1))
+    days = load_availability(store['id'], dates)
     
-    # デフォルト設定
-    if not settings:
-        settings = {
-            '営業開始時刻': '11:00',
-            '最終入店時刻': '21:00',
-            '予約単位_分': 30
+    result = {'time_slots': days[reservation_date].time_slots(party_sizes[0])}
+    if len(dates) > 1 or data.get('party_sizes'):
+        result['availability'] = {
+            d: {str(size): days[d].time_slots(size) for size in party_sizes}
+            for d in dates
         }
-    
-    # 時間枠を生成
-    start_time = datetime.strptime(settings['営業開始時刻'], '%H:%M')
-    end_time = datetime.strptime(settings['最終入店時刻'], '%H:%M')
-    interval = timedelta(minutes=settings['予約単位_分'])
-    
-    time_slots = []
-    current_time = start_time
-    
-    while current_time <= end_time:
-        time_str = current_time.strftime('%H:%M')
-        
-        # この時間枠の空席状況を確認
-        availability_check = check_availability_internal(
-            store['id'], 
-            reservation_date, 
-            time_str, 
-            party_size
-        )
-        
-        time_slots.append({
-            'time': time_str,
-            'available': availability_check['available'],
-            'display': current_time.strftime('%H:%M')
-        })
-        
-        current_time += interval
-    
-    return jsonify({'time_slots': time_slots})
+    return jsonify(result)
 
 def check_availability_internal(store_id, reservation_date, reservation_time, party_size):
     """内部用の空席確認関数"""
-    conn = get_db_connection()
-    cur = get_cursor(conn)
-    
-    # テーブル設定を取得
-    execute_query(cur, '''
-        SELECT * FROM "T_テーブル設定"
-        WHERE store_id = ? AND 有効 = 1 AND 座席数 >= ?
-        ORDER BY 座席数
-    ''', (store_id, party_size))
-    available_tables = cur.fetchall()
-    
-    if not available_tables:
-        conn.close()
-        return {'available': False}
-    
-    # 既存の予約を確認
-    execute_query(cur, '''
-        SELECT テーブル割当, COUNT(*) as count
-        FROM "T_予約"
-        WHERE store_id = ? 
-          AND 予約日 = ? 
-          AND 予約時刻 = ?
-          AND ステータス = 'confirmed'
-        GROUP BY テーブル割当
-    ''', (store_id, reservation_date, reservation_time))
-    
-    reserved_tables = {}
-    for row in cur.fetchall():
-        if row['テーブル割当']:
-            reserved_tables[row['テーブル割当']] = row['count']
-    
-    conn.close()
-    
-    # 空席チェック
-    for table in available_tables:
-        table_name = table['テーブル名']
-        total_count = table['テーブル数']
-        reserved_count = reserved_tables.get(table_name, 0)
-        
-        if reserved_count < total_count:
-            return {'available': True, 'table_type': table_name}
-    
-    return {'available': False}
+    return load_day_availability(store_id, reservation_date).check(reservation_time, party_size)
 
 @reservation_bp.route('/api/submit', methods=['POST'])
 def submit_reservation(store_slug):
@@ -259,47 +126,18 @@ def submit_reservation(store_slug):
     customer_email = data.get('email', '')
     notes = data.get('notes', '')
     
-    # 空席確認
-    availability = check_availability_internal(
-        store['id'], 
-        reservation_date, 
-        reservation_time, 
-        party_size
-    )
-    
-    if not availability['available']:
+    # 空席確認・テーブル割当・登録を1トランザクションで行う（同時予約でも超過しない）
+    try:
+        booking = book_reservation(store['id'], reservation_date, reservation_time, party_size, {
+            'name': customer_name,
+            'phone': customer_phone,
+            'email': customer_email,
+            'notes': notes,
+        })
+    except BookingUnavailable:
         return jsonify({'error': 'この時間帯は満席です'}), 400
-    
-    # 予約番号を生成
-    reservation_number = generate_reservation_number()
-    
-    # 予約を登録
-    conn = get_db_connection()
-    cur = get_cursor(conn)
-    
-    execute_query(cur, '''
-        INSERT INTO "T_予約" (
-            store_id, 予約番号, 予約日, 予約時刻, 人数,
-            顧客名, 顧客電話番号, 顧客メール, 特記事項,
-            ステータス, テーブル割当
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        store['id'],
-        reservation_number,
-        reservation_date,
-        reservation_time,
-        party_size,
-        customer_name,
-        customer_phone,
-        customer_email,
-        notes,
-        'confirmed',
-        availability.get('table_type')
-    ))
-    
-    conn.commit()
-    reservation_id = cur.lastrowid
-    conn.close()
+    reservation_number = booking['reservation_number']
+    reservation_id = booking['reservation_id']
     
     return jsonify({
         'success': True,
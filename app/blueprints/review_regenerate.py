@@ -3,13 +3,19 @@
 """
 from flask import Blueprint, request, jsonify, session, g
 from functools import wraps
+import logging
 import os
 import sys
 
 # store_dbをインポート
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import store_db
-from openai import OpenAI
+from ..utils.openai_clients import get_openai_client
+from ..utils.review_jobs import save_generated_review
+from ..utils.sse import sse_event, sse_response, iter_completion_text
+from ..utils.metrics import track_openai
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('review_regenerate', __name__)
 
@@ -47,66 +53,6 @@ def require_store(f):
     return decorated_function
 
 
-def get_openai_client(app_type='survey', app_id=None, store_id=None):
-    """
-    OpenAIクライアントを取得
-    優先順位: アプリ設定 > 店舗設定 > テナント設定
-    """
-    api_key = None
-    
-    # 1. アプリ設定からAPIキーを取得
-    if app_id:
-        try:
-            conn = store_db.get_db_connection()
-            cursor = store_db.get_cursor(conn)
-            from db_config import execute_query
-            execute_query(cursor, "SELECT openai_api_key FROM \"T_店舗_アンケート設定\" WHERE id = ?", (app_id,))
-            result = cursor.fetchone()
-            if result and result[0]:
-                api_key = result[0]
-            conn.close()
-        except Exception as e:
-            print(f"Error getting app API key: {e}")
-    
-    # 2. 店舗設定からAPIキーを取得
-    if not api_key and store_id:
-        try:
-            conn = store_db.get_db_connection()
-            cursor = store_db.get_cursor(conn)
-            from db_config import execute_query
-            execute_query(cursor, "SELECT openai_api_key FROM \"T_店舗\" WHERE id = ?", (store_id,))
-            result = cursor.fetchone()
-            if result and result[0]:
-                api_key = result[0]
-            conn.close()
-        except Exception as e:
-            print(f"Error getting store API key: {e}")
-    
-    # 3. テナント設定からAPIキーを取得
-    if not api_key and store_id:
-        try:
-            conn = store_db.get_db_connection()
-            cursor = store_db.get_cursor(conn)
-            from db_config import execute_query
-            execute_query(cursor, """
-                SELECT t.openai_api_key 
-                FROM "T_テナント" t
-                JOIN "T_店舗" s ON s.tenant_id = t.id
-                WHERE s.id = ?
-            """, (store_id,))
-            result = cursor.fetchone()
-            if result and result[0]:
-                api_key = result[0]
-            conn.close()
-        except Exception as e:
-            print(f"Error getting tenant API key: {e}")
-    
-    if not api_key:
-        raise ValueError("OpenAI APIキーが設定されていません。")
-    
-    return OpenAI(api_key=api_key, base_url='https://api.openai.com/v1')
-
-
 # テイスト別のプロンプト設定
 TASTE_PROMPTS = {
     'polite': {
@@ -167,34 +113,23 @@ TASTE_PROMPTS = {
 }
 
 
-def _generate_review_with_taste(survey_data, store_id, taste='balanced'):
+def _generate_review_with_taste(survey_data, store_id, taste='balanced', openai_client=None, raise_errors=False, stream=False):
     """
     アンケートデータからAIを使って口コミ投稿文を生成（テイスト指定可能）
+    openai_client: 省略時は設定されたAPIキーから取得
+    raise_errors: True なら失敗時に定型文を返さず例外を送出（ジョブの再試行用）
+    stream: True なら本文の断片を順に返すイテレータを返す（SSE 配信用）
     """
-    # アンケートアプリIDを取得
-    survey_app_id = None
-    try:
-        conn = store_db.get_db_connection()
-        cursor = store_db.get_cursor(conn)
-        from db_config import execute_query
-        execute_query(cursor, "SELECT id FROM \"T_店舗_アンケート設定\" WHERE store_id = ?", (store_id,))
-        result = cursor.fetchone()
-        if result:
-            survey_app_id = result[0]
-        conn.close()
-    except Exception as e:
-        print(f"Error getting survey app ID: {e}")
-    
-    # OpenAIクライアントを取得
-    try:
-        openai_client = get_openai_client(
-            app_type='survey',
-            app_id=survey_app_id,
-            store_id=store_id
-        )
-    except Exception as e:
-        print(f"Error getting OpenAI client: {e}")
-        return "口コミ投稿文の生成に失敗しました。"
+    if openai_client is None:
+        # OpenAIクライアントを取得
+        try:
+            # 店舗のアンケートアプリ設定 > 店舗 > テナントの順に解決（キャッシュ済みのクライアントを再利用）
+            openai_client = get_openai_client(app_type='survey', store_id=store_id)
+        except Exception as e:
+            logger.exception("Error getting OpenAI client: %s", e)
+            if raise_errors:
+                raise
+            return "口コミ投稿文の生成に失敗しました。"
     
     # アンケート設定を取得して質問文を取得
     survey_config = None
@@ -209,7 +144,7 @@ def _generate_review_with_taste(survey_data, store_id, taste='balanced'):
             survey_config = json.loads(result[0])
         conn.close()
     except Exception as e:
-        print(f"Error getting survey config: {e}")
+        logger.warning("Error getting survey config: %s", e)
     
     # アンケート回答を質問と結びつけて整形
     qa_pairs = []
@@ -270,10 +205,9 @@ def _generate_review_with_taste(survey_data, store_id, taste='balanced'):
 口コミ投稿文:"""
     
     try:
-        sys.stderr.write(f"DEBUG: 口コミ再生成 (taste={taste})\n")
-        sys.stderr.flush()
+        logger.debug("口コミ再生成 (taste=%s)", taste)
         
-        response = openai_client.chat.completions.create(
+        request_kwargs = dict(
             model="gpt-4.1-mini",
             messages=[
                 {"role": "system", "content": f"""あなたは実際の人間が書いたような自然な口コミ投稿文を作成する専門家です。
@@ -295,18 +229,22 @@ def _generate_review_with_taste(survey_data, store_id, taste='balanced'):
             max_tokens=500
         )
         
+        if stream:
+            # 完成した本文の保存は呼び出し側で行う
+            return iter_completion_text(openai_client, request_kwargs)
+        
+        with track_openai():
+            response = openai_client.chat.completions.create(**request_kwargs)
+        
         generated_text = response.choices[0].message.content.strip()
         
-        sys.stderr.write(f"DEBUG: 生成完了 (taste={taste}): {generated_text[:100]}...\n")
-        sys.stderr.flush()
+        logger.debug("生成完了 (taste=%s): %s...", taste, generated_text[:100])
         
         return generated_text
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        sys.stderr.write(f"ERROR: 口コミ生成失敗: {e}\n")
-        sys.stderr.write(f"Traceback:\n{error_details}\n")
-        sys.stderr.flush()
+        logger.exception("口コミ生成失敗: %s", e)
+        if raise_errors:
+            raise
         # デバッグ用に詳細なエラーを返す
         return f"口コミ投稿文の生成に失敗しました。エラー: {str(e)}"
 
@@ -314,10 +252,14 @@ def _generate_review_with_taste(survey_data, store_id, taste='balanced'):
 @bp.post("/store/<store_slug>/regenerate_review")
 @require_store
 def regenerate_review():
-    """口コミを再生成するAPIエンドポイント"""
+    """
+    口コミを再生成するAPIエンドポイント
+    {"stream": true} なら本文を SSE（token / done / error）で逐次返す
+    """
     try:
         data = request.get_json() or {}
         taste = data.get('taste', 'balanced')
+        response_id = session.get(f'survey_response_id_{g.store_id}')
         
         # アンケート回答をセッションから取得
         survey_data = session.get(f'survey_data_{g.store_id}')
@@ -328,11 +270,16 @@ def regenerate_review():
                 "error": "アンケートデータが見つかりません。再度アンケートを送信してください。"
             }), 404
         
+        if data.get('stream'):
+            return _regenerate_stream(survey_data, g.store_id, taste, response_id)
+        
         # 口コミを再生成
         generated_review = _generate_review_with_taste(survey_data, g.store_id, taste)
         
-        # セッションに保存
+        # セッションと回答データに保存
         session[f'generated_review_{g.store_id}'] = generated_review
+        if response_id:
+            save_generated_review(response_id, generated_review)
         
         return jsonify({
             "ok": True,
@@ -341,11 +288,32 @@ def regenerate_review():
         })
         
     except Exception as e:
-        sys.stderr.write(f"ERROR regenerate_review: {e}\n")
-        import traceback
-        sys.stderr.write(traceback.format_exc())
-        sys.stderr.flush()
+        logger.exception("regenerate_review: %s", e)
         return jsonify({
             "ok": False,
             "error": str(e)
         }), 500
+
+
+def _regenerate_stream(survey_data, store_id, taste, response_id):
+    """再生成の本文を SSE で配信し、完成文を T_アンケート回答 に保存する"""
+    # 接続前に失敗（APIキー未設定など）した場合はここで例外になり、通常のエラー応答になる
+    deltas = _generate_review_with_taste(survey_data, store_id, taste, raise_errors=True, stream=True)
+    
+    def events():
+        parts = []
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except Exception as e:
+            logger.error("regenerate_review (stream): %s", e)
+            yield sse_event("error", {"error": str(e)})
+            return
+        generated_review = "".join(parts).strip()
+        # ストリーム開始後はセッションを更新できないため、回答データを正とする
+        if response_id:
+            save_generated_review(response_id, generated_review)
+        yield sse_event("done", {"generated_review": generated_review, "taste": taste})
+    
+    return sse_response(events())
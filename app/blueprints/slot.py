@@ -4,18 +4,24 @@
 """
 from flask import Blueprint, jsonify, request, render_template, session, redirect, url_for
 from dataclasses import asdict
+import logging
 import os
 import time
-import random
-from ..models import Symbol, Config
-from ..utils.config import load_config, save_config
-from ..utils.slot_logic import (
-    choice_by_prob,
-    recalc_probs_inverse_and_expected,
-    prob_total_ge,
-    prob_total_le
+from ..models import Symbol
+from ..utils.config import load_config, save_config, load_settings, SETTINGS_PATH
+from ..utils import slot_engine, prize_table
+from ..utils.slot_engine import get_global_engine
+from ..utils.slot_logic import recalc_probs_inverse_and_expected
+from ..utils.payout_dist import (
+    DistributionTooLarge,
+    get_distribution,
+    get_store_distribution,
+    symbols_with_miss,
+    prize_odds
 )
 
+logger = logging.getLogger(__name__)
+
 bp = Blueprint('slot', __name__, url_prefix='')
 
 # パス設定
@@ -27,25 +33,18 @@ DATA_DIR = os.path.join(APP_DIR, "data")
 def slot_page():
     """スロットページ"""
     import store_db
-    import sys
     
     # store_slugからstore_idを取得
     store_slug = request.args.get('store_slug')
-    sys.stderr.write(f"DEBUG slot_page: store_slug={store_slug}\n")
-    sys.stderr.flush()
+    logger.debug("slot_page: store_slug=%s", store_slug)
     store_id = None
     if store_slug:
         try:
-            from app.utils.db import _sql
-            conn = store_db.get_db_connection()
-            cursor = store_db.get_cursor(conn)
-            cursor.execute(_sql(conn, 'SELECT id FROM "T_店舗" WHERE slug = %s'), (store_slug,))
-            result = cursor.fetchone()
-            if result:
-                store_id = result[0]
-            conn.close()
+            store = store_db.resolve_store(store_slug)
+            if store:
+                store_id = store['id']
         except Exception as e:
-            print(f"Error getting store_id: {e}")
+            logger.warning("Error getting store_id: %s", e)
     
     # アンケート未回答の場合はアンケートページへリダイレクト
     # セッションキーは survey_completed_{store_id} 形式
@@ -55,9 +54,7 @@ def slot_page():
             return redirect(url_for('survey.survey', store_slug=store_slug))
         return redirect('/')  # store_slugがない場合はトップへ
     
-    # 設定ファイルからメッセージと景品データを読み込み
-    import json
-    settings_path = os.path.join(DATA_DIR, "settings.json")
+    # 設定ファイルからメッセージと景品データを読み込み（変更がなければキャッシュ）
     survey_complete_message = "アンケートにご協力いただきありがとうございます！スロットをお楽しみください。"
     prizes = []
     slot_spin_count = 1  # デフォルト値
@@ -67,23 +64,22 @@ def slot_page():
         try:
             from app.utils.db import _sql
             conn = store_db.get_db_connection()
-            cursor = store_db.get_cursor(conn)
-            cursor.execute(_sql(conn, 'SELECT slot_spin_count FROM "T_店舗_Google設定" WHERE store_id = %s'), (store_id,))
-            result = cursor.fetchone()
-            if result and result[0]:
-                slot_spin_count = result[0]
-            conn.close()
+            try:
+                cursor = store_db.get_cursor(conn)
+                cursor.execute(_sql(conn, 'SELECT slot_spin_count FROM "T_店舗_Google設定" WHERE store_id = %s'), (store_id,))
+                result = cursor.fetchone()
+                if result and result[0]:
+                    slot_spin_count = result[0]
+            finally:
+                conn.close()
         except Exception as e:
-            print(f"Error getting slot_spin_count: {e}")
+            logger.warning("Error getting slot_spin_count: %s", e)
     
-    if os.path.exists(settings_path):
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
-            survey_complete_message = settings.get("survey_complete_message", survey_complete_message)
-            prizes = settings.get("prizes", [])
+    settings = load_settings()
+    survey_complete_message = settings.get("survey_complete_message", survey_complete_message)
+    prizes = settings.get("prizes", [])
     
-    sys.stderr.write(f"DEBUG slot_page: rendering with store_slug={store_slug}, slot_spin_count={slot_spin_count}\n")
-    sys.stderr.flush()
+    logger.debug("slot_page: rendering with store_slug=%s, slot_spin_count=%s", store_slug, slot_spin_count)
     return render_template('slot.html', survey_complete_message=survey_complete_message, prizes=prizes, store_slug=store_slug, slot_spin_count=slot_spin_count)
 
 
@@ -91,7 +87,6 @@ def slot_page():
 def slot_result_page(slug):
     """スロット結果表示ページ"""
     import store_db
-    import sys
     
     # セッションから結果データを取得
     total_score = session.get('slot_total_score', 0)
@@ -100,38 +95,12 @@ def slot_result_page(slug):
     set_scores = session.get('slot_set_scores', [])
     
     # store_slugからstore情報を取得（有効フラグをチェックしない）
-    from db_config import get_db_connection, get_cursor, execute_query
-    conn = get_db_connection()
-    cur = get_cursor(conn)
-    execute_query(cur, """
-        SELECT id, tenant_id, 名称 as name, slug, 有効 as active
-        FROM "T_店舗"
-        WHERE slug = ?
-    """, (slug,))
-    row = cur.fetchone()
-    conn.close()
-    
-    store = None
-    if row:
-        # SQLite Rowオブジェクトを辞書に変換
-        if hasattr(row, 'keys'):
-            store = {key: row[key] for key in row.keys()}
-        else:
-            # タプルの場合（フォールバック）
-            store = {
-                'id': row[0],
-                'tenant_id': row[1],
-                'name': row[2],
-                'slug': row[3],
-                'active': row[4]
-            }
+    store = store_db.resolve_store(slug)
     
     if store:
-        sys.stderr.write(f"DEBUG: Store found - id: {store['id']}, name: {store['name']}, slug: {store['slug']}\n")
-        sys.stderr.flush()
+        logger.debug("Store found - id: %s, name: %s, slug: %s", store['id'], store['name'], store['slug'])
     else:
-        sys.stderr.write(f"DEBUG: No store found for slug: {slug}\n")
-        sys.stderr.flush()
+        logger.debug("No store found for slug: %s", slug)
     
     # 結果データをクリア
     session.pop('slot_total_score', None)
@@ -140,8 +109,7 @@ def slot_result_page(slug):
     session.pop('slot_set_scores', None)
     
     if not store:
-        sys.stderr.write(f"ERROR: Store not found for slug '{slug}', redirecting to 404\n")
-        sys.stderr.flush()
+        logger.warning("Store not found for slug '%s', redirecting to 404", slug)
         return f"店舗が見つかりません (slug: {slug})", 404
     
     # Google口コミURLを取得
@@ -184,28 +152,21 @@ def slot_result_page(slug):
 def slot_page_with_slug(slug):
     """店舗別スロットページ (デモプレイ用)"""
     import store_db
-    import sys
     import json
     
     # demoパラメータを確認
     is_demo = request.args.get('demo', '').lower() == 'true'
     
-    sys.stderr.write(f"DEBUG slot_page_with_slug: slug={slug}, is_demo={is_demo}\n")
-    sys.stderr.flush()
+    logger.debug("slot_page_with_slug: slug=%s, is_demo=%s", slug, is_demo)
     
     # store_slugからstore_idを取得
     store_id = None
     try:
-        conn = store_db.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT "id" FROM "T_店舗" WHERE "slug" = %s', (slug,))
-        result = cursor.fetchone()
-        if result:
-            store_id = result[0]
-        conn.close()
+        store = store_db.resolve_store(slug)
+        if store:
+            store_id = store['id']
     except Exception as e:
-        sys.stderr.write(f"Error getting store_id: {e}\n")
-        sys.stderr.flush()
+        logger.error("Error getting store_id: %s", e)
     
     # デモモードの場合はアンケートチェックをスキップ
     if not is_demo:
@@ -237,8 +198,7 @@ def slot_page_with_slug(slug):
             
             if prizes_row and prizes_row[0]:
                 prizes = json.loads(prizes_row[0])
-                sys.stderr.write(f"DEBUG: Loaded prizes from DB: {prizes}\n")
-                sys.stderr.flush()
+                logger.debug("Loaded prizes from DB: %s", prizes)
             else:
                 # デフォルトの景品設定
                 prizes = [
@@ -252,8 +212,7 @@ def slot_page_with_slug(slug):
             
             conn.close()
         except Exception as e:
-            sys.stderr.write(f"Error loading prizes from DB: {e}\n")
-            sys.stderr.flush()
+            logger.error("Error loading prizes from DB: %s", e)
             # エラー時はデフォルトの景品設定を使用
             prizes = [
                 {"min_score": 500, "rank": "🏆 特賞", "name": "コース料理・ドリンク飲み放題"},
@@ -264,8 +223,7 @@ def slot_page_with_slug(slug):
                 {"min_score": 0, "max_score": 49, "rank": "🏆 5等", "name": "ドリンクまたはアイス"}
             ]
     
-    sys.stderr.write(f"DEBUG slot_page_with_slug: rendering with slug={slug}, slot_spin_count={slot_spin_count}\n")
-    sys.stderr.flush()
+    logger.debug("slot_page_with_slug: rendering with slug=%s, slot_spin_count=%s", slug, slot_spin_count)
     return render_template('slot.html', survey_complete_message=survey_complete_message, prizes=prizes, store_slug=slug, is_demo=is_demo, slot_spin_count=slot_spin_count)
 
 @bp.get("/config")
@@ -309,102 +267,19 @@ def spin():
     from prize_logic import get_prize_for_score
     import copy
     
-    cfg = load_config()
-    
-    # 確率の正規化
-    psum = sum(float(s.prob) for s in cfg.symbols) or 100.0
-    for s in cfg.symbols:
-        s.prob = float(s.prob) / psum * 100.0
+    engine = get_global_engine()
     
-    spins = []
-    total_payout = 0.0
-    miss_rate = cfg.miss_probability / 100.0
-    
-    # 通常シンボルとリーチ専用シンボルを分類
-    normal_symbols = [s for s in cfg.symbols if not (hasattr(s, 'is_reach') and s.is_reach)]
-    reach_symbols = [s for s in cfg.symbols if hasattr(s, 'is_reach') and s.is_reach]
-    
-    # 5回スピン
-    for _ in range(5):
-        # まずハズレかどうかを判定
-        if random.random() < miss_rate:
-            # ハズレ：1コマ目と2コマ目は必ず異なるシンボル
-            reel1 = random.choice(normal_symbols)
-            # reel2はreel1と異なるものを選ぶ
-            other_symbols = [s for s in normal_symbols if s.id != reel1.id]
-            if other_symbols:
-                reel2 = random.choice(other_symbols)
-            else:
-                reel2 = reel1  # シンボルが1つしかない場合
-            reel3 = random.choice(normal_symbols)
-            
-            spins.append({
-                "reels": [
-                    {"id": reel1.id, "label": reel1.label, "color": reel1.color},
-                    {"id": reel2.id, "label": reel2.label, "color": reel2.color},
-                    {"id": reel3.id, "label": reel3.label, "color": reel3.color}
-                ],
-                "matched": False,
-                "is_reach": False,
-                "payout": 0
-            })
-        else:
-            # 当たりまたはリーチハズレ：シンボルを確率で抽選
-            symbol = choice_by_prob(cfg.symbols)
-            
-            # リーチ専用シンボルの場合
-            is_reach_symbol = hasattr(symbol, 'is_reach') and symbol.is_reach
-            
-            if is_reach_symbol:
-                # リーチハズレ：1,2コマ目は同じ、3コマ目は必ず異なる
-                reach_symbol_id = symbol.reach_symbol if hasattr(symbol, 'reach_symbol') else symbol.id
-                # 元のシンボルを探す
-                original_symbol = next((s for s in normal_symbols if s.id == reach_symbol_id), symbol)
-                
-                # リール3用に異なるシンボルを選ぶ（リーチ専用シンボルも除外）
-                other_symbols = [s for s in normal_symbols if s.id != reach_symbol_id]
-                if other_symbols:
-                    reel3_symbol = random.choice(other_symbols)
-                else:
-                    reel3_symbol = original_symbol
-                
-                spins.append({
-                    "reels": [
-                        {"id": original_symbol.id, "label": original_symbol.label, "color": original_symbol.color},
-                        {"id": original_symbol.id, "label": original_symbol.label, "color": original_symbol.color},
-                        {"id": reel3_symbol.id, "label": reel3_symbol.label, "color": reel3_symbol.color}
-                    ],
-                    "matched": False,
-                    "is_reach": True,
-                    "reach_symbol": {"id": original_symbol.id, "label": original_symbol.label, "color": original_symbol.color},
-                    "payout": 0
-                })
-            else:
-                # 通常の当たり：3つ揃い
-                payout = symbol.payout_3
-                total_payout += payout
-                
-                spins.append({
-                    "reels": [
-                        {"id": symbol.id, "label": symbol.label, "color": symbol.color},
-                        {"id": symbol.id, "label": symbol.label, "color": symbol.color},
-                        {"id": symbol.id, "label": symbol.label, "color": symbol.color}
-                    ],
-                    "matched": True,
-                    "is_reach": False,
-                    "symbol": {"id": symbol.id, "label": symbol.label, "color": symbol.color},
-                    "payout": payout
-                })
+    # 5回スピン（抽選テーブルはコンパイル済み）
+    spins, total_payout = engine.spin(5)
     
     # 景品判定
-    settings_path = os.path.join(DATA_DIR, "settings.json")
-    prize = get_prize_for_score(int(total_payout), settings_path)
+    prize = get_prize_for_score(int(total_payout), SETTINGS_PATH)
     
     result = {
         "ok": True, 
         "spins": spins, 
         "total_payout": total_payout,
-        "expected_total_5": cfg.expected_total_5, 
+        "expected_total_5": engine.expected_total_5, 
         "ts": int(time.time())
     }
     
@@ -414,21 +289,16 @@ def spin():
     return jsonify(result)
 
 
-@bp.post("/calc_prob")
-def calc_prob():
+def _parse_threshold_max(value):
+    """threshold_max / max_score の None・空文字は上限なし"""
+    return None if value in (None, "", "null") else float(value)
+
+
+def _symbols_with_miss(body):
     """
-    確率計算
-    body: {"threshold_min":200, "threshold_max":500, "spins":5}
-    - threshold_maxがNoneまたは未指定なら上限なし（∞）
+    確率計算用のシンボル一覧（ハズレ＝0点を含み、合計100%に正規化済み）
+    リクエストボディにsymbolsが含まれている場合はそれを使用し、なければ共通設定を使う
     """
-    body = request.get_json(silent=True) or {}
-    tmin = float(body.get("threshold_min", 0))
-    tmax = body.get("threshold_max")
-    tmax = None if tmax in (None, "", "null") else float(tmax)
-    spins = int(body.get("spins", 5))
-    spins = max(1, spins)
-
-    # リクエストボディにsymbolsが含まれている場合はそれを使用
     if "symbols" in body and body["symbols"]:
         symbols_data = body["symbols"]
         symbols = [Symbol(
@@ -445,27 +315,29 @@ def calc_prob():
         symbols = list(cfg.symbols)
         miss_rate = cfg.miss_probability
     
-    # ハズレ確率を考慮するため、ハズレ（0点）をシンボルリストに追加
-    symbols_with_miss = list(symbols)
-    
-    # ハズレシンボルを追加
-    miss_symbol = Symbol(
-        id="miss",
-        label="ハズレ",
-        payout_3=0.0,
-        prob=miss_rate,
-        color="#000000"
-    )
-    symbols_with_miss.append(miss_symbol)
-    
-    # 確率を正規化（ハズレ確率 + シンボル確率の合計 = 100%）
-    psum = sum(float(s.prob) for s in symbols_with_miss)
-    for s in symbols_with_miss:
-        s.prob = float(s.prob) * 100.0 / psum
+    # ハズレ確率を考慮するため、ハズレ（0点）をシンボルリストに追加して正規化
+    return symbols_with_miss(symbols, miss_rate)
 
-    prob_ge = prob_total_ge(symbols_with_miss, spins, tmin)
-    prob_le = 1.0 if tmax is None else prob_total_le(symbols_with_miss, spins, tmax)
-    prob_range = max(0.0, prob_le - (1.0 - prob_ge))
+
+@bp.post("/calc_prob")
+def calc_prob():
+    """
+    確率計算
+    body: {"threshold_min":200, "threshold_max":500, "spins":5}
+    - threshold_maxがNoneまたは未指定なら上限なし（∞）
+    """
+    body = request.get_json(silent=True) or {}
+    tmin = float(body.get("threshold_min", 0))
+    tmax = _parse_threshold_max(body.get("threshold_max"))
+    spins = int(body.get("spins", 5))
+    spins = max(1, spins)
+
+    # 合計配当の分布は設定ごとに一度だけ計算（GE/LE で共有）
+    try:
+        dist = get_distribution(_symbols_with_miss(body), spins)
+    except DistributionTooLarge as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    prob_ge, prob_le, prob_range = dist.prob_range(tmin, tmax)
 
     return jsonify({
         "ok": True,
@@ -478,45 +350,71 @@ def calc_prob():
     })
 
 
+@bp.post("/calc_prob_batch")
+def calc_prob_batch():
+    """
+    複数の点数範囲の確率をまとめて計算
+    body: {"spins":5, "ranges":[{"threshold_min":200, "threshold_max":499}, ...]}
+    - ranges を省略した場合は settings.json の景品（min_score / max_score）ごとに計算
+    - symbols / miss_probability の扱いは /calc_prob と同じ
+    """
+    body = request.get_json(silent=True) or {}
+    spins = max(1, int(body.get("spins", 5)))
+
+    ranges = body.get("ranges")
+    if ranges is None:
+        prizes = load_settings().get("prizes", [])
+        ranges = [{
+            "threshold_min": p.get("min_score", 0),
+            "threshold_max": p.get("max_score"),
+            "rank": p.get("rank"),
+            "name": p.get("name"),
+        } for p in prizes]
+    if not isinstance(ranges, list):
+        return jsonify({"ok": False, "error": "rangesは配列で送信してください"}), 400
+
+    try:
+        dist = get_distribution(_symbols_with_miss(body), spins)
+    except DistributionTooLarge as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    results = []
+    for r in ranges:
+        tmin = float(r.get("threshold_min", 0))
+        tmax = _parse_threshold_max(r.get("threshold_max"))
+        prob_ge, prob_le, prob_range = dist.prob_range(tmin, tmax)
+        item = {
+            "prob_ge": prob_ge,
+            "prob_le": prob_le,
+            "prob_range": prob_range,
+            "tmin": tmin,
+            "tmax": tmax,
+        }
+        for k in ("rank", "name"):
+            if r.get(k) is not None:
+                item[k] = r[k]
+        results.append(item)
+
+    return jsonify({"ok": True, "spins": spins, "results": results})
+
+
 # 店舗別ルート（デモプレイ用）
 @bp.get("/store/<slug>/config")
 def get_config_with_slug(slug):
     """店舗別スロット設定を取得"""
     import store_db
-    import sys
     
     # store_slugからstore_idを取得
     store_id = None
     try:
-        conn = store_db.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT "id" FROM "T_店舗" WHERE "slug" = %s', (slug,))
-        result = cursor.fetchone()
-        if result:
-            store_id = result[0]
-        conn.close()
+        store = store_db.resolve_store(slug)
+        if store:
+            store_id = store['id']
     except Exception as e:
-        sys.stderr.write(f"Error getting store_id: {e}\n")
-        sys.stderr.flush()
+        logger.error("Error getting store_id: %s", e)
     
-    # 店舗固有のスロット設定をデータベースから読み込む
+    # 店舗固有のスロット設定（コンパイル済みエンジンが保持する元の設定）
     if store_id:
-        config_dict = store_db.get_slot_config(store_id)
-        sys.stderr.write(f"DEBUG: Loaded slot config from DB for store_id={store_id}\n")
-        sys.stderr.flush()
-        
-        # Configオブジェクトに変換
-        from ..models import Config, Symbol
-        # Symbolクラスに定義されているフィールドのみを抽出
-        symbol_fields = {'id', 'label', 'payout_3', 'color', 'prob', 'is_reach', 'reach_symbol'}
-        symbols = [Symbol(**{k: v for k, v in s.items() if k in symbol_fields}) for s in config_dict.get('symbols', [])]
-        cfg = Config(
-            symbols=symbols,
-            reels=config_dict.get('reels', 3),
-            base_bet=config_dict.get('base_bet', 1),
-            expected_total_5=config_dict.get('expected_total_5', 100.0),
-            miss_probability=config_dict.get('miss_probability', 0.0)
-        )
+        cfg = slot_engine.get_store_engine(store_id).config
     else:
         # 店舗IDが取得できない場合はデフォルト設定を使用
         cfg = load_config()
@@ -533,182 +431,39 @@ def get_config_with_slug(slug):
 def spin_with_slug(slug):
     """店舗別スロット実行"""
     import store_db
-    import sys
-    import json
-    import copy
     
     # store_slugからstore_idを取得
     store_id = None
     try:
-        conn = store_db.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT "id" FROM "T_店舗" WHERE "slug" = %s', (slug,))
-        result = cursor.fetchone()
-        if result:
-            store_id = result[0]
-        conn.close()
+        store = store_db.resolve_store(slug)
+        if store:
+            store_id = store['id']
     except Exception as e:
-        sys.stderr.write(f"Error getting store_id: {e}\n")
-        sys.stderr.flush()
+        logger.error("Error getting store_id: %s", e)
     
-    # 店舗固有のスロット設定をデータベースから読み込む
+    # 店舗固有のコンパイル済みスロット（設定更新時のみ再構築）
     if store_id:
-        config_dict = store_db.get_slot_config(store_id)
-        sys.stderr.write(f"DEBUG: Loaded slot config from DB for store_id={store_id}: {config_dict}\n")
-        sys.stderr.flush()
-        
-        # Configオブジェクトに変換
-        from ..models import Config, Symbol
-        # Symbolクラスに定義されているフィールドのみを抽出
-        symbol_fields = {'id', 'label', 'payout_3', 'color', 'prob', 'is_reach', 'reach_symbol'}
-        symbols = [Symbol(**{k: v for k, v in s.items() if k in symbol_fields}) for s in config_dict.get('symbols', [])]
-        cfg = Config(
-            symbols=symbols,
-            reels=config_dict.get('reels', 3),
-            base_bet=config_dict.get('base_bet', 1),
-            expected_total_5=config_dict.get('expected_total_5', 100.0),
-            miss_probability=config_dict.get('miss_probability', 0.0)
-        )
+        engine = slot_engine.get_store_engine(store_id)
     else:
         # 店舗IDが取得できない場合はデフォルト設定を使用
-        cfg = load_config()
-    
-    # 確率の正規化
-    psum = sum(float(s.prob) for s in cfg.symbols) or 100.0
-    for s in cfg.symbols:
-        s.prob = float(s.prob) / psum * 100.0
-    
-    spins = []
-    total_payout = 0.0
-    miss_rate = cfg.miss_probability / 100.0
-    
-    # 通常シンボルとリーチ専用シンボルを分類
-    normal_symbols = [s for s in cfg.symbols if not (hasattr(s, 'is_reach') and s.is_reach)]
-    reach_symbols = [s for s in cfg.symbols if hasattr(s, 'is_reach') and s.is_reach]
+        engine = slot_engine.get_global_engine()
     
     # 5回スピン
-    for _ in range(5):
-        # まずハズレかどうかを判定
-        if random.random() < miss_rate:
-            # ハズレ：1コマ目と2コマ目は必ず異なるシンボル
-            reel1 = random.choice(normal_symbols)
-            # reel2はreel1と異なるものを選ぶ
-            other_symbols = [s for s in normal_symbols if s.id != reel1.id]
-            if other_symbols:
-                reel2 = random.choice(other_symbols)
-            else:
-                reel2 = reel1  # シンボルが1つしかない場合
-            reel3 = random.choice(normal_symbols)
-            
-            spins.append({
-                "reels": [
-                    {"id": reel1.id, "label": reel1.label, "color": reel1.color},
-                    {"id": reel2.id, "label": reel2.label, "color": reel2.color},
-                    {"id": reel3.id, "label": reel3.label, "color": reel3.color}
-                ],
-                "matched": False,
-                "is_reach": False,
-                "payout": 0
-            })
-        else:
-            # 当たりまたはリーチハズレ：シンボルを確率で抽選
-            symbol = choice_by_prob(cfg.symbols)
-            
-            # リーチ専用シンボルの場合
-            is_reach_symbol = hasattr(symbol, 'is_reach') and symbol.is_reach
-            
-            if is_reach_symbol:
-                # リーチハズレ：1,2コマ目は同じ、3コマ目は必ず異なる
-                reach_symbol_id = symbol.reach_symbol if hasattr(symbol, 'reach_symbol') else symbol.id
-                # 元のシンボルを探す
-                original_symbol = next((s for s in normal_symbols if s.id == reach_symbol_id), symbol)
-                
-                # リール3用に異なるシンボルを選ぶ（リーチ専用シンボルも除外）
-                other_symbols = [s for s in normal_symbols if s.id != reach_symbol_id]
-                if other_symbols:
-                    reel3_symbol = random.choice(other_symbols)
-                else:
-                    reel3_symbol = original_symbol
-                
-                spins.append({
-                    "reels": [
-                        {"id": original_symbol.id, "label": original_symbol.label, "color": original_symbol.color},
-                        {"id": original_symbol.id, "label": original_symbol.label, "color": original_symbol.color},
-                        {"id": reel3_symbol.id, "label": reel3_symbol.label, "color": reel3_symbol.color}
-                    ],
-                    "matched": False,
-                    "is_reach": True,
-                    "reach_symbol": {"id": original_symbol.id, "label": original_symbol.label, "color": original_symbol.color},
-                    "payout": 0
-                })
-            else:
-                # 通常の当たり：3つ揃い
-                payout = symbol.payout_3
-                total_payout += payout
-                
-                spins.append({
-                    "reels": [
-                        {"id": symbol.id, "label": symbol.label, "color": symbol.color},
-                        {"id": symbol.id, "label": symbol.label, "color": symbol.color},
-                        {"id": symbol.id, "label": symbol.label, "color": symbol.color}
-                    ],
-                    "matched": True,
-                    "is_reach": False,
-                    "symbol": {"id": symbol.id, "label": symbol.label, "color": symbol.color},
-                    "payout": payout
-                })
-    
-    # 店舗固有の景品設定をデータベースから読み込んで景品判定
+    spins, total_payout = engine.spin(5)
+    
+    # 店舗固有の景品判定（コンパイル済みの判定表を二分探索、設定更新時のみ再構築）
     prize = None
-    try:
-        # store_slugからstore_idを取得
-        conn = store_db.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT "id" FROM "T_店舗" WHERE "slug" = %s', (slug,))
-        result = cursor.fetchone()
-        
-        if result:
-            store_id = result[0]
-            
-            # 景品設定を取得
-            cursor.execute('SELECT prizes_json FROM "T_店舗_景品設定" WHERE store_id = %s', (store_id,))
-            prizes_row = cursor.fetchone()
-            
-            if prizes_row and prizes_row[0]:
-                prizes = json.loads(prizes_row[0])
-                
-                # 点数範囲に該当する景品を探す
-                for p in prizes:
-                    min_score = p["min_score"]
-                    max_score = p.get("max_score")
-                    
-                    # max_scoreがNoneの場合は上限なし
-                    if max_score is None:
-                        if total_payout >= min_score:
-                            prize = {
-                                "rank": p["rank"],
-                                "name": p["name"]
-                            }
-                            break
-                    else:
-                        # min_score <= total_payout <= max_scoreの範囲内か確認
-                        if min_score <= total_payout <= max_score:
-                            prize = {
-                                "rank": p["rank"],
-                                "name": p["name"]
-                            }
-                            break
-        
-        conn.close()
-    except Exception as e:
-        sys.stderr.write(f"Error loading prizes for spin: {e}\n")
-        sys.stderr.flush()
+    if store_id:
+        try:
+            prize = prize_table.get_store_prize_table(store_id).lookup(total_payout)
+        except Exception as e:
+            logger.error("Error loading prizes for spin: %s", e)
     
     result = {
         "ok": True, 
         "spins": spins, 
         "total_payout": total_payout,
-        "expected_total_5": cfg.expected_total_5, 
+        "expected_total_5": engine.expected_total_5, 
         "ts": int(time.time())
     }
     
@@ -720,15 +475,45 @@ def spin_with_slug(slug):
 
 @bp.post("/store/<slug>/calc_prob")
 def calc_prob_with_slug(slug):
-    """店舗別確率計算"""
-    # 既存の calc_prob() 関数と同じロジックを使用
-    return calc_prob()
+    """
+    店舗別確率計算
+    店舗のスロット設定（DB）で threshold_min〜threshold_max の確率を計算し、
+    あわせて T_店舗_景品設定 の全景品の当選確率を "prizes" で返す
+    """
+    import store_db
+    
+    body = request.get_json(silent=True) or {}
+    store = store_db.resolve_store(slug)
+    if not store or body.get("symbols"):
+        # 店舗が見つからない場合や未保存のシンボルで試算する場合は共通ロジック
+        return calc_prob()
+    
+    tmin = float(body.get("threshold_min", 0))
+    tmax = _parse_threshold_max(body.get("threshold_max"))
+    spins = max(1, int(body.get("spins", 5)))
+    
+    # 設定ハッシュごとにキャッシュされた分布から引く
+    try:
+        dist = get_store_distribution(store['id'], spins)
+    except DistributionTooLarge as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    prob_ge, prob_le, prob_range = dist.prob_range(tmin, tmax)
+    
+    return jsonify({
+        "ok": True,
+        "prob_ge": prob_ge,
+        "prob_le": prob_le,
+        "prob_range": prob_range,
+        "tmin": tmin,
+        "tmax": tmax,
+        "spins": spins,
+        "prizes": prize_odds(dist, store_db.get_prizes_config(store['id']))
+    })
 
 
 @bp.post("/store/<slug>/slot/save_result")
 def save_slot_result(slug):
     """スロット結果をセッションに保存"""
-    import sys
     
     try:
         data = request.get_json()
@@ -743,11 +528,9 @@ def save_slot_result(slug):
         session['slot_history'] = history
         session['slot_set_scores'] = set_scores
         
-        sys.stderr.write(f"DEBUG: Saved slot result - score: {total_score}, prize: {prize}\n")
-        sys.stderr.flush()
+        logger.debug("Saved slot result - score: %s, prize: %s", total_score, prize)
         
         return jsonify({"ok": True})
     except Exception as e:
-        sys.stderr.write(f"Error saving slot result: {e}\n")
-        sys.stderr.flush()
+        logger.error("Error saving slot result: %s", e)
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -5,8 +5,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, g
 from werkzeug.security import generate_password_hash, check_password_hash
 import store_db
+from app.utils import stamps, stamp_rollup
 from functools import wraps
-from datetime import datetime, timedelta
 
 stampcard_bp = Blueprint('stampcard', __name__, url_prefix='/store/<store_slug>/stampcard')
 
@@ -25,21 +25,21 @@ def load_store():
     """リクエスト前に店舗情報を読み込む"""
     store_slug = request.view_args.get('store_slug')
     if store_slug:
-        conn = store_db.get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT id, 名称 as name FROM "T_店舗" WHERE slug = %s', (store_slug,))
-        store = cur.fetchone()
-        conn.close()
+        store = store_db.resolve_store(store_slug)
         
         if store:
-            g.store_id = store[0]
-            g.store_name = store[1]
+            g.store_id = store['id']
+            g.store_name = store['name']
             g.store_slug = store_slug
         else:
             g.store_id = None
             g.store_name = None
             g.store_slug = store_slug
 
+def _touch_stampcard():
+    """顧客自身のスタンプ・特典の操作後に呼ぶ（マイページのキャッシュを使わず最新を表示する）"""
+    session['stampcard_rev'] = session.get('stampcard_rev', 0) + 1
+
 # ===== 顧客認証 =====
 
 @stampcard_bp.route('/register', methods=['GET', 'POST'])
@@ -173,132 +173,15 @@ def customer_mypage(store_slug):
     """顧客マイページ"""
     customer_id = session.get('customer_id')
     
-    conn = store_db.get_db_connection()
-    cur = conn.cursor()
-    
-    # スタンプカード情報取得
-    cur.execute('''
-        SELECT id, current_stamps, total_stamps, rewards_used, created_at
-        FROM "T_スタンプカード"
-        WHERE customer_id = %s AND store_id = %s
-    ''', (customer_id, g.store_id))
-    card = cur.fetchone()
-    
-    # スタンプカード設定取得
-    cur.execute('''
-        SELECT required_stamps, reward_description, card_title, use_multi_rewards
-        FROM "T_店舗_スタンプカード設定"
-        WHERE store_id = %s
-    ''', (g.store_id,))
-    settings = cur.fetchone()
-    
-    # 複数特典設定取得
-    cur.execute('''
-        SELECT id, required_stamps, reward_description, is_repeatable
-        FROM "T_特典設定"
-        WHERE store_id = %s AND enabled = 1
-        ORDER BY required_stamps
-    ''', (g.store_id,))
-    multi_rewards = cur.fetchall()
-    
-    # スタンプ履歴取得（最新10件）
-    cur.execute('''
-        SELECT stamps_added, action_type, note, created_at
-        FROM "T_スタンプ履歴"
-        WHERE customer_id = %s AND store_id = %s
-        ORDER BY created_at DESC
-        LIMIT 10
-    ''', (customer_id, g.store_id))
-    history = cur.fetchall()
-    
-    # 特典利用履歴取得（最新5件）
-    cur.execute('''
-        SELECT stamps_used, reward_description, created_at
-        FROM "T_特典利用履歴"
-        WHERE customer_id = %s AND store_id = %s
-        ORDER BY created_at DESC
-        LIMIT 5
-    ''', (customer_id, g.store_id))
-    reward_history = cur.fetchall()
-    
-    conn.close()
-    
-    # デフォルト設定
-    if not settings:
-        settings = (10, '1品無料', 'スタンプカード', 0)
-    
-    required_stamps = settings[0]
-    reward_description = settings[1]
-    card_title = settings[2]
-    use_multi_rewards = settings[3] if len(settings) > 3 else 0
-    
-    # スタンプカードがない場合は作成
-    if not card:
-        conn = store_db.get_db_connection()
-        cur = conn.cursor()
-        cur.execute('''
-            INSERT INTO "T_スタンプカード" (customer_id, store_id, current_stamps, total_stamps, rewards_used, created_at, updated_at)
-            VALUES (%s, %s, 0, 0, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        ''', (customer_id, g.store_id))
-        conn.commit()
-        card_id = cur.lastrowid
-        conn.close()
-        card = (card_id, 0, 0, 0, datetime.now())
-    
-    # 特典データの準備
-    rewards_list = []
-    if use_multi_rewards and multi_rewards:
-        # 複数特典モード
-        for reward in multi_rewards:
-            reward_id = reward[0]
-            req_stamps = reward[1]
-            desc = reward[2]
-            is_repeatable = reward[3]
-            
-            # この特典が利用可能かチェック
-            can_use = False
-            if card[1] >= req_stamps:
-                if is_repeatable:
-                    # 繰り返し可能な場合、常に利用可能
-                    can_use = True
-                else:
-                    # 初回のみの場合、利用済みかチェック
-                    cur.execute('''
-                        SELECT id FROM "T_特典利用履歴"
-                        WHERE customer_id = %s AND store_id = %s AND reward_id = %s
-                    ''', (customer_id, g.store_id, reward_id))
-                    if not cur.fetchone():
-                        can_use = True
-            
-            rewards_list.append({
-                'id': reward_id,
-                'required_stamps': req_stamps,
-                'description': desc,
-                'is_repeatable': is_repeatable,
-                'can_use': can_use,
-                'achieved': card[1] >= req_stamps
-            })
-    
-    card_data = {
-        'id': card[0],
-        'current_stamps': card[1],
-        'total_stamps': card[2],
-        'rewards_used': card[3],
-        'created_at': card[4],
-        'required_stamps': required_stamps,
-        'reward_description': reward_description,
-        'card_title': card_title,
-        'can_use_reward': card[1] >= required_stamps if not use_multi_rewards else False,
-        'use_multi_rewards': use_multi_rewards,
-        'rewards_list': rewards_list
-    }
+    # カード・特典の利用可否・履歴をまとめて取得（顧客ごとにキャッシュ）
+    data = stamps.load_mypage(customer_id, g.store_id, session.get('stampcard_rev'))
     
     return render_template('stampcard_mypage.html',
                          store_name=g.store_name,
                          customer_name=session.get('customer_name'),
-                         card=card_data,
-                         history=history,
-                         reward_history=reward_history)
+                         card=data['card'],
+                         history=data['history'],
+                         reward_history=data['reward_history'])
 
 @stampcard_bp.route('/scan', methods=['GET', 'POST'])
 @customer_login_required
@@ -307,67 +190,22 @@ def scan_qr(store_slug):
     if request.method == 'POST':
         customer_id = session.get('customer_id')
         
-        conn = store_db.get_db_connection()
-        cur = conn.cursor()
-        
         try:
-            # 今日既にスタンプを取得しているかチェック
-            today = datetime.now().date()
-            cur.execute('''
-                SELECT id FROM "T_スタンプ履歴"
-                WHERE customer_id = %s AND store_id = %s 
-                AND DATE(created_at) = %s
-                AND action_type = 'add'
-            ''', (customer_id, g.store_id, today))
-            
-            if cur.fetchone():
-                conn.close()
-                flash('本日は既にスタンプを取得しています', 'warning')
-                return redirect(url_for('stampcard.customer_mypage', store_slug=store_slug))
-            
-            # スタンプカード取得
-            cur.execute('''
-                SELECT id, current_stamps, total_stamps
-                FROM "T_スタンプカード"
-                WHERE customer_id = %s AND store_id = %s
-            ''', (customer_id, g.store_id))
-            card = cur.fetchone()
-            
-            if not card:
-                conn.close()
-                flash('スタンプカードが見つかりません', 'error')
-                return redirect(url_for('stampcard.customer_mypage', store_slug=store_slug))
-            
-            card_id = card[0]
-            current_stamps = card[1]
-            total_stamps = card[2]
-            
-            # スタンプを追加
-            cur.execute('''
-                UPDATE "T_スタンプカード"
-                SET current_stamps = current_stamps + 1,
-                    total_stamps = total_stamps + 1,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            ''', (card_id,))
-            
-            # スタンプ履歴を記録
-            cur.execute('''
-                INSERT INTO "T_スタンプ履歴" (card_id, customer_id, store_id, stamps_added, action_type, note, created_by, created_at)
-                VALUES (%s, %s, %s, 1, 'add', 'QRコードスキャン', 'customer', CURRENT_TIMESTAMP)
-            ''', (card_id, customer_id, g.store_id))
-            
-            conn.commit()
-            conn.close()
-            
-            flash(f'スタンプを1個獲得しました！（現在: {current_stamps + 1}個）', 'success')
+            # 1日1回の制約付きで付与し、付与後のスタンプ数を受け取る
+            current_stamps = stamps.grant_daily_stamp(customer_id, g.store_id)
+            _touch_stampcard()
+        except stamps.StampAlreadyGranted:
+            flash('本日は既にスタンプを取得しています', 'warning')
+            return redirect(url_for('stampcard.customer_mypage', store_slug=store_slug))
+        except stamps.StampCardNotFound:
+            flash('スタンプカードが見つかりません', 'error')
             return redirect(url_for('stampcard.customer_mypage', store_slug=store_slug))
-            
         except Exception as e:
-            conn.rollback()
-            conn.close()
             flash(f'スタンプの付与に失敗しました: {str(e)}', 'error')
             return redirect(url_for('stampcard.customer_mypage', store_slug=store_slug))
+        
+        flash(f'スタンプを1個獲得しました！（現在: {current_stamps}個）', 'success')
+        return redirect(url_for('stampcard.customer_mypage', store_slug=store_slug))
     
     return render_template('stampcard_scan.html', store_name=g.store_name)
 
@@ -433,8 +271,13 @@ def use_reward(store_slug):
             VALUES (%s, %s, %s, %s, 'use', %s, 'customer', CURRENT_TIMESTAMP)
         ''', (card_id, customer_id, g.store_id, -required_stamps, f'特典利用: {reward_description}'))
         
+        # 日別集計に加算
+        stamp_rollup.record_activity(cur, g.store_id, rewards_redeemed=1)
+        
         conn.commit()
         conn.close()
+        stamps.invalidate_mypage(g.store_id, customer_id)
+        _touch_stampcard()
         
         return jsonify({'success': True, 'message': '特典を利用しました！', 'remaining_stamps': current_stamps - required_stamps})
         
@@ -519,8 +362,13 @@ def use_multi_reward(store_slug):
             WHERE id = %s
         ''', (card_id,))
         
+        # 日別集計に加算
+        stamp_rollup.record_activity(cur, g.store_id, rewards_redeemed=1)
+        
         conn.commit()
         conn.close()
+        stamps.invalidate_mypage(g.store_id, customer_id)
+        _touch_stampcard()
         
         return jsonify({'success': True, 'message': '特典を利用しました！'})
         
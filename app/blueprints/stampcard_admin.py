@@ -5,6 +5,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from app.utils.db import get_db_connection, _sql
 from app.utils.decorators import require_roles, ROLES
+from app.utils import stamps, stamp_rollup
 
 stampcard_admin_bp = Blueprint('stampcard_admin', __name__)
 
@@ -110,6 +111,7 @@ def settings(store_id):
             
             conn.commit()
             conn.close()
+            stamps.invalidate_mypage(store_id)
             flash('設定を保存しました', 'success')
             return redirect(url_for('stampcard_admin.settings', store_id=store_id))
             
@@ -295,54 +297,17 @@ def add_stamp(store_id, customer_id):
     """スタンプを手動で追加"""
     stamps_to_add = request.form.get('stamps', 1, type=int)
     note = request.form.get('note', '')
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+    admin_name = session.get('admin_name', 'admin')
     
     try:
-        # スタンプカード取得
-        cur.execute('''
-            SELECT id, current_stamps, total_stamps
-            FROM "T_スタンプカード"
-            WHERE customer_id = %s AND store_id = %s
-        ''', (customer_id, store_id))
-        card = cur.fetchone()
-        
-        if not card:
-            conn.close()
-            flash('スタンプカードが見つかりません', 'error')
-            return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
-        
-        card_id = card[0]
-        
-        # スタンプを追加
-        cur.execute('''
-            UPDATE "T_スタンプカード"
-            SET current_stamps = current_stamps + %s,
-                total_stamps = total_stamps + %s,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        ''', (stamps_to_add, stamps_to_add, card_id))
-        
-        # 履歴を記録
-        admin_name = session.get('admin_name', 'admin')
-        cur.execute('''
-            INSERT INTO "T_スタンプ履歴" 
-            (card_id, customer_id, store_id, stamps_added, action_type, note, created_by, created_at)
-            VALUES (%s, %s, %s, %s, 'add', %s, %s, CURRENT_TIMESTAMP)
-        ''', (card_id, customer_id, store_id, stamps_to_add, note, admin_name))
-        
-        conn.commit()
-        conn.close()
-        
+        # カードの加算と履歴の記録を1回の操作で行う
+        stamps.adjust_stamps(customer_id, store_id, stamps_to_add, note, admin_name)
         flash(f'スタンプを{stamps_to_add}個追加しました', 'success')
-        return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
-        
+    except stamps.StampCardNotFound:
+        flash('スタンプカードが見つかりません', 'error')
     except Exception as e:
-        conn.rollback()
-        conn.close()
         flash(f'スタンプの追加に失敗しました: {str(e)}', 'error')
-        return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
+    return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
 
 @stampcard_admin_bp.route('/admin/store/<int:store_id>/stampcard/customers/<int:customer_id>/remove_stamp', methods=['POST'])
 @require_roles(ROLES["ADMIN"], ROLES["TENANT_ADMIN"], ROLES["SYSTEM_ADMIN"])
@@ -350,60 +315,19 @@ def remove_stamp(store_id, customer_id):
     """スタンプを手動で削除"""
     stamps_to_remove = request.form.get('stamps', 1, type=int)
     note = request.form.get('note', '')
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+    admin_name = session.get('admin_name', 'admin')
     
     try:
-        # スタンプカード取得
-        cur.execute('''
-            SELECT id, current_stamps, total_stamps
-            FROM "T_スタンプカード"
-            WHERE customer_id = %s AND store_id = %s
-        ''', (customer_id, store_id))
-        card = cur.fetchone()
-        
-        if not card:
-            conn.close()
-            flash('スタンプカードが見つかりません', 'error')
-            return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
-        
-        card_id = card[0]
-        current_stamps = card[1]
-        
-        # スタンプが足りるかチェック
-        if current_stamps < stamps_to_remove:
-            conn.close()
-            flash(f'スタンプが足りません（現在: {current_stamps}個）', 'error')
-            return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
-        
-        # スタンプを削除
-        cur.execute('''
-            UPDATE "T_スタンプカード"
-            SET current_stamps = current_stamps - %s,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        ''', (stamps_to_remove, card_id))
-        
-        # 履歴を記録
-        admin_name = session.get('admin_name', 'admin')
-        cur.execute('''
-            INSERT INTO "T_スタンプ履歴" 
-            (card_id, customer_id, store_id, stamps_added, action_type, note, created_by, created_at)
-            VALUES (%s, %s, %s, %s, 'remove', %s, %s, CURRENT_TIMESTAMP)
-        ''', (card_id, customer_id, store_id, -stamps_to_remove, note, admin_name))
-        
-        conn.commit()
-        conn.close()
-        
+        # 残数が足りる場合だけ減算し、履歴を記録する（確認と更新の間に他の操作が入らない）
+        stamps.adjust_stamps(customer_id, store_id, -stamps_to_remove, note, admin_name)
         flash(f'スタンプを{stamps_to_remove}個削除しました', 'success')
-        return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
-        
+    except stamps.StampCardNotFound:
+        flash('スタンプカードが見つかりません', 'error')
+    except stamps.InsufficientStamps as e:
+        flash(f'スタンプが足りません（現在: {e.current_stamps}個）', 'error')
     except Exception as e:
-        conn.rollback()
-        conn.close()
         flash(f'スタンプの削除に失敗しました: {str(e)}', 'error')
-        return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
+    return redirect(url_for('stampcard_admin.customer_detail', store_id=store_id, customer_id=customer_id))
 
 # ===== 統計・レポート =====
 
@@ -415,81 +339,33 @@ def stats(store_id):
     cur = conn.cursor()
     
     # 店舗情報取得
-    cur.execute('SELECT 名称 FROM "T_店舗" WHERE id = %s', (store_id,))
+    cur.execute(_sql(conn, 'SELECT 名称 FROM "T_店舗" WHERE id = %s'), (store_id,))
     store = cur.fetchone()
+    conn.close()
     
     if not store:
-        conn.close()
         flash('店舗が見つかりません', 'error')
         return redirect(url_for('admin.store_info'))
     
     store_name = store[0]
     
-    # 登録顧客数
-    cur.execute('SELECT COUNT(*) FROM "T_顧客" WHERE store_id = %s', (store_id,))
-    total_customers = cur.fetchone()[0]
-    
-    # アクティブ顧客数（過去30日間にログインした顧客）
-    cur.execute('''
-        SELECT COUNT(*) 
-        FROM "T_顧客" 
-        WHERE store_id = %s 
-        AND last_login >= CURRENT_TIMESTAMP - INTERVAL '30 days'
-    ''', (store_id,))
-    active_customers = cur.fetchone()[0]
-    
-    # 累計スタンプ付与数
-    cur.execute('''
-        SELECT COALESCE(SUM(total_stamps), 0)
-        FROM "T_スタンプカード"
-        WHERE store_id = %s
-    ''', (store_id,))
-    total_stamps = cur.fetchone()[0]
-    
-    # 累計特典利用回数
-    cur.execute('''
-        SELECT COALESCE(SUM(rewards_used), 0)
-        FROM "T_スタンプカード"
-        WHERE store_id = %s
-    ''', (store_id,))
-    total_rewards = cur.fetchone()[0]
-    
-    # 過去30日間のスタンプ付与数推移
-    cur.execute('''
-        SELECT DATE(created_at) as date, COUNT(*) as count
-        FROM "T_スタンプ履歴"
-        WHERE store_id = %s 
-        AND action_type = 'add'
-        AND created_at >= CURRENT_TIMESTAMP - INTERVAL '30 days'
-        GROUP BY DATE(created_at)
-        ORDER BY date ASC
-    ''', (store_id,))
-    stamp_trend = cur.fetchall()
-    
-    # 過去30日間の特典利用数推移
-    cur.execute('''
-        SELECT DATE(created_at) as date, COUNT(*) as count
-        FROM "T_特典利用履歴"
-        WHERE store_id = %s
-        AND created_at >= CURRENT_TIMESTAMP - INTERVAL '30 days'
-        GROUP BY DATE(created_at)
-        ORDER BY date ASC
-    ''', (store_id,))
-    reward_trend = cur.fetchall()
-    
-    conn.close()
+    # 顧客数・累計・推移を日別集計テーブルから1クエリで取得（期間は 7/30/90/365 日）
+    days = stamp_rollup.window_days(request.args.get('days', stamp_rollup.DEFAULT_WINDOW))
+    data = stamp_rollup.store_stats(store_id, days)
     
     return render_template('stampcard_admin_stats.html',
                          store_id=store_id,
                          store_name=store_name,
                          stats={
-                             'total_customers': total_customers,
-                             'active_customers': active_customers,
-                             'total_stamps': total_stamps,
-                             'total_rewards': total_rewards
+                             'total_customers': data['total_customers'],
+                             'active_customers': data['active_customers'],
+                             'total_stamps': data['total_stamps'],
+                             'total_rewards': data['total_rewards']
                          },
-                         stamp_trend=stamp_trend,
-                         reward_trend=reward_trend)
+                         stamp_trend=data['stamp_trend'],
+                         reward_trend=data['reward_trend'],
+                         days=days,
+                         windows=stamp_rollup.TREND_WINDOWS)
 
 
 # プレビューページ
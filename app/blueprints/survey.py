@@ -4,12 +4,22 @@
 """
 from flask import Blueprint, jsonify, request, render_template, session, redirect, url_for, g
 from functools import wraps
+import logging
 import os
 import sys
 
 # store_dbをインポート
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import store_db
+from ..utils.review_jobs import (
+    enqueue_review_job, get_review_job, claim_review_job, stream_review_job, load_generated_review,
+    FAILED_REVIEW_TEXT, REVIEW_STREAMING, REVIEW_STREAM_GRACE,
+)
+from ..utils.openai_clients import get_openai_client
+from ..utils.sse import sse_event, sse_response, iter_completion_text
+from ..utils.metrics import track_openai
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('survey', __name__)
 
@@ -17,9 +27,7 @@ bp = Blueprint('survey', __name__)
 @bp.url_value_preprocessor
 def pull_store_slug(endpoint, values):
     """かURLから店舗slugを取得してgに保存"""
-    import sys
-    sys.stderr.write(f"DEBUG pull_store_slug: endpoint={endpoint}, values={values}\n")
-    sys.stderr.flush()
+    logger.debug("pull_store_slug: endpoint=%s, values=%s", endpoint, values)
     
     # valuesが空の場合はrequest.view_argsから取得を試みる
     from flask import request
@@ -31,11 +39,9 @@ def pull_store_slug(endpoint, values):
     
     if store_slug:
         g.store_slug = store_slug
-        sys.stderr.write(f"DEBUG pull_store_slug: store_slug={g.store_slug}\n")
-        sys.stderr.flush()
+        logger.debug("pull_store_slug: store_slug=%s", g.store_slug)
         store = store_db.get_store_by_slug(g.store_slug)
-        sys.stderr.write(f"DEBUG pull_store_slug: store={store}\n")
-        sys.stderr.flush()
+        logger.debug("pull_store_slug: store=%s", store)
         if store:
             g.store = store
             g.store_id = store['id']
@@ -56,99 +62,23 @@ def require_store(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# OpenAI クライアントを動的に取得する関数
-def get_openai_client(app_type=None, app_id=None, store_id=None, tenant_id=None):
-    """
-    OpenAIクライアントを階層的に取得。
-    優先順位: アプリ設定 > 店舗設定 > テナント設定 > 環境変数
-    """
-    from openai import OpenAI
-    api_key = None
-    
-    try:
-        conn = store_db.get_db_connection()
-        cursor = conn.cursor()
-        
-        # 1. アプリ設定のキーを確認
-        if app_type and app_id:
-            if app_type == 'survey':
-                cursor.execute("SELECT openai_api_key, store_id FROM \"T_店舗_アンケート設定\" WHERE id = %s", (app_id,))
-            elif app_type == 'slot':
-                cursor.execute("SELECT openai_api_key, store_id FROM \"T_店舗_スロット設定\" WHERE id = %s", (app_id,))
-            
-            result = cursor.fetchone()
-            if result:
-                if result[0]:  # アプリにAPIキーが設定されている
-                    api_key = result[0]
-                    conn.close()
-                    return OpenAI(api_key=api_key, base_url='https://api.openai.com/v1')
-                # アプリにキーがない場合、store_idを取得
-                if not store_id and result[1]:
-                    store_id = result[1]
-        
-        # 2. 店舗設定のキーを確認
-        if store_id:
-            cursor.execute("SELECT openai_api_key, tenant_id FROM \"T_店舗\" WHERE id = %s", (store_id,))
-            result = cursor.fetchone()
-            if result:
-                if result[0]:  # 店舗にAPIキーが設定されている
-                    api_key = result[0]
-                    conn.close()
-                    return OpenAI(api_key=api_key, base_url='https://api.openai.com/v1')
-                # 店舗にキーがない場合、tenant_idを取得
-                if not tenant_id and result[1]:
-                    tenant_id = result[1]
-        
-        # 3. テナント設定のキーを確認
-        if tenant_id:
-            cursor.execute("SELECT openai_api_key FROM \"T_テナント\" WHERE id = %s", (tenant_id,))
-            result = cursor.fetchone()
-            if result and result[0]:
-                api_key = result[0]
-                conn.close()
-                return OpenAI(api_key=api_key, base_url='https://api.openai.com/v1')
-        
-        conn.close()
-    except Exception as e:
-        print(f"Error getting OpenAI API key from database: {e}")
-    
-    # 4. 環境変数を確認
-    if not api_key:
-        api_key = os.environ.get('OPENAI_API_KEY')
-
-    
-    if not api_key:
-        raise ValueError("OpenAI APIキーが設定されていません。アプリ、店舗、またはテナントの管理画面でAPIキーを設定してください。")
-    
-    return OpenAI(api_key=api_key, base_url='https://api.openai.com/v1')
-
-def _generate_review_text(survey_data, store_id):
+def _generate_review_text(survey_data, store_id, openai_client=None, raise_errors=False, stream=False):
     """
     アンケートデータからAIを使って口コミ投稿文を生成
+    openai_client: 省略時は設定されたAPIキーから取得
+    raise_errors: True なら失敗時に定型文を返さず例外を送出（ジョブの再試行用）
+    stream: True なら本文の断片を順に返すイテレータを返す（SSE 配信用）
     """
-    # アンケートアプリIDを取得
-    survey_app_id = None
-    try:
-        conn = store_db.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM T_店舗_アンケート設定 WHERE store_id = %s", (store_id,))
-        result = cursor.fetchone()
-        if result:
-            survey_app_id = result[0]
-        conn.close()
-    except Exception as e:
-        print(f"Error getting survey app ID: {e}")
-    
-    # OpenAIクライアントを取得
-    try:
-        openai_client = get_openai_client(
-            app_type='survey',
-            app_id=survey_app_id,
-            store_id=store_id
-        )
-    except Exception as e:
-        print(f"Error getting OpenAI client: {e}")
-        return "口コミ投稿文の生成に失敗しました。"
+    if openai_client is None:
+        # OpenAIクライアントを取得
+        try:
+            # 店舗のアンケートアプリ設定 > 店舗 > テナントの順に解決（キャッシュ済みのクライアントを再利用）
+            openai_client = get_openai_client(app_type='survey', store_id=store_id)
+        except Exception as e:
+            logger.exception("Error getting OpenAI client: %s", e)
+            if raise_errors:
+                raise
+            return FAILED_REVIEW_TEXT
     
     # アンケート設定を取得して質問文を取得
     survey_config = None
@@ -162,7 +92,7 @@ def _generate_review_text(survey_data, store_id):
             survey_config = json.loads(result[0])
         conn.close()
     except Exception as e:
-        print(f"Error getting survey config: {e}")
+        logger.warning("Error getting survey config: %s", e)
     
     # アンケート回答を質問と結びつけて整形
     qa_pairs = []
@@ -204,7 +134,7 @@ def _generate_review_text(survey_data, store_id):
         import store_db as _store_db_ai
         ai_review_settings = _store_db_ai.get_ai_review_settings(store_id)
     except Exception as e:
-        print(f"Error getting ai_review_settings: {e}")
+        logger.warning("Error getting ai_review_settings: %s", e)
 
     business_type = ai_review_settings.get('business_type', '')
     ai_instruction = ai_review_settings.get('ai_instruction', '')
@@ -220,24 +150,16 @@ def _generate_review_text(survey_data, store_id):
     if ai_instruction:
         business_system_hint += f"\n追加指示: {ai_instruction}"
 
-    # デバッグ：AIに渡されるデータをログ出力
-    import sys
-    sys.stderr.write("=" * 80 + "\n")
-    sys.stderr.write("DEBUG: AIに渡されるアンケートデータ\n")
-    sys.stderr.write("=" * 80 + "\n")
-    sys.stderr.write(f"survey_data: {survey_data}\n")
-    sys.stderr.write(f"survey_config questions count: {len(survey_config.get('questions', [])) if survey_config else 0}\n")
-    sys.stderr.write(f"qa_pairs count: {len(qa_pairs)}\n")
-    sys.stderr.write("\nqa_text:\n")
-    sys.stderr.write(qa_text + "\n")
-    sys.stderr.write("=" * 80 + "\n")
-    sys.stderr.flush()
+    # デバッグ：AIに渡されるデータをログ出力（DEBUG が無効なら組み立てない）
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("AIに渡されるアンケートデータ", extra={
+            "survey_data": survey_data,
+            "questions": len(survey_config.get('questions', [])) if survey_config else 0,
+            "qa_pairs": len(qa_pairs),
+            "qa_text": qa_text,
+        })
     
     # プロンプト作成
-    sys.stderr.write("\n" + "=" * 80 + "\n")
-    sys.stderr.write("DEBUG: OpenAIに送信するプロンプト\n")
-    sys.stderr.write("=" * 80 + "\n")
-    
     prompt = f"""以下のアンケート回答から、実際の人間が書いたような自然な口コミ投稿文を日本語で作成してください。{business_type_line}
 
 【アンケート回答】
@@ -263,15 +185,12 @@ def _generate_review_text(survey_data, store_id):
 
 口コミ投稿文:"""
     
-    sys.stderr.write(prompt + "\n")
-    sys.stderr.write("=" * 80 + "\n")
-    sys.stderr.flush()
+    logger.debug("OpenAIに送信するプロンプト", extra={"prompt": prompt})
     
     try:
-        sys.stderr.write("DEBUG: OpenAI APIを呼び出します (model=gpt-4.1-mini)\n")
-        sys.stderr.flush()
+        logger.debug("OpenAI APIを呼び出します (model=gpt-4.1-mini)")
         
-        response = openai_client.chat.completions.create(
+        request_kwargs = dict(
             model="gpt-4.1-mini",
             messages=[
                 {"role": "system", "content": f"""あなたは実際の人間が書いたような自然な口コミ投稿文を作成する専門家です。{business_system_hint}
@@ -300,19 +219,23 @@ def _generate_review_text(survey_data, store_id):
             max_tokens=500
         )
         
+        if stream:
+            # 完成した本文の保存は呼び出し側で行う
+            return iter_completion_text(openai_client, request_kwargs)
+        
+        with track_openai():
+            response = openai_client.chat.completions.create(**request_kwargs)
+        
         generated_text = response.choices[0].message.content.strip()
         
-        sys.stderr.write("\n" + "=" * 80 + "\n")
-        sys.stderr.write("DEBUG: OpenAIからのレスポンス\n")
-        sys.stderr.write("=" * 80 + "\n")
-        sys.stderr.write(f"生成されたレビュー:\n{generated_text}\n")
-        sys.stderr.write("=" * 80 + "\n")
-        sys.stderr.flush()
+        logger.debug("OpenAIからのレスポンス", extra={"generated_review": generated_text})
         
         return generated_text
     except Exception as e:
-        print(f"Error generating review text: {e}")
-        return "口コミ投稿文の生成に失敗しました。"
+        logger.exception("Error generating review text: %s", e)
+        if raise_errors:
+            raise
+        return FAILED_REVIEW_TEXT
 
 
 # ===== ルート =====
@@ -329,9 +252,9 @@ def store_index():
 @require_store
 def survey():
     """アンケートページ"""
-    print(f"DEBUG: survey() called, store_id={g.store_id}, store={g.store}")
+    logger.debug("survey() called, store_id=%s, store=%s", g.store_id, g.store)
     survey_config = store_db.get_survey_config(g.store_id)
-    print(f"DEBUG: survey_config={survey_config}")
+    logger.debug("survey_config=%s", survey_config)
     return render_template("survey.html", 
                          store=g.store,
                          survey_config=survey_config)
@@ -342,9 +265,7 @@ def submit_survey():
     """アンケート送信"""
     try:
         body = request.get_json(silent=True) or {}
-        import sys
-        sys.stderr.write(f"DEBUG submit_survey: body = {body}\n")
-        sys.stderr.flush()
+        logger.debug("submit_survey", extra={"body": body})
         # 最初の質問の回答を評価として使用（5段階評価の場合）
         rating = 3  # デフォルト
         first_answer = body.get('q1', '')
@@ -406,60 +327,42 @@ def submit_survey():
         body['rating'] = rating
         
         # アンケート回答を保存
-        sys.stderr.write(f"DEBUG submit_survey: rating = {rating}, store_id = {g.store_id}\n")
-        sys.stderr.flush()
-        store_db.save_survey_response(g.store_id, body)
+        logger.debug("submit_survey: rating = %s, store_id = %s", rating, g.store_id)
+        response_id = store_db.save_survey_response(g.store_id, body)
         
         # 口コミ投稿促進設定を取得
         from review_prompt_settings import get_review_prompt_mode
         review_mode = get_review_prompt_mode(g.store_id)
-        sys.stderr.write(f"DEBUG: rating = {rating}, review_mode = {review_mode}\n")
-        sys.stderr.flush()
+        logger.debug("rating = %s, review_mode = %s", rating, review_mode)
         
         # 設定に応じてAIレビュー生成とリダイレクト先を制御
+        # 生成はバックグラウンドのジョブで行い、review_confirm で結果を待つ
+        review_job_id = None
         generated_review = ''
         redirect_url = f"/store/{g.store_slug}/slot"  # デフォルトはスロットページ
         
-        # 「星4以上のみ投稿を促す」設定の場合
-        if review_mode == 'high_rating_only':
-            if rating >= 4:
-                # 星4以上のAIレビュー生成
-                sys.stderr.write("DEBUG: AIレビュー生成を開始します（星4以上）\n")
-                sys.stderr.flush()
-                try:
-                    generated_review = _generate_review_text(body, g.store_id)
-                    sys.stderr.write(f"DEBUG: AIレビュー生成成功: {generated_review[:100]}...\n")
-                    sys.stderr.flush()
-                except Exception as e:
-                    sys.stderr.write(f"ERROR: AIレビュー生成失敗: {e}\n")
-                    import traceback
-                    sys.stderr.write(traceback.format_exc())
-                    sys.stderr.flush()
-                redirect_url = f"/store/{g.store_slug}/review_confirm"
-            else:
-                # 星3以下はスロットページに直接遷移
-                sys.stderr.write("DEBUG: 星3以下のためスロットページに遷移\n")
-                sys.stderr.flush()
-                redirect_url = f"/store/{g.store_slug}/slot"
+        if review_mode == 'high_rating_only' and rating < 4:
+            # 「星4以上のみ投稿を促す」設定で星3以下はスロットページに直接遷移
+            logger.debug("星3以下のためスロットページに遷移")
         else:
-            # 「全ての評価に投稿を促す」設定の場合
-            sys.stderr.write("DEBUG: AIレビュー生成を開始します（全ての評価）\n")
-            sys.stderr.flush()
+            # 「全ての評価に投稿を促す」設定、または星4以上
             try:
-                generated_review = _generate_review_text(body, g.store_id)
-                sys.stderr.write(f"DEBUG: AIレビュー生成成功: {generated_review[:100]}...\n")
-                sys.stderr.flush()
+                # ストリーミング時は review_confirm の SSE 接続が取得するまでバックグラウンド実行を待つ
+                review_job_id = enqueue_review_job(
+                    g.store_id, body, response_id=response_id,
+                    defer=REVIEW_STREAM_GRACE if REVIEW_STREAMING else 0.0)
+                logger.debug("AIレビュー生成ジョブを登録しました job_id=%s", review_job_id)
             except Exception as e:
-                sys.stderr.write(f"ERROR: AIレビュー生成失敗: {e}\n")
-                import traceback
-                sys.stderr.write(traceback.format_exc())
-                sys.stderr.flush()
+                logger.exception("AIレビュー生成ジョブの登録失敗: %s", e)
+                generated_review = FAILED_REVIEW_TEXT
             redirect_url = f"/store/{g.store_slug}/review_confirm"
         
         # セッションにアンケート完了フラグと評価を設定
         session[f'survey_completed_{g.store_id}'] = True
         session[f'survey_rating_{g.store_id}'] = rating
         session[f'generated_review_{g.store_id}'] = generated_review
+        session[f'review_job_{g.store_id}'] = review_job_id
+        session[f'survey_response_id_{g.store_id}'] = response_id
         session[f'survey_data_{g.store_id}'] = body  # アンケートデータも保存
         
         return jsonify({
@@ -467,14 +370,11 @@ def submit_survey():
             "message": "アンケートにご協力いただきありがとうございます！",
             "rating": rating,
             "generated_review": generated_review,
+            "review_job_id": review_job_id,
             "redirect_url": redirect_url
         })
     except Exception as e:
-        import sys
-        sys.stderr.write(f"ERROR submit_survey: {e}\n")
-        sys.stderr.flush()
-        import traceback
-        traceback.print_exc()
+        logger.exception("submit_survey: %s", e)
         return jsonify({"ok": False, "error": str(e)}), 400
 @bp.post("/store/<store_slug>/reset_survey")
 @require_store
@@ -483,6 +383,8 @@ def reset_survey():
     session.pop(f'survey_completed_{g.store_id}', None)
     session.pop(f'survey_rating_{g.store_id}', None)
     session.pop(f'generated_review_{g.store_id}', None)
+    session.pop(f'review_job_{g.store_id}', None)
+    session.pop(f'survey_response_id_{g.store_id}', None)
     return jsonify({"ok": True, "message": "アンケートをリセットしました"})
 
 @bp.get("/store/<store_slug>/review_confirm")
@@ -490,27 +392,92 @@ def reset_survey():
 def review_confirm():
     """口コミ確認ページ"""
     from review_prompt_settings import should_show_review_button, get_review_prompt_mode
-    import sys
     
-    generated_review = session.get(f'generated_review_{g.store_id}', '')
+    # ストリーミング配信ではセッションを更新できないため、保存済みの回答の口コミ文を優先する
+    response_id = session.get(f'survey_response_id_{g.store_id}')
+    generated_review = (load_generated_review(response_id) if response_id else None) \
+        or session.get(f'generated_review_{g.store_id}', '')
+    review_job_id = session.get(f'review_job_{g.store_id}')
+    if not generated_review and review_job_id:
+        # 生成ジョブが終わっていれば結果を使い、まだならページ側でポーリングする
+        job = get_review_job(review_job_id)
+        if job and job['status'] in ('done', 'failed'):
+            generated_review = job['result_text'] or ''
+            session[f'generated_review_{g.store_id}'] = generated_review
     google_review_url = store_db.get_google_review_url(g.store_id)
     rating = session.get(f'survey_rating_{g.store_id}', 0)
     
     # デバッグログ
     mode = get_review_prompt_mode(g.store_id)
-    sys.stderr.write(f"DEBUG review_confirm: store_id={g.store_id}, rating={rating}, mode={mode}\n")
-    sys.stderr.flush()
+    logger.debug("review_confirm: store_id=%s, rating=%s, mode=%s", g.store_id, rating, mode)
     
     # 設定に基づいてレビューボタンを表示するか判定
     show_review_button = should_show_review_button(g.store_id, rating)
-    sys.stderr.write(f"DEBUG review_confirm: show_review_button={show_review_button}\n")
-    sys.stderr.flush()
+    logger.debug("review_confirm: show_review_button=%s", show_review_button)
     
     return render_template("review_confirm.html",
         store=g.store,
         store_slug=g.store_slug,
         generated_review=generated_review,
+        review_job_id=review_job_id if not generated_review else None,
+        review_streaming=REVIEW_STREAMING,
         google_review_url=google_review_url,
         rating=rating,
         show_review_button=show_review_button
     )
+
+
+@bp.get("/store/<store_slug>/review_job/<int:job_id>")
+@require_store
+def review_job_status(job_id):
+    """口コミ生成ジョブの状態（review_confirm からポーリング）"""
+    # 自分のセッションで登録したジョブのみ参照可能
+    if session.get(f'review_job_{g.store_id}') != job_id:
+        return jsonify({"ok": False, "error": "ジョブが見つかりません"}), 404
+    job = get_review_job(job_id)
+    if not job or job['store_id'] != g.store_id:
+        return jsonify({"ok": False, "error": "ジョブが見つかりません"}), 404
+    
+    result = {"ok": True, "status": job['status']}
+    if job['status'] in ('done', 'failed'):
+        result["generated_review"] = job['result_text'] or ''
+        session[f'generated_review_{g.store_id}'] = result["generated_review"]
+    return jsonify(result)
+
+
+@bp.get("/store/<store_slug>/review_stream")
+@require_store
+def review_stream():
+    """
+    口コミ生成の本文を SSE で逐次配信（review_confirm の EventSource から接続）
+    token: 本文の断片 / done: 完成した本文 / pending: バックグラウンド生成中（ポーリングに切り替える）
+    """
+    job_id = session.get(f'review_job_{g.store_id}')
+    job = get_review_job(job_id) if job_id else None
+    if not job or job['store_id'] != g.store_id:
+        return jsonify({"ok": False, "error": "ジョブが見つかりません"}), 404
+    
+    if job['status'] in ('done', 'failed'):
+        generated_review = job['result_text'] or ''
+        session[f'generated_review_{g.store_id}'] = generated_review
+        return sse_response(iter([sse_event("done", {"generated_review": generated_review})]))
+    
+    claimed = claim_review_job(job_id)
+    if claimed is None:
+        # 他の接続またはバックグラウンドで生成中
+        return sse_response(iter([sse_event("pending", {"job_id": job_id})]))
+    
+    # ストリーム開始後はセッションを更新できないため、完成文は T_アンケート回答 とジョブに保存される
+    def events():
+        parts = []
+        try:
+            for delta in stream_review_job(claimed):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except Exception as e:
+            logger.error("review_stream: %s", e)
+            yield sse_event("pending", {"job_id": job_id})
+            return
+        yield sse_event("done", {"generated_review": "".join(parts).strip()})
+    
+    return sse_response(events())
@@ -2,13 +2,13 @@
 """
 アンケート管理画面 Blueprint
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, session, g
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, g, Response, stream_with_context
 import os
 import json
-import csv
-from io import StringIO
+import logging
 from dataclasses import asdict
-from ..utils.decorators import require_roles
+from datetime import datetime
+from ..utils.decorators import require_roles, current_tenant_filter_sql
 from ..utils import ROLES
 from ..utils.admin_auth import (
     require_admin_login,
@@ -16,15 +16,19 @@ from ..utils.admin_auth import (
     authenticate_admin,
     login_admin_session
 )
-from ..utils.config import load_config, save_config
+from ..utils.config import load_config, save_config, load_settings, save_settings, SURVEY_LOG
+from ..utils.openai_clients import invalidate_openai_keys
+from ..utils import survey_export
+from ..utils.file_store import read_json, write_json
 from ..models import Symbol
 
+logger = logging.getLogger(__name__)
+
 bp = Blueprint('survey_admin', __name__, url_prefix='/admin')
 
 # パス設定
 APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(APP_DIR, "data")
-SURVEY_DATA_PATH = os.path.join(DATA_DIR, "survey_responses.json")
 
 
 # ===== 認証 =====
@@ -72,32 +76,34 @@ def admin_dashboard():
         'store_name': session.get('store_name', '')
     }
     
-    # アンケート回答データを読み込み
-    survey_responses = []
-    if os.path.exists(SURVEY_DATA_PATH):
-        with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-            survey_responses = json.load(f)
-    
-    # 統計情報を計算
-    total_responses = len(survey_responses)
-    rating_counts = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-    
-    for response in survey_responses:
-        rating = response.get("rating", 0)
-        if rating in rating_counts:
-            rating_counts[rating] += 1
+    # 統計情報は追記分だけを加算してキャッシュした集計から取得
+    stats = SURVEY_LOG.aggregate("rating_stats", _empty_rating_stats, _add_rating)
+    total_responses = stats["total"]
+    rating_counts = stats["counts"]
     
     avg_rating = 0
     if total_responses > 0:
-        total_rating = sum(r.get("rating", 0) for r in survey_responses)
-        avg_rating = round(total_rating / total_responses, 2)
+        avg_rating = round(stats["rating_sum"] / total_responses, 2)
     
     return render_template("admin_dashboard.html",
                          admin=admin,
                          total_responses=total_responses,
                          rating_counts=rating_counts,
                          avg_rating=avg_rating,
-                         recent_responses=survey_responses[-10:][::-1])
+                         recent_responses=SURVEY_LOG.tail(10)[::-1])
+
+
+def _empty_rating_stats():
+    return {"total": 0, "rating_sum": 0, "counts": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}}
+
+
+def _add_rating(stats, response):
+    rating = response.get("rating", 0)
+    stats["total"] += 1
+    stats["rating_sum"] += rating if isinstance(rating, (int, float)) else 0
+    if rating in stats["counts"]:
+        stats["counts"][rating] += 1
+    return stats
 
 
 @bp.route("/responses")
@@ -111,10 +117,7 @@ def admin_responses():
         'store_name': session.get('store_name', '')
     }
     
-    survey_responses = []
-    if os.path.exists(SURVEY_DATA_PATH):
-        with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-            survey_responses = json.load(f)
+    survey_responses = SURVEY_LOG.records()
     
     # 最新順にソート
     survey_responses.reverse()
@@ -125,40 +128,77 @@ def admin_responses():
 
 
 @bp.route("/export/csv")
-@require_roles(ROLES["ADMIN"])
+@require_roles(ROLES["ADMIN"], ROLES["TENANT_ADMIN"], ROLES["SYSTEM_ADMIN"])
 def admin_export_csv():
-    """回答データをCSVでエクスポート"""
-    survey_responses = []
-    if os.path.exists(SURVEY_DATA_PATH):
-        with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-            survey_responses = json.load(f)
-    
-    # CSV作成
-    si = StringIO()
-    writer = csv.writer(si)
-    
-    # ヘッダー
-    writer.writerow(['ID', '回答日時', '評価', '訪問目的', '雰囲気', 'おすすめ度', 'コメント', 'AI生成口コミ'])
-    
-    # データ
-    for r in survey_responses:
-        writer.writerow([
-            r.get('id', ''),
-            r.get('timestamp', ''),
-            r.get('rating', ''),
-            r.get('visit_purpose', ''),
-            ', '.join(r.get('atmosphere', [])),
-            r.get('recommend', ''),
-            r.get('comment', ''),
-            r.get('generated_review', '')
-        ])
-    
-    # レスポンス作成
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = "attachment; filename=survey_responses.csv"
-    output.headers["Content-type"] = "text/csv; charset=utf-8-sig"
-    
-    return output
+    """回答データをCSVでエクスポート（T_アンケート回答 をストリーミング出力）"""
+    return _export_responses('csv')
+
+
+@bp.route("/export/jsonl")
+@require_roles(ROLES["ADMIN"], ROLES["TENANT_ADMIN"], ROLES["SYSTEM_ADMIN"])
+def admin_export_jsonl():
+    """回答データを JSON Lines でエクスポート"""
+    return _export_responses('jsonl')
+
+
+def _export_store_ids():
+    """
+    エクスポート対象の店舗ID（?store_id= → セッションの店舗 → テナントの全店舗 の順）
+    テナント外の店舗を指定された場合は None
+    """
+    from ..utils.db import get_db_connection, _sql
+    requested = request.args.get('store_id', type=int) or session.get('store_id')
+    where, params = current_tenant_filter_sql('tenant_id')
+    db = get_db_connection()
+    try:
+        cur = db.cursor()
+        cur.execute(_sql(db, f'SELECT id FROM "T_店舗" WHERE {where} ORDER BY id'), params)
+        allowed = [row[0] for row in cur.fetchall()]
+    finally:
+        db.close()
+    if requested:
+        return [int(requested)] if int(requested) in allowed else None
+    return allowed
+
+
+def _export_responses(fmt):
+    """?store_id= / ?since=YYYY-MM-DD / ?until=YYYY-MM-DD で絞り込んでストリーミング出力する"""
+    since = request.args.get('since') or None
+    until = request.args.get('until') or None
+    try:
+        for value in (since, until):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        flash("期間は YYYY-MM-DD 形式で指定してください", "error")
+        return redirect(request.referrer or url_for("survey_admin.admin_dashboard"))
+
+    store_ids = _export_store_ids()
+    if store_ids is None:
+        flash("この店舗の回答をエクスポートする権限がありません", "error")
+        return redirect(request.referrer or url_for("survey_admin.admin_dashboard"))
+
+    columns = survey_export.question_columns(store_ids)
+    rows = survey_export.iter_response_rows(store_ids, since, until) if store_ids else iter(())
+    if fmt == 'jsonl':
+        body, mimetype = survey_export.iter_jsonl(rows, columns), "application/x-ndjson"
+    else:
+        body, mimetype = survey_export.iter_csv(rows, columns), "text/csv"
+
+    filename = "survey_responses"
+    if len(store_ids) == 1:
+        filename += f"_{store_ids[0]}"
+    if since or until:
+        filename += f"_{since or ''}-{until or ''}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{fmt}",
+            "Content-Type": f"{mimetype}; charset=utf-8",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 # ===== 設定 =====
@@ -173,14 +213,9 @@ def admin_settings():
         'store_name': session.get('store_name', '')
     }
     
-    # 設定ファイルのパス
-    settings_path = os.path.join(DATA_DIR, "settings.json")
-    
     # 設定を読み込み
-    if os.path.exists(settings_path):
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
-    else:
+    settings = load_settings()
+    if not settings:
         settings = {
             "google_review_url": "#",
             "survey_complete_message": "アンケートにご協力いただきありがとうございます！スロットをお楽しみください。"
@@ -218,9 +253,8 @@ def admin_settings():
         settings["survey_complete_message"] = survey_message
         settings["prizes"] = prizes
         
-        # ファイルに保存
-        with open(settings_path, "w", encoding="utf-8") as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+        # ファイルに保存（一時ファイルから置き換えるため書きかけが読まれることはない）
+        save_settings(settings)
         
         flash("設定を更新しました", "success")
         return redirect(url_for("survey_admin.admin_settings"))
@@ -241,10 +275,8 @@ def admin_settings():
     from ..utils.db import get_db_connection, _sql
     db = get_db_connection()
     store_id = session.get('store_id')
-    import sys
-    sys.stderr.write(f"DEBUG admin_settings: store_id from session = {store_id}\n")
-    sys.stderr.write(f"DEBUG admin_settings: session keys = {list(session.keys())}\n")
-    sys.stderr.flush()
+    logger.debug("admin_settings: store_id from session = %s", store_id)
+    logger.debug("admin_settings: session keys = %s", list(session.keys()))
     store = None
     if store_id:
         cur = db.cursor()
@@ -258,11 +290,9 @@ def admin_settings():
                 'slug': row[3],
                 'openai_api_key': row[4]
             }
-        sys.stderr.write(f"DEBUG admin_settings: store = {store}\n")
-        sys.stderr.flush()
+        logger.debug("admin_settings: store = %s", store)
     else:
-        sys.stderr.write("DEBUG admin_settings: store_id is None, cannot fetch store\n")
-        sys.stderr.flush()
+        logger.debug("admin_settings: store_id is None, cannot fetch store")
     
     # AIレビュー設定（業種・指示文）を取得
     ai_review_settings = {'business_type': '', 'ai_instruction': ''}
@@ -271,8 +301,7 @@ def admin_settings():
             import store_db as _store_db
             ai_review_settings = _store_db.get_ai_review_settings(store_id)
         except Exception as e:
-            sys.stderr.write(f"DEBUG admin_settings: ai_review_settings error = {e}\n")
-            sys.stderr.flush()
+            logger.debug("admin_settings: ai_review_settings error = %s", e)
 
     return render_template("admin_settings.html",
                          admin=admin,
@@ -402,6 +431,7 @@ def admin_save_openai_key():
             WHERE id = %s
         '''), (openai_api_key if openai_api_key else None, store_id))
         db.commit()
+        invalidate_openai_keys(store_id)
         flash("OpenAI APIキーを保存しました", "success")
     except Exception as e:
         db.rollback()
@@ -501,9 +531,7 @@ def admin_survey_editor():
         }
         
         # JSONファイルに保存
-        os.makedirs(DATA_DIR, exist_ok=True)
-        with open(survey_config_path, "w", encoding="utf-8") as f:
-            json.dump(survey_config, f, ensure_ascii=False, indent=2)
+        write_json(survey_config_path, survey_config)
         
         # データベースに保存（現在の店舗に対して）
         store_id = session.get('store_id')
@@ -536,11 +564,7 @@ def admin_survey_editor():
     
     if not survey_config:
         # データベースになければJSONファイルから
-        if os.path.exists(survey_config_path):
-            with open(survey_config_path, "r", encoding="utf-8") as f:
-                survey_config = json.load(f)
-        else:
-            survey_config = None
+        survey_config = read_json(survey_config_path)
     
     if not survey_config:
         # デフォルト設定
@@ -6,6 +6,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from ..utils import require_roles, ROLES, get_db_connection, is_tenant_owner, can_manage_tenant_admins
 from ..utils.db import _sql
+from ..utils.openai_clients import invalidate_openai_keys
+import store_db
 from werkzeug.security import generate_password_hash, check_password_hash
 
 bp = Blueprint('tenant_admin', __name__, url_prefix='/tenant_admin')
@@ -79,6 +81,8 @@ def me_edit():
                 cur.execute(_sql(conn, 'UPDATE "T_テナント" SET 名称 = %s, slug = %s, openai_api_key = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = %s'),
                            (name, slug, tenant_id))
             conn.commit()
+            # テナントのキーは配下の全店舗に影響するため全件破棄
+            invalidate_openai_keys()
             flash('テナント情報を更新しました', 'success')
             conn.close()
             return redirect(url_for('tenant_admin.dashboard'))
@@ -236,6 +240,7 @@ def store_new():
                     VALUES (%s, %s, %s)
                 '''), (tenant_id, name, slug))
                 conn.commit()
+                store_db.invalidate_store(slug=slug)
                 conn.close()
                 flash('店舗を作成しました', 'success')
                 return redirect(url_for('tenant_admin.stores'))
@@ -270,6 +275,7 @@ def store_edit(store_id):
                     WHERE id = %s AND tenant_id = %s
                 '''), (name, slug, store_id, tenant_id))
                 conn.commit()
+                store_db.invalidate_store(store_id)
                 flash('店舗情報を更新しました', 'success')
                 conn.close()
                 return redirect(url_for('tenant_admin.store_detail', store_id=store_id))
@@ -309,6 +315,7 @@ def store_delete(store_id):
     else:
         cur.execute(_sql(conn, 'DELETE FROM "T_店舗" WHERE id = %s'), (store_id,))
         conn.commit()
+        store_db.invalidate_store(store_id)
         flash(f'{row[0]} を削除しました', 'success')
     
     conn.close()
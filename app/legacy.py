@@ -10,13 +10,15 @@ from datetime import datetime
 from decimal import Decimal, getcontext
 from openai import OpenAI
 from optimizer import optimize_symbol_probabilities as _optimize_symbol_probabilities
+from app.utils.slot_logic import choice_by_prob
+from app.utils.config import SURVEY_LOG, load_settings, save_settings
+from app.utils.file_store import read_json, write_json
 
 getcontext().prec = 28  # 小数演算の安全側
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(APP_DIR, "data")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
-SURVEY_DATA_PATH = os.path.join(DATA_DIR, "survey_responses.json")
 
 # Google口コミのURL（環境変数またはsettings.jsonから読み込み）
 # 実際のお店のPlace IDを設定してください
@@ -25,15 +27,7 @@ GOOGLE_REVIEW_URL = os.environ.get('GOOGLE_REVIEW_URL', '#')
 
 # settings.jsonからGoogle口コミURLを読み込み
 def _load_google_review_url():
-    settings_path = os.path.join(DATA_DIR, "settings.json")
-    if os.path.exists(settings_path):
-        try:
-            with open(settings_path, "r", encoding="utf-8") as f:
-                settings = json.load(f)
-                return settings.get("google_review_url", GOOGLE_REVIEW_URL)
-        except:
-            pass
-    return GOOGLE_REVIEW_URL
+    return load_settings().get("google_review_url", GOOGLE_REVIEW_URL)
 
 # 起動時に読み込み
 GOOGLE_REVIEW_URL = _load_google_review_url()
@@ -80,11 +74,10 @@ def _default_config() -> Config:
     return cfg
 
 def _load_config() -> Config:
-    if not os.path.exists(CONFIG_PATH):
+    raw = read_json(CONFIG_PATH)
+    if raw is None:
         os.makedirs(DATA_DIR, exist_ok=True)
         return _default_config()
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        raw = json.load(f)
     syms = [Symbol(**s) for s in raw["symbols"]]
     return Config(
         symbols=syms,
@@ -95,25 +88,10 @@ def _load_config() -> Config:
     )
 
 def _save_config(cfg: Config) -> None:
-    os.makedirs(DATA_DIR, exist_ok=True)
-    payload = asdict(cfg)
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-
-def _choice_by_prob(symbols: List[Symbol]) -> Symbol:
-    buckets = []
-    acc = 0
-    for s in symbols:
-        w = max(0, int(round(float(s.prob) * 100)))
-        acc += w
-        buckets.append((acc, s))
-    if acc <= 0:
-        return symbols[-1]
-    r = secrets.randbelow(acc)
-    for edge, s in buckets:
-        if r < edge:
-            return s
-    return symbols[-1]
+    write_json(CONFIG_PATH, asdict(cfg))
+
+# シンボル抽選は app.utils.slot_logic のエイリアス法に統一
+_choice_by_prob = choice_by_prob
 
 # --- 期待値関連 ---
 def _expected_total5_from_inverse(payouts: List[float]) -> float:
@@ -233,19 +211,12 @@ def _prob_total_le(symbols: List[Symbol], spins: int, threshold: float) -> float
 
 # ===== アンケートデータ管理 =====
 def _load_survey_responses():
-    if not os.path.exists(SURVEY_DATA_PATH):
-        return []
-    with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return SURVEY_LOG.records()
 
 def _save_survey_response(response_data):
-    os.makedirs(DATA_DIR, exist_ok=True)
-    responses = _load_survey_responses()
+    # 追記専用ログに1行追加（連番はファイルロック中に採番）
     response_data['timestamp'] = datetime.now().isoformat()
-    response_data['id'] = len(responses) + 1
-    responses.append(response_data)
-    with open(SURVEY_DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(responses, f, ensure_ascii=False, indent=2)
+    SURVEY_LOG.append(response_data, id_field='id')
 
 def _generate_review_text(survey_data):
     """
@@ -374,15 +345,9 @@ def slot_page():
         return redirect(url_for('survey'))
     
     # 設定ファイルからメッセージと景品データを読み込み
-    settings_path = os.path.join(DATA_DIR, "settings.json")
-    survey_complete_message = "アンケートにご協力いただきありがとうございます！スロットをお楽しみください。"
-    prizes = []
-    
-    if os.path.exists(settings_path):
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
-            survey_complete_message = settings.get("survey_complete_message", survey_complete_message)
-            prizes = settings.get("prizes", [])
+    settings = load_settings()
+    survey_complete_message = settings.get("survey_complete_message", "アンケートにご協力いただきありがとうございます！スロットをお楽しみください。")
+    prizes = settings.get("prizes", [])
     
     return render_template("slot.html", survey_complete_message=survey_complete_message, prizes=prizes)
 
@@ -390,13 +355,7 @@ def slot_page():
 def demo_page():
     """デモプレイページ：アンケートなしでスロットを何度でもプレイ可能"""
     # 設定ファイルから景品データを読み込み
-    settings_path = os.path.join(DATA_DIR, "settings.json")
-    prizes = []
-    
-    if os.path.exists(settings_path):
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
-            prizes = settings.get("prizes", [])
+    prizes = load_settings().get("prizes", [])
     
     return render_template("demo.html", prizes=prizes)
 
@@ -790,10 +749,7 @@ def admin_dashboard():
     admin = get_current_admin()
     
     # アンケート回答データを読み込み
-    survey_responses = []
-    if os.path.exists(SURVEY_DATA_PATH):
-        with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-            survey_responses = json.load(f)
+    survey_responses = SURVEY_LOG.records()
     
     # 統計情報を計算
     total_responses = len(survey_responses)
@@ -823,10 +779,7 @@ def admin_responses():
     """全回答データを表示"""
     admin = get_current_admin()
     
-    survey_responses = []
-    if os.path.exists(SURVEY_DATA_PATH):
-        with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-            survey_responses = json.load(f)
+    survey_responses = SURVEY_LOG.records()
     
     # 最新順にソート
     survey_responses.reverse()
@@ -843,10 +796,7 @@ def admin_export_csv():
     from io import StringIO
     from flask import make_response
     
-    survey_responses = []
-    if os.path.exists(SURVEY_DATA_PATH):
-        with open(SURVEY_DATA_PATH, "r", encoding="utf-8") as f:
-            survey_responses = json.load(f)
+    survey_responses = SURVEY_LOG.records()
     
     # CSVデータを作成
     output = StringIO()
@@ -888,14 +838,9 @@ def admin_settings():
     
     admin = get_current_admin()
     
-    # 設定ファイルのパス
-    settings_path = os.path.join(DATA_DIR, "settings.json")
-    
     # 設定を読み込み
-    if os.path.exists(settings_path):
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
-    else:
+    settings = load_settings()
+    if not settings:
         settings = {
             "google_review_url": GOOGLE_REVIEW_URL,
             "survey_complete_message": "アンケートにご協力いただきありがとうございます！スロットをお楽しみください。"
@@ -934,8 +879,7 @@ def admin_settings():
         settings["prizes"] = prizes
         
         # ファイルに保存
-        with open(settings_path, "w", encoding="utf-8") as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+        save_settings(settings)
         
         # グローバル変数を更新
         GOOGLE_REVIEW_URL = google_url
@@ -975,22 +919,10 @@ def admin_save_prizes():
         # 点数で降順ソート
         prizes.sort(key=lambda x: x["min_score"], reverse=True)
         
-        # 設定ファイルのパス
-        settings_path = os.path.join(DATA_DIR, "settings.json")
-        
-        # 設定を読み込み
-        if os.path.exists(settings_path):
-            with open(settings_path, "r", encoding="utf-8") as f:
-                settings = json.load(f)
-        else:
-            settings = {}
-        
         # 景品設定を更新
+        settings = load_settings()
         settings["prizes"] = prizes
-        
-        # ファイルに保存
-        with open(settings_path, "w", encoding="utf-8") as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+        save_settings(settings)
         
         return jsonify({"ok": True})
     except Exception as e:
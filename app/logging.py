@@ -1,25 +1,196 @@
+"""
+ログ設定
+
+ルートロガーには QueueHandler だけを付け、JSON への整形と標準出力への書き込みは
+QueueListener の別スレッドで行う（リクエストのスレッドは書き込みを待たない）。
+
+- LOG_LEVEL でルートのレベル、LOG_LEVELS でモジュールごとのレベルを指定する
+  例: LOG_LEVELS="app.blueprints.slot=DEBUG,app.utils.review_jobs=WARNING"
+- DEBUG のログは LOG_DEBUG_SAMPLE の割合だけ残し、さらに同じ呼び出し箇所ごとに
+  毎秒 LOG_DEBUG_RATE 件までに抑える（捨てた件数は次に出たログの suppressed に入る）
+- キューが満杯のときは待たずに捨てる（捨てた件数は次に出たログの dropped に入る）
+- logger.debug("...", extra={...}) の extra は JSON のフィールドとしてそのまま出力する
+- gunicorn の fork 後は子プロセスで書き込みスレッドを作り直す
+
+呼び出し側は logging.getLogger(__name__) を使い、重い引数は
+logger.isEnabledFor(logging.DEBUG) で囲む（DEBUG が無効なら整形もしない）。
+
+環境変数:
+  LOG_LEVEL          ルートのレベル（既定: DEBUG=1 なら DEBUG、それ以外は INFO）
+  LOG_LEVELS         モジュールごとのレベル（カンマ区切りの logger=LEVEL）
+  LOG_DEBUG_SAMPLE   DEBUG ログを残す割合（0〜1、既定 1）
+  LOG_DEBUG_RATE     呼び出し箇所ごとの DEBUG ログの上限（件/秒、既定 5、0 なら無制限）
+  LOG_QUEUE_SIZE     書き込み待ちキューの上限（既定 10000）
+"""
+import atexit
 import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import threading
+import time
+
+LOG_DEBUG_SAMPLE = float(os.environ.get("LOG_DEBUG_SAMPLE", "1"))
+LOG_DEBUG_RATE = float(os.environ.get("LOG_DEBUG_RATE", "5"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# LogRecord の標準属性（これ以外は extra として出力する）
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         base = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
             "level": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
         }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                base[key] = value
         if record.exc_info:
             base["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(base, ensure_ascii=False)
+        elif record.exc_text:
+            base["exc_info"] = record.exc_text
+        return json.dumps(base, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """DEBUG 以下のログを割合でサンプリングし、呼び出し箇所ごとに毎秒の件数を制限する"""
+
+    def __init__(self, sample=LOG_DEBUG_SAMPLE, rate=LOG_DEBUG_RATE):
+        super().__init__()
+        self.sample = sample
+        self.rate = rate
+        self._windows = {}  # (logger, pathname, lineno) → [秒, 件数]
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            self._attach(record)
+            return True
+        if self.sample < 1 and random.random() >= self.sample:
+            self._skip()
+            return False
+        if self.rate > 0:
+            key = (record.name, record.pathname, record.lineno)
+            second = int(time.monotonic())
+            with self._lock:
+                window = self._windows.get(key)
+                if window is None or window[0] != second:
+                    if len(self._windows) > 10000:
+                        self._windows.clear()
+                    window = self._windows[key] = [second, 0]
+                window[1] += 1
+                if window[1] > self.rate:
+                    self._suppressed += 1
+                    return False
+        self._attach(record)
+        return True
+
+    def _skip(self):
+        with self._lock:
+            self._suppressed += 1
+
+    def _attach(self, record):
+        if not self._suppressed:
+            return
+        with self._lock:
+            record.suppressed, self._suppressed = self._suppressed, 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """キューが満杯なら待たずに捨てる QueueHandler（整形は書き込みスレッド側で行う）"""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 引数を埋め込んだ文字列と例外のテキストだけを持たせる（JSON 化は書き込みスレッドで行う）
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+_listener = None
+
+
+def _start_listener():
+    """新しいキューと書き込みスレッドを用意して _handler につなぐ"""
+    global _listener
+    stream = logging.StreamHandler(stream=sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_handler.queue, stream)
+    _listener.start()
+
+
+def _stop_listener():
+    """キューに残ったログを書き出してから書き込みスレッドを止める"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    try:
+        listener.stop()
+    except Exception:
+        pass
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in (spec or "").split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
 
 def setup_logging(debug: bool = False) -> None:
     """
-    ルートロガーを初期化して、標準出力にJSON形式でログを流します。
+    ルートロガーを初期化して、標準出力にJSON形式でログを流します（書き込みは別スレッド）。
     """
+    global _handler
+    _stop_listener()
+
     root = logging.getLogger()
     root.handlers.clear()
-    root.setLevel(logging.DEBUG if debug else logging.INFO)
-    handler = logging.StreamHandler(stream=sys.stdout)
-    handler.setFormatter(JsonFormatter())
-    root.addHandler(handler)
+    root.setLevel(os.environ.get("LOG_LEVEL", "DEBUG" if debug else "INFO").upper())
+    for name, level in _parse_levels(os.environ.get("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _handler = NonBlockingQueueHandler(None)  # キューは _start_listener() で用意する
+    _handler.addFilter(DebugSampler())
+    root.addHandler(_handler)
+    _start_listener()
+
+
+def _restart_after_fork():
+    # fork 前の書き込みスレッドは子プロセスに引き継がれないため、キューごと作り直す
+    global _listener
+    if _listener is not None:
+        _listener = None
+        _start_listener()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(_stop_listener)
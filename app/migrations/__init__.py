@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+バージョン管理付きスキーママイグレーション
+
+- 適用済みのバージョンは "T_スキーマバージョン" に記録し、未適用のものだけを順番に実行する
+- デプロイ時に1回（Procfile の release フェーズ）、およびアプリ起動時に1回だけ実行する
+- get_db() / get_db_connection() はスキーマを触らない純粋な接続取得になる
+- 適用先は app.utils.db.get_db() と db_config.get_db_connection() の接続先
+  （DATABASE_URL がなくローカルの PostgreSQL に get_db() がつながる開発環境では両方に適用する）
+- 各マイグレーションは1トランザクションで適用し、成功したときだけバージョンを記録する
+  （upgrade() 内の conn.commit() は無視され、失敗すれば DDL ごとロールバックされる）
+
+新しいマイグレーションは vNNNN_<name>.py を追加し、MIGRATIONS に登録する。
+各モジュールは VERSION, NAME, upgrade(cur, conn, db_type) を定義する。
+
+使い方:
+  python -m app.migrations           # 未適用のマイグレーションを適用
+  python -m app.migrations --status  # 適用状況を表示
+"""
+import sys
+
+from . import (
+    v0001_auth_tables,
+    v0002_app_tables,
+    v0003_column_updates,
+    v0004_review_prompt_tables,
+    v0005_reservation_tables,
+    v0006_review_jobs,
+    v0007_secondary_indexes,
+    v0008_survey_rollup,
+    v0009_stamp_daily_unique,
+    v0010_stamp_activity_rollup,
+    v0011_server_sessions,
+)
+
+MIGRATIONS = [
+    v0001_auth_tables,
+    v0002_app_tables,
+    v0003_column_updates,
+    v0004_review_prompt_tables,
+    v0005_reservation_tables,
+    v0006_review_jobs,
+    v0007_secondary_indexes,
+    v0008_survey_rollup,
+    v0009_stamp_daily_unique,
+    v0010_stamp_activity_rollup,
+    v0011_server_sessions,
+]
+
+VERSION_TABLE = "T_スキーマバージョン"
+
+# 複数ワーカーが同時に起動しても1つだけが適用するための PostgreSQL advisory lock キー
+_PG_LOCK_KEY = 72710001
+
+
+def _is_pg(conn) -> bool:
+    from ..utils.db import _is_pg as is_pg
+    return is_pg(conn)
+
+
+def _ensure_version_table(cur, conn):
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS "{VERSION_TABLE}" (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            applied_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def applied_versions(conn) -> set:
+    """適用済みバージョン番号の集合"""
+    cur = conn.cursor()
+    _ensure_version_table(cur, conn)
+    cur.execute(f'SELECT version FROM "{VERSION_TABLE}"')
+    return {row[0] for row in cur.fetchall()}
+
+
+def current_version(conn) -> int:
+    """適用済みの最新バージョン（未適用なら 0）"""
+    return max(applied_versions(conn), default=0)
+
+
+class _UpgradeConnection:
+    """upgrade() に渡す接続（commit() を無視して、コミットはランナーがまとめて行う）"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def pending_migrations(conn) -> list:
+    done = applied_versions(conn)
+    return [m for m in MIGRATIONS if m.VERSION not in done]
+
+
+def _target_connections():
+    """
+    適用先の接続（autocommit でないもの）を順に返す。
+    get_db() と db_config の接続先が異なる（片方だけ PostgreSQL）場合は両方を返す。
+    """
+    from ..utils.db import get_db
+    from db_config import get_db_connection
+    first = get_db(autocommit=False)
+    yield first
+    second = get_db_connection()
+    if _is_pg(second) == _is_pg(first):
+        second.close()
+        return
+    yield second
+
+
+def run_migrations(conn=None) -> list:
+    """
+    未適用のマイグレーションを順番に適用する。
+    conn を渡す場合は autocommit でない接続にすること（省略時は get_db() と db_config の接続先）。
+    戻り値: 今回適用したバージョン番号のリスト
+    """
+    if conn is None:
+        applied = []
+        for target in _target_connections():
+            try:
+                applied += [v for v in _apply(target) if v not in applied]
+            finally:
+                target.close()
+        return applied
+    return _apply(conn)
+
+
+def _apply(conn) -> list:
+    """1つの接続先に未適用のマイグレーションを適用する"""
+    if getattr(getattr(conn, "raw", conn), "autocommit", False):
+        raise ValueError("マイグレーションは autocommit でない接続で実行してください")
+
+    is_pg = _is_pg(conn)
+    db_type = 'postgresql' if is_pg else 'sqlite'
+    ph = '%s' if is_pg else '?'
+    cur = conn.cursor()
+    applied = []
+    if is_pg:
+        cur.execute('SELECT pg_advisory_lock(%s)', (_PG_LOCK_KEY,))
+    try:
+        # ロック取得後に改めて確認（他ワーカーが適用済みの可能性）
+        for migration in pending_migrations(conn):
+            print(f"▶ マイグレーション {migration.VERSION:04d}_{migration.NAME} を適用します ({db_type})")
+            try:
+                if not is_pg:
+                    # SQLite は DDL の前に暗黙の BEGIN を発行しないため明示的に開始する
+                    cur.execute('BEGIN')
+                migration.upgrade(cur, _UpgradeConnection(conn), db_type)
+                cur.execute(
+                    f'INSERT INTO "{VERSION_TABLE}" (version, name) VALUES ({ph}, {ph})',
+                    (migration.VERSION, migration.NAME),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"❌ マイグレーション {migration.VERSION:04d}_{migration.NAME} に失敗しました")
+                raise
+            applied.append(migration.VERSION)
+    finally:
+        if is_pg:
+            cur.execute('SELECT pg_advisory_unlock(%s)', (_PG_LOCK_KEY,))
+            conn.commit()
+
+    if applied:
+        print(f"✓ スキーマをバージョン {applied[-1]} まで更新しました")
+    return applied
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--status" in argv:
+        for conn in _target_connections():
+            try:
+                done = applied_versions(conn)
+                print(f"# {'postgresql' if _is_pg(conn) else 'sqlite'}")
+            finally:
+                conn.close()
+            for m in MIGRATIONS:
+                mark = "✓" if m.VERSION in done else " "
+                print(f"[{mark}] {m.VERSION:04d}_{m.NAME}")
+        return 0
+    run_migrations()
+    return 0
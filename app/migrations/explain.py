@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+主要クエリの実行計画チェック
+
+HOT_QUERIES の各クエリを EXPLAIN し、対象テーブルをフルスキャンしていれば失敗とする。
+インデックスの追加・変更やクエリの書き換え後に実行して、性能の退行を防ぐ。
+
+- 既定: 一時ファイルの SQLite に全マイグレーションを適用し、ダミーデータを投入して確認する
+- --current: 設定中のデータベース（DATABASE_URL）で確認する
+  PostgreSQL では enable_seqscan = off にして、使えるインデックスがない場合だけ Seq Scan が残るようにする
+
+使い方:
+  python -m app.migrations.explain            # 一時 SQLite で確認（終了コード 1 = 失敗あり）
+  python -m app.migrations.explain --rows 50000
+  python -m app.migrations.explain --current
+"""
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from . import run_migrations, _is_pg
+
+# (名前, 対象テーブル, SQL（%s プレースホルダ）, パラメータ)
+HOT_QUERIES = [
+    ("survey_responses_by_store", "T_アンケート回答", '''
+        SELECT id, rating, created_at FROM "T_アンケート回答"
+        WHERE store_id = %s ORDER BY created_at DESC LIMIT 50
+    ''', (1,)),
+    ("survey_responses_page", "T_アンケート回答", '''
+        SELECT id, rating, response_json, created_at FROM "T_アンケート回答"
+        WHERE store_id = %s AND (created_at, id) < (%s, %s)
+        ORDER BY created_at DESC, id DESC LIMIT 51
+    ''', (1, "2024-06-01 00:00:00", 100000)),
+    ("survey_rollup_summary", "T_アンケート集計_日別", '''
+        SELECT COALESCE(SUM(response_count), 0), COALESCE(SUM(rating_sum), 0) FROM "T_アンケート集計_日別"
+        WHERE store_id = %s AND stat_date >= %s
+    ''', (1, "2024-01-01")),
+    ("stamp_daily_grant", "T_スタンプ履歴", '''
+        SELECT id FROM "T_スタンプ履歴"
+        WHERE customer_id = %s AND store_id = %s AND stamp_date = %s
+    ''', (1, 1, "2024-01-01")),
+    ("stamp_history_by_customer", "T_スタンプ履歴", '''
+        SELECT stamps_added, action_type, note, created_at FROM "T_スタンプ履歴"
+        WHERE customer_id = %s AND store_id = %s ORDER BY created_at DESC LIMIT 20
+    ''', (1, 1)),
+    ("stamp_activity_trend", "T_スタンプ集計_日別", '''
+        SELECT stat_date, stamp_grants, rewards_redeemed FROM "T_スタンプ集計_日別"
+        WHERE store_id = %s AND stat_date >= %s
+    ''', (1, "2024-01-01")),
+    ("reward_usage_by_reward", "T_特典利用履歴", '''
+        SELECT COUNT(*) FROM "T_特典利用履歴"
+        WHERE customer_id = %s AND store_id = %s AND reward_id = %s
+    ''', (1, 1, 1)),
+    ("stampcard_mypage_rewards", "T_特典利用履歴", '''
+        SELECT r.id, CASE WHEN used.reward_id IS NULL THEN 0 ELSE 1 END
+        FROM "T_スタンプカード" c
+        LEFT JOIN "T_特典設定" r ON r.store_id = c.store_id AND r.enabled = 1
+        LEFT JOIN (
+            SELECT DISTINCT reward_id FROM "T_特典利用履歴"
+            WHERE customer_id = %s AND store_id = %s AND reward_id IS NOT NULL
+        ) used ON used.reward_id = r.id
+        WHERE c.customer_id = %s AND c.store_id = %s
+    ''', (1, 1, 1, 1)),
+    ("stamp_card_by_customer", "T_スタンプカード", '''
+        SELECT id, current_stamps, total_stamps FROM "T_スタンプカード"
+        WHERE customer_id = %s AND store_id = %s
+    ''', (1, 1)),
+    ("stamp_card_totals_by_store", "T_スタンプカード", '''
+        SELECT COALESCE(SUM(total_stamps), 0) FROM "T_スタンプカード" WHERE store_id = %s
+    ''', (1,)),
+    ("customer_by_phone", "T_顧客", '''
+        SELECT id FROM "T_顧客" WHERE store_id = %s AND phone = %s
+    ''', (1, "090-0000-0001")),
+    ("customer_by_email", "T_顧客", '''
+        SELECT id FROM "T_顧客" WHERE store_id = %s AND email = %s
+    ''', (1, "c1@example.com")),
+    ("customer_login", "T_顧客", '''
+        SELECT id, name, password_hash FROM "T_顧客"
+        WHERE store_id = %s AND (phone = %s OR email = %s)
+    ''', (1, "090-0000-0001", "090-0000-0001")),
+    ("reservations_for_slot", "T_予約", '''
+        SELECT テーブル割当, COUNT(*) FROM "T_予約"
+        WHERE store_id = %s AND 予約日 = %s AND 予約時刻 = %s AND ステータス = 'confirmed'
+        GROUP BY テーブル割当
+    ''', (1, "2024-01-01", "18:00")),
+    ("reservations_by_day", "T_予約", '''
+        SELECT id, 予約時刻, 人数 FROM "T_予約"
+        WHERE store_id = %s AND 予約日 = %s ORDER BY 予約時刻
+    ''', (1, "2024-01-01")),
+]
+
+
+# ===== 実行計画の判定 =====
+def _sqlite_full_scans(cur, sql, params, table):
+    cur.execute("EXPLAIN QUERY PLAN " + sql.replace("%s", "?"), params)
+    plan = [row[3] for row in cur.fetchall()]
+    # "SCAN T_予約" / "SCAN TABLE T_予約" / "SCAN T_予約 USING INDEX ..." はいずれも全件走査
+    pattern = re.compile(r'^SCAN (TABLE )?"?%s"?\b' % re.escape(table))
+    return [d for d in plan if pattern.match(d)], plan
+
+
+def _pg_full_scans(cur, sql, params, table):
+    cur.execute("SET LOCAL enable_seqscan = off")
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    raw = cur.fetchone()[0]
+    root = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    found, plan = [], []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        desc = node["Node Type"] + (f' on {node["Relation Name"]}' if "Relation Name" in node else "")
+        plan.append(desc)
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == table:
+            found.append(desc)
+        stack.extend(node.get("Plans", []))
+    return found, plan
+
+
+def check_query_plans(conn, queries=HOT_QUERIES, verbose=False):
+    """各クエリの実行計画を確認し、フルスキャンになったクエリの (名前, 計画) を返す"""
+    is_pg = _is_pg(conn)
+    failures = []
+    cur = conn.cursor()
+    for name, table, sql, params in queries:
+        try:
+            if is_pg:
+                scans, plan = _pg_full_scans(cur, sql, params, table)
+            else:
+                scans, plan = _sqlite_full_scans(cur, sql, params, table)
+        finally:
+            if is_pg:
+                conn.rollback()  # SET LOCAL を戻す
+        if scans:
+            failures.append((name, plan))
+            print(f"❌ {name}: {' / '.join(scans)}")
+        else:
+            print(f"✓ {name}")
+        if verbose:
+            for line in plan:
+                print(f"    {line}")
+    return failures
+
+
+# ===== 一時 SQLite へのダミーデータ投入 =====
+def seed_sqlite(conn, rows=20000, stores=20):
+    """主要テーブルに店舗 stores 件分のダミーデータを rows 件ずつ入れて ANALYZE する"""
+    rnd = random.Random(0)
+    cur = conn.cursor()
+    base = datetime(2024, 1, 1)
+    customers = max(1, rows // 10)
+
+    def ts(i):
+        return (base + timedelta(minutes=i * 7)).strftime('%Y-%m-%d %H:%M:%S')
+
+    cur.executemany(
+        'INSERT INTO "T_顧客" (store_id, phone, email, name) VALUES (?, ?, ?, ?)',
+        [(c % stores + 1, f"090-0000-{c:04d}", f"c{c}@example.com", f"顧客{c}")
+         for c in range(1, customers + 1)])
+    cur.executemany(
+        'INSERT INTO "T_スタンプカード" (customer_id, store_id, current_stamps, total_stamps) VALUES (?, ?, ?, ?)',
+        [(c, c % stores + 1, c % 10, c % 30) for c in range(1, customers + 1)])
+    cur.executemany(
+        'INSERT INTO "T_アンケート回答" (store_id, rating, created_at) VALUES (?, ?, ?)',
+        [(rnd.randint(1, stores), rnd.randint(1, 5), ts(i)) for i in range(rows)])
+    cur.executemany(
+        'INSERT INTO "T_スタンプ履歴" (card_id, customer_id, store_id, action_type, created_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        [(c, c, c % stores + 1, 'add' if i % 5 else 'use', ts(i))
+         for i, c in ((i, rnd.randint(1, customers)) for i in range(rows))])
+    cur.executemany(
+        'INSERT INTO "T_特典利用履歴" (card_id, customer_id, store_id, stamps_used, reward_id, created_at) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        [(c, c, c % stores + 1, 10, rnd.randint(1, 3), ts(i))
+         for i, c in ((i, rnd.randint(1, customers)) for i in range(rows // 5))])
+    cur.executemany(
+        'INSERT INTO "T_予約" (store_id, 予約番号, 予約日, 予約時刻, 人数, 顧客名, 顧客電話番号, ステータス) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [(rnd.randint(1, stores), f"R{i:08d}", (base + timedelta(days=i % 365)).strftime('%Y-%m-%d'),
+          f"{17 + i % 5}:00", 2, f"顧客{i}", "090-0000-0000",
+          'confirmed' if i % 10 else 'cancelled')
+         for i in range(rows)])
+    conn.commit()
+    cur.execute('ANALYZE')
+    conn.commit()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    verbose = "-v" in argv or "--verbose" in argv
+    if "--current" in argv:
+        from db_config import get_db_connection
+        conn = get_db_connection()
+        try:
+            failures = check_query_plans(conn, verbose=verbose)
+        finally:
+            conn.close()
+    else:
+        rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 20000
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(path)
+            try:
+                run_migrations(conn)
+                seed_sqlite(conn, rows=rows)
+                failures = check_query_plans(conn, verbose=verbose)
+            finally:
+                conn.close()
+        finally:
+            os.remove(path)
+    if failures:
+        print(f"❌ {len(failures)} 件のクエリがフルスキャンになっています")
+        return 1
+    print(f"✓ {len(HOT_QUERIES)} 件のクエリはすべてインデックスを使用しています")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+マイグレーション共通ヘルパー
+SQLiteとPostgreSQLの両方に対応
+"""
+
+
+def column_types(db_type):
+    """(連番主キー型, 作成日時型) を返す（AUTO INCREMENT の構文がDBごとに異なる）"""
+    if db_type == 'postgresql':
+        return 'SERIAL PRIMARY KEY', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+    return 'INTEGER PRIMARY KEY AUTOINCREMENT', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+
+
+def add_column_if_not_exists(cur, conn, table_name, column_name, column_def, db_type):
+    """
+    既存テーブルにカラムが存在しない場合のみ追加
+    エラーは呼び出し元（マイグレーションのランナー）に伝え、バージョンを記録させない
+    """
+    if db_type == 'postgresql':
+        # PostgreSQLの場合
+        cur.execute(f"""
+            SELECT column_name FROM information_schema.columns 
+            WHERE table_name = '{table_name}' AND column_name = '{column_name}'
+        """)
+        exists = cur.fetchone() is not None
+    else:
+        # SQLiteの場合
+        cur.execute(f'PRAGMA table_info("{table_name}")')
+        exists = column_name in [row[1] for row in cur.fetchall()]
+    if exists:
+        print(f"  - {table_name}.{column_name} カラムは既に存在します")
+        return
+    try:
+        cur.execute(f'ALTER TABLE "{table_name}" ADD COLUMN {column_name} {column_def}')
+    except Exception as e:
+        print(f"  ! {table_name}.{column_name} カラム追加エラー: {e}")
+        raise
+    print(f"  ✓ {table_name}.{column_name} カラムを追加しました")
+
+
+def table_exists(cur, table_name, db_type):
+    """テーブルが存在するか確認"""
+    if db_type == 'postgresql':
+        cur.execute(f"""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables 
+                WHERE table_name = '{table_name}'
+            )
+        """)
+        return cur.fetchone()[0]
+    cur.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
+    return cur.fetchone() is not None
+
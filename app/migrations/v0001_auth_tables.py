@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+ログイン・権限管理の基本テーブル（旧 app.utils.db.init_schema）
+- T_管理者（system_admin / tenant_admin / admin ログイン用）
+- T_従業員（employee ログイン用）
+- T_テナント／T_店舗 と各種中間テーブル
+"""
+
+VERSION = 1
+NAME = "auth_tables"
+
+
+def upgrade(cur, conn, db_type):
+    # ---- T_管理者 ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_管理者"(
+            id               INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            login_id         TEXT UNIQUE NOT NULL,
+            name             TEXT NOT NULL,
+            email            TEXT NOT NULL,
+            password_hash    TEXT NOT NULL,
+            role             TEXT DEFAULT 'admin',
+            tenant_id        INTEGER,
+            active           INTEGER DEFAULT 1,
+            is_owner         INTEGER DEFAULT 0,
+            can_manage_admins INTEGER DEFAULT 0,
+            openai_api_key   TEXT,
+            created_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_管理者"(
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            login_id         TEXT UNIQUE NOT NULL,
+            name             TEXT NOT NULL,
+            email            TEXT NOT NULL,
+            password_hash    TEXT NOT NULL,
+            role             TEXT DEFAULT 'admin',
+            tenant_id        INTEGER,
+            active           INTEGER DEFAULT 1,
+            is_owner         INTEGER DEFAULT 0,
+            can_manage_admins INTEGER DEFAULT 0,
+            openai_api_key   TEXT,
+            created_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+
+    # ---- T_従業員 ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_従業員"(
+            id            INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            email         TEXT UNIQUE NOT NULL,
+            login_id      TEXT UNIQUE NOT NULL,
+            name          TEXT NOT NULL,
+            password_hash TEXT,
+            tenant_id     INTEGER,
+            role          TEXT DEFAULT 'employee',
+            created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_従業員"(
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            email         TEXT UNIQUE NOT NULL,
+            login_id      TEXT UNIQUE NOT NULL,
+            name          TEXT NOT NULL,
+            password_hash TEXT,
+            tenant_id     INTEGER,
+            role          TEXT DEFAULT 'employee',
+            created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+
+    # ---- T_テナント ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_テナント"(
+            id          INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            名称        TEXT NOT NULL,
+            slug        TEXT UNIQUE NOT NULL,
+            有効        INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_テナント"(
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            名称        TEXT NOT NULL,
+            slug        TEXT UNIQUE NOT NULL,
+            有効        INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+
+    # ---- T_店舗 ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_店舗"(
+            id          INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            tenant_id   INTEGER NOT NULL,
+            名称        TEXT NOT NULL,
+            slug        TEXT NOT NULL,
+            有効        INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tenant_id, slug)
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_店舗"(
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id   INTEGER NOT NULL,
+            名称        TEXT NOT NULL,
+            slug        TEXT NOT NULL,
+            有効        INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tenant_id, slug)
+        )''')
+
+    # ---- T_テナント管理者_テナント (多対多関係) ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_テナント管理者_テナント"(
+            id                  INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            tenant_admin_id     INTEGER NOT NULL,
+            tenant_id           INTEGER NOT NULL,
+            created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tenant_admin_id, tenant_id)
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_テナント管理者_テナント"(
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_admin_id     INTEGER NOT NULL,
+            tenant_id           INTEGER NOT NULL,
+            created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tenant_admin_id, tenant_id)
+        )''')
+
+    # ---- T_管理者_店舗 (多対多関係) ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_管理者_店舗"(
+            id          INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            admin_id    INTEGER NOT NULL,
+            store_id    INTEGER NOT NULL,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(admin_id, store_id)
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_管理者_店舗"(
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id    INTEGER NOT NULL,
+            store_id    INTEGER NOT NULL,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(admin_id, store_id)
+        )''')
+
+    # ---- T_従業員_店舗 (多対多関係) ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_従業員_店舗"(
+            id              INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            employee_id     INTEGER NOT NULL,
+            store_id        INTEGER NOT NULL,
+            created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(employee_id, store_id)
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_従業員_店舗"(
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id     INTEGER NOT NULL,
+            store_id        INTEGER NOT NULL,
+            created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(employee_id, store_id)
+        )''')
+
+    # ---- T_テナントアプリ設定 ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_テナントアプリ設定"(
+            id          INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            tenant_id   INTEGER NOT NULL,
+            app_name    TEXT NOT NULL,
+            enabled     INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tenant_id, app_name)
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_テナントアプリ設定"(
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id   INTEGER NOT NULL,
+            app_name    TEXT NOT NULL,
+            enabled     INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(tenant_id, app_name)
+        )''')
+
+    # ---- T_店舗アプリ設定 ----
+    if db_type == 'postgresql':
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_店舗アプリ設定"(
+            id          INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            store_id    INTEGER NOT NULL,
+            app_name    TEXT NOT NULL,
+            enabled     INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(store_id, app_name)
+        )''')
+    else:
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_店舗アプリ設定"(
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_id    INTEGER NOT NULL,
+            app_name    TEXT NOT NULL,
+            enabled     INTEGER DEFAULT 1,
+            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(store_id, app_name)
+        )''')
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+既存テーブルへのカラム追加（旧 init_db.py / update_database_schema.py /
+add_ai_review_settings.py / add_slot_spin_count_column.py）
+"""
+from .helpers import table_exists, add_column_if_not_exists
+
+VERSION = 3
+NAME = "column_updates"
+
+
+def upgrade(cur, conn, db_type):
+    print("\n" + "-" * 60)
+    print("既存テーブルのカラム確認・追加を開始します")
+    print("-" * 60)
+
+    # T_テナントテーブルのカラム追加
+    if table_exists(cur, 'T_テナント', db_type):
+        add_column_if_not_exists(cur, conn, 'T_テナント', 'openai_api_key', 'TEXT DEFAULT NULL', db_type)
+        add_column_if_not_exists(cur, conn, 'T_テナント', 'updated_at', 'TIMESTAMP DEFAULT NULL', db_type)
+
+    # T_店舗テーブルのカラム追加
+    if table_exists(cur, 'T_店舗', db_type):
+        add_column_if_not_exists(cur, conn, 'T_店舗', 'openai_api_key', 'TEXT DEFAULT NULL', db_type)
+        add_column_if_not_exists(cur, conn, 'T_店舗', 'updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP', db_type)
+
+    # T_店舗_Google設定テーブルのカラム追加
+    if table_exists(cur, 'T_店舗_Google設定', db_type):
+        add_column_if_not_exists(cur, conn, 'T_店舗_Google設定', 'slot_spin_count', 'INTEGER DEFAULT 1', db_type)
+        add_column_if_not_exists(cur, conn, 'T_店舗_Google設定', 'show_slot_review_button', 'INTEGER DEFAULT 1', db_type)
+
+    # T_管理者テーブルのカラム追加
+    if table_exists(cur, 'T_管理者', db_type):
+        add_column_if_not_exists(cur, conn, 'T_管理者', 'email', 'TEXT', db_type)
+        add_column_if_not_exists(cur, conn, 'T_管理者', 'is_owner', 'INTEGER DEFAULT 0', db_type)
+        add_column_if_not_exists(cur, conn, 'T_管理者', 'can_manage_admins', 'INTEGER DEFAULT 0', db_type)
+        add_column_if_not_exists(cur, conn, 'T_管理者', 'active', 'INTEGER DEFAULT 1', db_type)
+        add_column_if_not_exists(cur, conn, 'T_管理者', 'updated_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP', db_type)
+        add_column_if_not_exists(cur, conn, 'T_管理者', 'openai_api_key', 'TEXT DEFAULT NULL', db_type)
+
+    # T_従業員テーブルのカラム追加
+    if table_exists(cur, 'T_従業員', db_type):
+        add_column_if_not_exists(cur, conn, 'T_従業員', 'active', 'INTEGER DEFAULT 1', db_type)
+
+    # T_店舗_アンケート設定テーブルのカラム追加
+    if table_exists(cur, 'T_店舗_アンケート設定', db_type):
+        add_column_if_not_exists(cur, conn, 'T_店舗_アンケート設定', 'openai_api_key', 'TEXT DEFAULT NULL', db_type)
+        add_column_if_not_exists(cur, conn, 'T_店舗_アンケート設定', 'title', "TEXT DEFAULT 'お店アンケート'", db_type)
+        add_column_if_not_exists(cur, conn, 'T_店舗_アンケート設定', 'business_type', "TEXT DEFAULT ''", db_type)
+        add_column_if_not_exists(cur, conn, 'T_店舗_アンケート設定', 'ai_instruction', "TEXT DEFAULT ''", db_type)
+
+    # T_店舗_スロット設定テーブルのカラム追加
+    if table_exists(cur, 'T_店舗_スロット設定', db_type):
+        add_column_if_not_exists(cur, conn, 'T_店舗_スロット設定', 'openai_api_key', 'TEXT DEFAULT NULL', db_type)
+
+    # T_アンケート回答テーブルのカラム追加
+    if table_exists(cur, 'T_アンケート回答', db_type):
+        add_column_if_not_exists(cur, conn, 'T_アンケート回答', 'generated_review', 'TEXT', db_type)
+        add_column_if_not_exists(cur, conn, 'T_アンケート回答', 'response_json', 'TEXT', db_type)
+        add_column_if_not_exists(cur, conn, 'T_アンケート回答', 'visit_purpose', 'TEXT', db_type)
+        add_column_if_not_exists(cur, conn, 'T_アンケート回答', 'atmosphere', 'TEXT', db_type)
+        add_column_if_not_exists(cur, conn, 'T_アンケート回答', 'recommend', 'TEXT', db_type)
+        add_column_if_not_exists(cur, conn, 'T_アンケート回答', 'comment', 'TEXT', db_type)
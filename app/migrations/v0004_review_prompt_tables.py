@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+口コミ投稿促進設定テーブル（旧 init_db.py / migrate_review_prompt_settings.py /
+add_review_prompt_settings.py）
+"""
+from .helpers import column_types, table_exists, add_column_if_not_exists
+
+VERSION = 4
+NAME = "review_prompt_tables"
+
+
+def upgrade(cur, conn, db_type):
+    serial_type, timestamp_type = column_types(db_type)
+
+    print("\n" + "-" * 60)
+    print("口コミ投稿促進設定テーブルの作成を開始します")
+    print("-" * 60)
+
+    # 1. T_店舗_口コミ投稿促進設定テーブル
+    if not table_exists(cur, 'T_店舗_口コミ投稿促進設定', db_type):
+        print("\n✓ T_店舗_口コミ投稿促進設定テーブルを作成します")
+        cur.execute(f'''
+            CREATE TABLE "T_店舗_口コミ投稿促進設定" (
+                id                  {serial_type},
+                store_id            INTEGER NOT NULL UNIQUE,
+                review_prompt_mode  TEXT DEFAULT 'all',
+                created_at          {timestamp_type},
+                updated_at          TIMESTAMP DEFAULT NULL,
+                FOREIGN KEY (store_id) REFERENCES "T_店舗"(id) ON DELETE CASCADE
+            )
+        ''')
+        conn.commit()
+        print("✅ T_店舗_口コミ投稿促進設定テーブルを作成しました")
+    else:
+        print("✅ T_店舗_口コミ投稿促進設定テーブルは既に存在します")
+
+    # 2. T_口コミ投稿促進設定ログテーブル
+    if not table_exists(cur, 'T_口コミ投稿促進設定ログ', db_type):
+        print("\n✓ T_口コミ投稿促進設定ログテーブルを作成します")
+        cur.execute(f'''
+            CREATE TABLE "T_口コミ投稿促進設定ログ" (
+                id                      {serial_type},
+                store_id                INTEGER NOT NULL,
+                user_id                 INTEGER,
+                review_prompt_mode      TEXT NOT NULL,
+                warnings_shown          INTEGER DEFAULT 0,
+                checkboxes_confirmed    INTEGER DEFAULT 0,
+                created_at              {timestamp_type},
+                FOREIGN KEY (store_id) REFERENCES "T_店舗"(id) ON DELETE CASCADE,
+                FOREIGN KEY (user_id) REFERENCES "T_管理者"(id) ON DELETE SET NULL
+            )
+        ''')
+        conn.commit()
+        print("✅ T_口コミ投稿促進設定ログテーブルを作成しました")
+    else:
+        print("✅ T_口コミ投稿促進設定ログテーブルは既に存在します")
+
+    # 3. 既存の店舗にデフォルト設定（全ての評価で投稿を促す）を追加
+    cur.execute('''
+        INSERT INTO "T_店舗_口コミ投稿促進設定" (store_id, review_prompt_mode)
+        SELECT s.id, 'all' FROM "T_店舗" s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM "T_店舗_口コミ投稿促進設定" r WHERE r.store_id = s.id
+        )
+    ''')
+    conn.commit()
+
+    # 4. T_店舗_Google設定.review_prompt_mode
+    # 'all' = 全ての評価に投稿を促す（デフォルト）／'high_rating_only' = 星4以上のみ
+    add_column_if_not_exists(cur, conn, 'T_店舗_Google設定', 'review_prompt_mode', "TEXT DEFAULT 'all'", db_type)
+
+    # 5. T_店舗_Google設定_ログテーブル（リスク設定の変更履歴）
+    if db_type == 'postgresql':
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS "T_店舗_Google設定_ログ" (
+                id                      {serial_type},
+                store_id                INTEGER NOT NULL,
+                admin_id                INTEGER,
+                action                  TEXT NOT NULL,
+                old_value               TEXT,
+                new_value               TEXT,
+                warnings_shown          BOOLEAN DEFAULT FALSE,
+                checkboxes_confirmed    BOOLEAN DEFAULT FALSE,
+                ip_address              TEXT,
+                user_agent              TEXT,
+                created_at              {timestamp_type}
+            )
+        ''')
+    else:
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS "T_店舗_Google設定_ログ" (
+                id                      {serial_type},
+                store_id                INTEGER NOT NULL,
+                admin_id                INTEGER,
+                action                  TEXT NOT NULL,
+                old_value               TEXT,
+                new_value               TEXT,
+                warnings_shown          INTEGER DEFAULT 0,
+                checkboxes_confirmed    INTEGER DEFAULT 0,
+                ip_address              TEXT,
+                user_agent              TEXT,
+                created_at              {timestamp_type},
+                FOREIGN KEY (store_id) REFERENCES "T_店舗"(id) ON DELETE CASCADE
+            )
+        ''')
+    conn.commit()
+    print("✓ T_店舗_Google設定_ログテーブルを確認しました")
+
+    # 6. T_店舗_Google設定_リマインドテーブル（定期リマインドの送信履歴）
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS "T_店舗_Google設定_リマインド" (
+            id                  {serial_type},
+            store_id            INTEGER NOT NULL,
+            reminded_at         {timestamp_type},
+            review_prompt_mode  TEXT,
+            action_taken        TEXT,
+            FOREIGN KEY (store_id) REFERENCES "T_店舗"(id) ON DELETE CASCADE
+        )
+    ''')
+    conn.commit()
+    print("✓ T_店舗_Google設定_リマインドテーブルを確認しました")
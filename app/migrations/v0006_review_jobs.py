@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+AI口コミ生成ジョブテーブル（app.utils.review_jobs が使用）
+"""
+from .helpers import column_types
+
+VERSION = 6
+NAME = "review_jobs"
+
+
+def upgrade(cur, conn, db_type):
+    serial_type, timestamp_type = column_types(db_type)
+
+    # 実行予定時刻・ロック時刻は DB 間で比較しやすいよう UNIX 秒で持つ
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS "T_口コミ生成ジョブ" (
+            id              {serial_type},
+            store_id        INTEGER NOT NULL,
+            response_id     INTEGER DEFAULT NULL,
+            taste           TEXT DEFAULT NULL,
+            payload_json    TEXT NOT NULL,
+            status          TEXT NOT NULL DEFAULT 'queued',
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            max_attempts    INTEGER NOT NULL DEFAULT 3,
+            run_after       DOUBLE PRECISION NOT NULL DEFAULT 0,
+            locked_at       DOUBLE PRECISION DEFAULT NULL,
+            result_text     TEXT DEFAULT NULL,
+            error           TEXT DEFAULT NULL,
+            created_at      {timestamp_type},
+            updated_at      TIMESTAMP DEFAULT NULL,
+            FOREIGN KEY (store_id) REFERENCES "T_店舗"(id)
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_review_jobs_status ON "T_口コミ生成ジョブ"(status, run_after)')
+    conn.commit()
+    print("✓ T_口コミ生成ジョブテーブルを確認しました")
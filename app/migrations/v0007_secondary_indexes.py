@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+よく使う検索条件のセカンダリインデックス
+
+各インデックスが対象とするクエリは app/migrations/explain.py の HOT_QUERIES を参照。
+（python -m app.migrations.explain で実行計画にフルスキャンがないことを確認できる）
+
+T_顧客 (store_id, phone) / (store_id, email) と T_スタンプカード (customer_id, store_id) は
+UNIQUE 制約のインデックスがあるため追加しない。
+"""
+from .helpers import table_exists
+
+VERSION = 7
+NAME = "secondary_indexes"
+
+# (インデックス名, テーブル, カラム)
+INDEXES = [
+    # 店舗ごとの回答一覧（ORDER BY created_at）と件数・評価分布
+    ("idx_survey_responses_store_created", "T_アンケート回答", "store_id, created_at"),
+    ("idx_survey_responses_store_rating", "T_アンケート回答", "store_id, rating"),
+    # 顧客のスタンプ履歴と「本日付与済みか」の判定（created_at の日付範囲で検索する）
+    ("idx_stamp_history_customer_created", "T_スタンプ履歴", "customer_id, store_id, created_at"),
+    # 店舗のスタンプ付与数推移
+    ("idx_stamp_history_store_action_created", "T_スタンプ履歴", "store_id, action_type, created_at"),
+    # 特典ごとの利用回数と、店舗の特典利用数推移
+    ("idx_reward_usage_customer_reward", "T_特典利用履歴", "customer_id, store_id, reward_id"),
+    ("idx_reward_usage_store_created", "T_特典利用履歴", "store_id, created_at"),
+    # 店舗の統計（スタンプカードの合計）
+    ("idx_stamp_cards_store", "T_スタンプカード", "store_id"),
+    # 日ごと・時刻ごとの予約状況
+    ("idx_reservations_store_slot", "T_予約", "store_id, 予約日, 予約時刻, ステータス"),
+]
+
+
+def upgrade(cur, conn, db_type):
+    for name, table, columns in INDEXES:
+        if not table_exists(cur, table, db_type):
+            print(f"  - {table} がないため {name} をスキップしました")
+            continue
+        cols = ", ".join(f'"{c.strip()}"' for c in columns.split(","))
+        cur.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}"({cols})')
+        print(f"  ✓ {name}")
+    if db_type == 'postgresql':
+        for table in sorted({t for _, t, _ in INDEXES}):
+            if table_exists(cur, table, db_type):
+                cur.execute(f'ANALYZE "{table}"')
+    else:
+        cur.execute('ANALYZE')
+    conn.commit()
+    print("✓ セカンダリインデックスを作成しました")
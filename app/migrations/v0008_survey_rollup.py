@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+アンケート統計の日別集計テーブル（app.utils.survey_rollup が使用）
+
+既存の回答から初期値を投入する。以後は回答の保存時に加算される。
+"""
+from .helpers import table_exists
+
+VERSION = 8
+NAME = "survey_rollup"
+
+
+def upgrade(cur, conn, db_type):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_アンケート集計_日別" (
+            store_id        INTEGER NOT NULL,
+            stat_date       TEXT NOT NULL,
+            response_count  INTEGER NOT NULL DEFAULT 0,
+            rating_sum      INTEGER NOT NULL DEFAULT 0,
+            rating_1        INTEGER NOT NULL DEFAULT 0,
+            rating_2        INTEGER NOT NULL DEFAULT 0,
+            rating_3        INTEGER NOT NULL DEFAULT 0,
+            rating_4        INTEGER NOT NULL DEFAULT 0,
+            rating_5        INTEGER NOT NULL DEFAULT 0,
+            updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (store_id, stat_date)
+        )
+    ''')
+
+    if table_exists(cur, "T_アンケート回答", db_type):
+        histogram = ', '.join(f'SUM(CASE WHEN rating = {i} THEN 1 ELSE 0 END)' for i in range(1, 6))
+        cur.execute('DELETE FROM "T_アンケート集計_日別"')
+        cur.execute(f'''
+            INSERT INTO "T_アンケート集計_日別" (
+                store_id, stat_date, response_count, rating_sum,
+                rating_1, rating_2, rating_3, rating_4, rating_5
+            )
+            SELECT store_id, CAST(DATE(created_at) AS TEXT), COUNT(*), COALESCE(SUM(rating), 0), {histogram}
+            FROM "T_アンケート回答"
+            GROUP BY store_id, CAST(DATE(created_at) AS TEXT)
+        ''')
+    conn.commit()
+    print("✓ T_アンケート集計_日別テーブルを作成しました")
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+QRコードによるスタンプ付与を「顧客 × 店舗 × 日付」で1回に制限する一意制約（app.utils.stamps が使用）
+
+T_スタンプ履歴 に stamp_date を追加し、(customer_id, store_id, stamp_date) の UNIQUE インデックスを作る。
+stamp_date は QR スキャンによる付与にだけ入れる（管理者の手動付与・特典利用は NULL のため制約の対象外）。
+既存の履歴は、1日に複数回付与されている場合も最初の1件だけに日付を入れる。
+"""
+from .helpers import add_column_if_not_exists, table_exists
+
+VERSION = 9
+NAME = "stamp_daily_unique"
+
+
+def upgrade(cur, conn, db_type):
+    if not table_exists(cur, "T_スタンプ履歴", db_type):
+        print("  - T_スタンプ履歴 がないためスキップしました")
+        return
+
+    add_column_if_not_exists(cur, conn, "T_スタンプ履歴", "stamp_date", "TEXT", db_type)
+
+    cur.execute('''
+        UPDATE "T_スタンプ履歴"
+        SET stamp_date = CAST(DATE(created_at) AS TEXT)
+        WHERE id IN (
+            SELECT MIN(id) FROM "T_スタンプ履歴"
+            WHERE action_type = 'add' AND created_by = 'customer'
+            GROUP BY customer_id, store_id, DATE(created_at)
+        )
+        AND stamp_date IS NULL
+    ''')
+    cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_stamp_history_daily
+        ON "T_スタンプ履歴"(customer_id, store_id, stamp_date)
+    ''')
+    conn.commit()
+    print("✓ T_スタンプ履歴 に1日1回の付与制約を追加しました")
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+スタンプ・特典利用の日別集計テーブル（app.utils.stamp_rollup が使用）
+
+既存の T_スタンプ履歴 / T_特典利用履歴 から初期値を投入する。以後は付与・特典利用の際に加算される。
+"""
+from .helpers import table_exists
+
+VERSION = 10
+NAME = "stamp_activity_rollup"
+
+
+def upgrade(cur, conn, db_type):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_スタンプ集計_日別" (
+            store_id          INTEGER NOT NULL,
+            stat_date         TEXT NOT NULL,
+            stamp_grants      INTEGER NOT NULL DEFAULT 0,
+            stamps_added      INTEGER NOT NULL DEFAULT 0,
+            stamps_removed    INTEGER NOT NULL DEFAULT 0,
+            rewards_redeemed  INTEGER NOT NULL DEFAULT 0,
+            updated_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (store_id, stat_date)
+        )
+    ''')
+
+    if table_exists(cur, "T_スタンプ履歴", db_type) and table_exists(cur, "T_特典利用履歴", db_type):
+        cur.execute('DELETE FROM "T_スタンプ集計_日別"')
+        cur.execute('''
+            INSERT INTO "T_スタンプ集計_日別" (
+                store_id, stat_date, stamp_grants, stamps_added, stamps_removed, rewards_redeemed
+            )
+            SELECT store_id, stat_date, SUM(grants), SUM(added), SUM(removed), SUM(redeemed)
+            FROM (
+                SELECT store_id, CAST(DATE(created_at) AS TEXT) AS stat_date,
+                       CASE WHEN action_type = 'add' THEN 1 ELSE 0 END AS grants,
+                       CASE WHEN action_type = 'add' THEN stamps_added ELSE 0 END AS added,
+                       CASE WHEN action_type = 'remove' THEN -stamps_added ELSE 0 END AS removed,
+                       0 AS redeemed
+                FROM "T_スタンプ履歴"
+                UNION ALL
+                SELECT store_id, CAST(DATE(created_at) AS TEXT), 0, 0, 0, 1
+                FROM "T_特典利用履歴"
+            ) activity
+            GROUP BY store_id, stat_date
+        ''')
+    conn.commit()
+    print("✓ T_スタンプ集計_日別テーブルを作成しました")
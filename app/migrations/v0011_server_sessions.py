@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+サーバー側セッションの保存テーブル（app.utils.server_session が使用）
+
+Cookie にはセッションIDだけを入れ、中身はこの表に置く。
+expires_at は UNIX 秒（DB のタイムゾーン設定に依存しない）。期限切れの行はバックグラウンドで削除される。
+"""
+
+VERSION = 11
+NAME = "server_sessions"
+
+
+def upgrade(cur, conn, db_type):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS "T_セッション" (
+            sid         TEXT PRIMARY KEY,
+            rev         INTEGER NOT NULL DEFAULT 0,
+            data        TEXT NOT NULL,
+            expires_at  BIGINT NOT NULL,
+            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_session_expires ON "T_セッション"(expires_at)')
+    conn.commit()
+    print("✓ T_セッションテーブルを作成しました")
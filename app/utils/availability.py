@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+予約の空席表
+
+1日分（または連続する数日分）のテーブル設定と確定済み予約を1接続・3クエリで読み込み、
+時間枠 × テーブル種別の残数をメモリ上で組み立てる。
+/api/time_slots・/api/availability・予約登録時の空席確認はすべてここから答える。
+
+空席の判定は従来どおり:
+  座席数が人数以上のテーブル種別を座席数の小さい順に見て、
+  その時刻の確定予約数がテーブル数未満のものがあれば空席あり（最初に見つかった種別を割り当てる）
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+from db_config import get_db_connection, get_cursor, execute_query
+
+# T_店舗_予約設定 がない店舗の既定値
+DEFAULT_SETTINGS = {
+    '営業開始時刻': '11:00',
+    '営業終了時刻': '22:00',
+    '最終入店時刻': '21:00',
+    '予約単位_分': 30,
+    '予約受付日数': 60,
+    '予約受付可否': 1,
+}
+
+# 一度に先読みできる日数の上限
+MAX_DAYS = 14
+
+
+def _settings_dict(row) -> Dict[str, Any]:
+    settings = dict(DEFAULT_SETTINGS)
+    if row:
+        for key in row.keys():
+            if row[key] is not None:
+                settings[key] = row[key]
+    return settings
+
+
+def slot_times(settings: Dict[str, Any]) -> List[str]:
+    """営業開始時刻〜最終入店時刻の予約単位ごとの時刻（'HH:MM'）"""
+    start = datetime.strptime(settings['営業開始時刻'], '%H:%M')
+    end = datetime.strptime(settings['最終入店時刻'], '%H:%M')
+    interval = timedelta(minutes=int(settings['予約単位_分']) or 30)
+    times = []
+    current = start
+    while current <= end:
+        times.append(current.strftime('%H:%M'))
+        current += interval
+    return times
+
+
+class DayAvailability:
+    """1日分の空席表（時間枠 × テーブル種別の予約数）"""
+
+    def __init__(self, date: str, settings: Dict[str, Any], tables: List[Dict[str, Any]],
+                 reserved: Dict[Tuple[str, str], int]):
+        self.date = date
+        self.settings = settings
+        self.tables = tables          # 座席数の昇順
+        self.reserved = reserved      # (予約時刻, テーブル名) → 確定予約数
+        self.times = slot_times(settings)
+
+    def remaining(self, time: str, table_name: str, total: int) -> int:
+        return total - self.reserved.get((time, table_name), 0)
+
+    def check(self, time: str, party_size: int) -> Dict[str, Any]:
+        """指定時刻・人数の空席（/api/availability と同じ形）"""
+        candidates = [t for t in self.tables if t['座席数'] >= party_size]
+        if not candidates:
+            return {'available': False, 'message': f'{party_size}名様のテーブルがありません'}
+        for t in candidates:
+            left = self.remaining(time, t['テーブル名'], t['テーブル数'])
+            if left > 0:
+                return {
+                    'available': True,
+                    'table_type': t['テーブル名'],
+                    'seats': t['座席数'],
+                    'available_count': left,
+                }
+        return {'available': False, 'message': 'この時間帯は満席です'}
+
+    def time_slots(self, party_size: int) -> List[Dict[str, Any]]:
+        """全時間枠の予約可否（/api/time_slots と同じ形）"""
+        return [
+            {'time': t, 'available': self.check(t, party_size)['available'], 'display': t}
+            for t in self.times
+        ]
+
+    def matrix(self) -> Dict[str, Dict[str, int]]:
+        """時刻 → テーブル種別 → 残数"""
+        return {
+            time: {t['テーブル名']: self.remaining(time, t['テーブル名'], t['テーブル数'])
+                   for t in self.tables}
+            for time in self.times
+        }
+
+
+def load_availability(store_id: int, dates: Iterable[str]) -> Dict[str, DayAvailability]:
+    """指定日（'YYYY-MM-DD'）ごとの空席表をまとめて読み込む"""
+    dates = sorted(set(dates))
+    if not dates:
+        return {}
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        execute_query(cur, 'SELECT * FROM "T_店舗_予約設定" WHERE store_id = ?', (store_id,))
+        settings = _settings_dict(cur.fetchone())
+
+        execute_query(cur, '''
+            SELECT テーブル名, 座席数, テーブル数
+            FROM "T_テーブル設定"
+            WHERE store_id = ? AND 有効 = 1
+            ORDER BY 座席数
+        ''', (store_id,))
+        tables = [{'テーブル名': r['テーブル名'], '座席数': r['座席数'], 'テーブル数': r['テーブル数'] or 0}
+                  for r in cur.fetchall()]
+
+        # 予約日は 'YYYY-MM-DD' の文字列なので範囲指定で (store_id, 予約日, ...) のインデックスを使う
+        execute_query(cur, '''
+            SELECT 予約日, 予約時刻, テーブル割当, COUNT(*) as count
+            FROM "T_予約"
+            WHERE store_id = ?
+              AND 予約日 >= ? AND 予約日 <= ?
+              AND ステータス = 'confirmed'
+            GROUP BY 予約日, 予約時刻, テーブル割当
+        ''', (store_id, dates[0], dates[-1]))
+        reserved: Dict[str, Dict[Tuple[str, str], int]] = {d: {} for d in dates}
+        for row in cur.fetchall():
+            if row['テーブル割当'] and row['予約日'] in reserved:
+                reserved[row['予約日']][(row['予約時刻'], row['テーブル割当'])] = row['count']
+    finally:
+        conn.close()
+    return {d: DayAvailability(d, settings, tables, reserved[d]) for d in dates}
+
+
+def load_day_availability(store_id: int, date: str) -> DayAvailability:
+    """1日分の空席表"""
+    return load_availability(store_id, [date])[date]
+
+
+def date_range(start: str, days: int) -> List[str]:
+    """start から days 日分の日付（上限 MAX_DAYS）"""
+    first = datetime.strptime(start, '%Y-%m-%d')
+    days = max(1, min(int(days), MAX_DAYS))
+    return [(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+
+def parse_party_sizes(data: Dict[str, Any]) -> List[int]:
+    """リクエストの party_sizes（配列）または party_size を人数のリストにする"""
+    sizes = data.get('party_sizes')
+    if not sizes:
+        sizes = [data.get('party_size', 1)]
+    return [int(s) for s in sizes]
+
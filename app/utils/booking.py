@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+予約の登録（空席確認とテーブル割当を1トランザクションで行う）
+
+空席確認と INSERT を別々に行うと、最後の1卓に同時に予約が入った場合に両方が成功してしまう。
+ここでは同じ店舗・時間帯への予約を直列化してから空きを数え、テーブル割当を決めて INSERT する。
+
+- PostgreSQL: 対象のテーブル設定行を SELECT ... FOR UPDATE でロックする
+- SQLite: BEGIN IMMEDIATE で書き込みロックを取ってから読む
+- ロック待ちのタイムアウト・デッドロック・直列化エラーは少し待って再試行する
+
+割当の単位は従来どおりテーブル種別（T_テーブル設定.テーブル名）で、
+同じ種別の確定予約数がテーブル数に達していれば満席とする。
+"""
+
+import random
+import secrets
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+
+# ロック競合時の最大試行回数と待ち時間の基準（秒）
+BOOKING_MAX_ATTEMPTS = 8
+BOOKING_RETRY_BASE = 0.02
+
+# 再試行する PostgreSQL のエラーコード（直列化失敗・デッドロック・ロック取得不可）
+_PG_RETRY_CODES = {'40001', '40P01', '55P03'}
+
+
+class BookingUnavailable(Exception):
+    """指定の時間帯に割り当てられるテーブルがない"""
+
+
+def generate_reservation_number() -> str:
+    """予約番号を生成（例: RES20231221-ABC123）"""
+    date_str = datetime.now().strftime('%Y%m%d')
+    random_str = secrets.token_hex(3).upper()
+    return f"RES{date_str}-{random_str}"
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, sqlite3.OperationalError):
+        msg = str(exc).lower()
+        return 'locked' in msg or 'busy' in msg
+    return getattr(exc, 'pgcode', None) in _PG_RETRY_CODES
+
+
+def _allocate_and_insert(conn, store_id, reservation_date, reservation_time, party_size, customer) -> Dict[str, Any]:
+    """ロックを取ってから空きテーブル種別を選び、予約を INSERT する（commit は呼び出し側）"""
+    cur = get_cursor(conn)
+    is_pg = get_db_type() == 'postgresql'
+    if not is_pg:
+        cur.execute('BEGIN IMMEDIATE')
+
+    execute_query(cur, f'''
+        SELECT id, テーブル名, 座席数, テーブル数
+        FROM "T_テーブル設定"
+        WHERE store_id = ? AND 有効 = 1 AND 座席数 >= ?
+        ORDER BY 座席数, id
+        {'FOR UPDATE' if is_pg else ''}
+    ''', (store_id, party_size))
+    tables = cur.fetchall()
+    if not tables:
+        raise BookingUnavailable(f'{party_size}名様のテーブルがありません')
+
+    execute_query(cur, '''
+        SELECT テーブル割当, COUNT(*) as count
+        FROM "T_予約"
+        WHERE store_id = ?
+          AND 予約日 = ?
+          AND 予約時刻 = ?
+          AND ステータス = 'confirmed'
+        GROUP BY テーブル割当
+    ''', (store_id, reservation_date, reservation_time))
+    reserved = {row['テーブル割当']: row['count'] for row in cur.fetchall() if row['テーブル割当']}
+
+    table_type = None
+    for t in tables:
+        if reserved.get(t['テーブル名'], 0) < (t['テーブル数'] or 0):
+            table_type = t['テーブル名']
+            break
+    if table_type is None:
+        raise BookingUnavailable('この時間帯は満席です')
+
+    reservation_number = generate_reservation_number()
+    sql = '''
+        INSERT INTO "T_予約" (
+            store_id, 予約番号, 予約日, 予約時刻, 人数,
+            顧客名, 顧客電話番号, 顧客メール, 特記事項,
+            ステータス, テーブル割当
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    params = (
+        store_id, reservation_number, reservation_date, reservation_time, party_size,
+        customer.get('name'), customer.get('phone'), customer.get('email', ''), customer.get('notes', ''),
+        'confirmed', table_type,
+    )
+    if is_pg:
+        execute_query(cur, sql + ' RETURNING id', params)
+        reservation_id = cur.fetchone()[0]
+    else:
+        execute_query(cur, sql, params)
+        reservation_id = cur.lastrowid
+    return {
+        'reservation_number': reservation_number,
+        'reservation_id': reservation_id,
+        'table_type': table_type,
+    }
+
+
+def book_reservation(store_id: int, reservation_date: str, reservation_time: str, party_size: int,
+                     customer: Dict[str, Any], max_attempts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    空席を確認して予約を登録する（同じ時間帯への同時予約でも超過しない）
+    customer: name / phone / email / notes
+    戻り値: {'reservation_number', 'reservation_id', 'table_type'}
+    満席なら BookingUnavailable を送出する
+    """
+    attempts = max_attempts or BOOKING_MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        conn = get_db_connection()
+        try:
+            result = _allocate_and_insert(conn, store_id, reservation_date, reservation_time,
+                                          party_size, customer)
+            conn.commit()
+            return result
+        except BookingUnavailable:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            if not _is_retryable(e) or attempt == attempts:
+                raise
+            # 競合した相手と同時に再試行しないよう揺らぎを入れて待つ
+            time.sleep(BOOKING_RETRY_BASE * (2 ** (attempt - 1)) * (0.5 + random.random()))
+        finally:
+            conn.close()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+プロセス内キャッシュ
+
+gunicorn ワーカーごとのメモリ上キャッシュ。
+更新したワーカーでは明示的に invalidate し、他のワーカーには TTL で反映する。
+ヒット率は cache_stats() で取得できる（/healthz に表示）。
+"""
+
+import time
+import threading
+
+_MISSING = object()
+
+# 名前 → TTLCache（統計表示用）
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class TTLCache:
+    """有効期限付きのスレッドセーフな辞書キャッシュ（満杯時は LRU で追い出し）"""
+
+    def __init__(self, name, ttl=60.0, maxsize=1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}  # key → (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        with _registry_lock:
+            _registry[name] = self
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > now:
+                self.hits += 1
+                # 最近使ったものを末尾へ（満杯時は先頭＝最も長く使われていないものから捨てる）
+                del self._data[key]
+                self._data[key] = item
+                return item[0]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # 期限切れを掃除し、それでも満杯なら最も長く使われていないものを捨てる
+                now = time.monotonic()
+                for k in [k for k, (_, exp) in self._data.items() if exp <= now]:
+                    del self._data[k]
+                if len(self._data) >= self.maxsize:
+                    del self._data[next(iter(self._data))]
+            self._data[key] = (value, expires)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """キャッシュになければ loader() の結果を保存して返す"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """predicate(key, value) が真のエントリをすべて削除"""
+        with self._lock:
+            keys = [k for k, (v, _) in self._data.items() if predicate(k, v)]
+            for k in keys:
+                del self._data[k]
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+                "invalidations": self.invalidations,
+                "ttl": self.ttl,
+            }
+
+
+def cache_stats():
+    """登録済みキャッシュの統計（名前ごと）"""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {c.name: c.stats() for c in caches}
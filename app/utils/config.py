@@ -3,15 +3,20 @@
 設定ファイル管理
 """
 import os
-import json
 from dataclasses import asdict
 from ..models import Symbol, Config
 from .slot_logic import recalc_probs_inverse_and_expected
+from .file_store import JsonlLog, read_json, write_json
 
 # パス設定
 APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(APP_DIR, "data")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
+SETTINGS_PATH = os.path.join(DATA_DIR, "settings.json")
+
+# 店舗に紐づかない旧来のアンケート回答（初回アクセス時に survey_responses.json から移行）
+SURVEY_LOG = JsonlLog(os.path.join(DATA_DIR, "survey_responses.jsonl"),
+                      legacy_json_path=os.path.join(DATA_DIR, "survey_responses.json"))
 
 
 def default_config() -> Config:
@@ -32,11 +37,10 @@ def default_config() -> Config:
 
 def load_config() -> Config:
     """設定ファイルを読み込み"""
-    if not os.path.exists(CONFIG_PATH):
+    raw = read_json(CONFIG_PATH)
+    if raw is None:
         os.makedirs(DATA_DIR, exist_ok=True)
         return default_config()
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        raw = json.load(f)
     syms = [Symbol(**s) for s in raw["symbols"]]
     return Config(
         symbols=syms,
@@ -49,7 +53,17 @@ def load_config() -> Config:
 
 def save_config(cfg: Config) -> None:
     """設定ファイルを保存"""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    payload = asdict(cfg)
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    write_json(CONFIG_PATH, asdict(cfg))
+    # コンパイル済みスロットを作り直させる
+    from .slot_engine import invalidate_global_engine
+    invalidate_global_engine()
+
+
+def load_settings() -> dict:
+    """settings.json（Google口コミURL・完了メッセージ・景品など）を読み込み（ファイルがなければ空）"""
+    return read_json(SETTINGS_PATH, default={})
+
+
+def save_settings(settings: dict) -> None:
+    """settings.json を保存"""
+    write_json(SETTINGS_PATH, settings)
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL コネクションプール
+
+- gunicorn ワーカー（プロセス）ごとに DATABASE_URL 単位のプールを1つ持つ
+- Flask のリクエスト中は close() された接続を g に保持して次の connect() で使い回し、
+  teardown でまとめてプールへ返却する
+- 貸し出し時にヘルスチェックを行い、切断済みの接続は破棄して作り直す
+
+トランザクションの扱い:
+- 同時に開いているハンドルはそれぞれ別の物理接続を持ち、トランザクションは共有しない
+  （あるヘルパーの commit()/rollback() が別のハンドルの未確定分に影響しない）
+- close() の時点で未確定のトランザクション（エラーで中断したものを含む）はロールバックする
+  （従来の「接続ごとに開いて閉じる」と同じ。close() しなかったハンドルは teardown で破棄）
+
+環境変数:
+  DB_POOL_MIN             ワーカー起動時に確保しておく接続数（既定 1）
+  DB_POOL_MAX             ワーカーあたりの最大接続数（既定 10）
+  DB_POOL_TIMEOUT         プール枯渇時に空きを待つ秒数（既定 10）
+  DB_POOL_PING_INTERVAL   この秒数以上アイドルだった接続は SELECT 1 で確認（既定 30、0 なら毎回）
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+from . import metrics
+
+# ---- psycopg2 の有無 ----
+try:
+    import psycopg2
+    import psycopg2.extensions
+except Exception:
+    psycopg2 = None
+
+# ---- Flask の有無（スクリプトから使う場合は g を使わない） ----
+try:
+    from flask import g, current_app, has_app_context
+except Exception:
+    g = current_app = None
+
+    def has_app_context():
+        return False
+
+
+POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+POOL_PING_INTERVAL = float(os.environ.get("DB_POOL_PING_INTERVAL", "30"))
+
+
+class PoolTimeout(Exception):
+    """プールが枯渇し、待ち時間内に接続を取得できなかった"""
+
+
+class ConnectionPool:
+    """スレッドセーフな PostgreSQL 接続プール（1ワーカー内で共有）"""
+
+    def __init__(self, db_url, minconn=POOL_MIN, maxconn=POOL_MAX,
+                 timeout=POOL_TIMEOUT, ping_interval=POOL_PING_INTERVAL):
+        self.db_url = db_url
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()  # (conn, 最終返却時刻)
+        self._size = 0        # 生成済みの物理接続数（貸出中＋アイドル）
+        self._cond = threading.Condition()
+        self.stats = {
+            "checkouts": 0,
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+        }
+
+    # ---- 物理接続 ----
+    def _connect(self):
+        url = urlparse(self.db_url)
+        kwargs = {"application_name": "login_system"}
+        if "sslmode=" not in (url.query or ""):
+            kwargs["sslmode"] = "disable" if url.hostname in ("localhost", "127.0.0.1") else "require"
+        conn = psycopg2.connect(self.db_url, **kwargs)
+        print(f"✅ PostgreSQL 接続成功: {url.hostname}:{url.port}/{url.path[1:]}")
+        return conn
+
+    def _healthy(self, conn, last_used) -> bool:
+        if conn.closed:
+            return False
+        if self.ping_interval and time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _drop(self, conn):
+        """物理接続を閉じてプールの枠を空ける（ロック取得済みで呼ぶこと）"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._size -= 1
+        self.stats["discarded"] += 1
+        self._cond.notify()
+
+    def warm(self):
+        """最小接続数までアイドル接続を確保する（失敗しても無視）"""
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"⚠️ コネクションプールの事前接続に失敗: {e}")
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self.stats["created"] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    # ---- 貸し出し／返却 ----
+    def getconn(self, autocommit=False):
+        """接続を1本借りる。枯渇時は timeout 秒まで待ち、超えたら PoolTimeout"""
+        deadline = None
+        with self._cond:
+            self.stats["checkouts"] += 1
+        while True:
+            conn = None
+            last_used = None
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    now = time.monotonic()
+                    if deadline is None:
+                        deadline = now + self.timeout
+                        self.stats["waits"] += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise PoolTimeout(f"DB接続プールが枯渇しています（max={self.maxconn}）")
+                    self._cond.wait(remaining)
+                if deadline is not None:
+                    self.stats["wait_seconds"] += time.monotonic() - (deadline - self.timeout)
+                    deadline = None
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.stats["misses"] += 1
+                    self.stats["created"] += 1
+            elif self._healthy(conn, last_used):
+                with self._cond:
+                    self.stats["hits"] += 1
+            else:
+                with self._cond:
+                    self.stats["health_check_failures"] += 1
+                    self._drop(conn)
+                continue
+
+            if conn.autocommit != autocommit:
+                conn.autocommit = autocommit
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """接続をプールへ返却する。未確定のトランザクションはロールバックする"""
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    discard = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if discard or conn.closed:
+                self._drop(conn)
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            data = dict(self.stats)
+            data["size"] = self._size
+            data["idle"] = len(self._idle)
+            data["in_use"] = self._size - len(self._idle)
+            data["min"] = self.minconn
+            data["max"] = self.maxconn
+        return data
+
+
+class _Lease:
+    """プールから借りた物理接続1本（同時に使うハンドルは1つだけ）"""
+
+    def __init__(self, pool, conn, idle=None):
+        self.pool = pool
+        self.conn = conn
+        self.idle = idle  # リクエスト中の再利用待ちリスト（None ならリクエスト外）
+        self.returned = False
+
+    def release(self):
+        if self.returned:
+            return
+        if self.idle is None:
+            self.give_back()
+            return
+        # リクエスト中は物理接続を保持したまま、従来の close() と同じく未確定分だけ破棄
+        try:
+            if not self.conn.closed and \
+                    self.conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self.conn.rollback()
+        except Exception:
+            self.pool.putconn(self.conn, discard=True)
+            self.returned = True
+            return
+        self.idle.append(self)
+
+    def give_back(self):
+        if self.returned:
+            return
+        self.returned = True
+        self.pool.putconn(self.conn)
+
+
+class PooledConnection:
+    """
+    プール接続のハンドル。psycopg2 の connection と同じように使え、
+    close() では物理接続を閉じずにプールへ返却する。
+    """
+
+    def __init__(self, lease):
+        object.__setattr__(self, "_lease", lease)
+        object.__setattr__(self, "_released", False)
+
+    @property
+    def raw(self):
+        """psycopg2 の生の connection"""
+        return self._lease.conn
+
+    def cursor(self, *args, **kwargs):
+        """クエリ数と時間を計測するカーソル（app.utils.metrics）"""
+        return metrics.instrument_cursor(self._lease.conn.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._released:
+            return
+        object.__setattr__(self, "_released", True)
+        self._lease.release()
+
+    def __getattr__(self, name):
+        return getattr(self._lease.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lease.conn, name, value)
+
+    def __enter__(self):
+        self._lease.conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._lease.conn.__exit__(exc_type, exc, tb)
+
+
+# ---- ワーカー単位のプール管理 ----
+_pools = {}
+_pools_pid = None
+_orphaned = []  # fork 前の親プロセスの接続（GC で切断されないよう保持）
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_url) -> ConnectionPool:
+    """DATABASE_URL ごとのプールを返す（fork 後は作り直す）"""
+    global _pools, _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            if _pools:
+                _orphaned.append(_pools)
+            _pools = {}
+            _pools_pid = os.getpid()
+        pool = _pools.get(db_url)
+        if pool is None:
+            pool = ConnectionPool(db_url)
+            _pools[db_url] = pool
+            created = True
+        else:
+            created = False
+    if created:
+        pool.warm()
+    return pool
+
+
+def _request_scoped() -> bool:
+    return has_app_context() and "db_pool" in current_app.extensions
+
+
+def connect(db_url, autocommit=False) -> PooledConnection:
+    """
+    プールから接続ハンドルを取得する。
+    リクエスト中は同じ (db_url, autocommit) で close() 済みの物理接続があればそれを再利用する
+    （開いたままのハンドルの接続は共有しない）。
+    """
+    if psycopg2 is None:
+        raise ImportError("psycopg2 がインストールされていません")
+    # Heroku の postgres:// と postgresql:// を同じプールにまとめる
+    if db_url.startswith("postgres://"):
+        db_url = db_url.replace("postgres://", "postgresql://", 1)
+    pool = get_pool(db_url)
+    metrics.record_connection("postgresql")
+    if not _request_scoped():
+        return PooledConnection(_Lease(pool, pool.getconn(autocommit)))
+
+    idle = g.setdefault("_db_idle", {}).setdefault((db_url, autocommit), [])
+    while idle:
+        lease = idle.pop()
+        if not lease.conn.closed:
+            return PooledConnection(lease)
+        lease.returned = True
+        pool.putconn(lease.conn, discard=True)
+    lease = _Lease(pool, pool.getconn(autocommit), idle)
+    g.setdefault("_db_leases", []).append(lease)
+    return PooledConnection(lease)
+
+
+def release_request_connections(exc=None):
+    """teardown_appcontext: リクエスト中に借りた接続をすべてプールへ返却（close() されていないものも含む）"""
+    if g is None:
+        return
+    g.pop("_db_idle", None)
+    leases = g.pop("_db_leases", None)
+    if not leases:
+        return
+    for lease in leases:
+        try:
+            lease.give_back()
+        except Exception as e:
+            print(f"⚠️ DB接続の返却に失敗: {e}")
+
+
+def pool_stats():
+    """このワーカーのプール統計（接続先ホスト/DB名ごと）"""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+    result = {}
+    for pool in pools:
+        url = urlparse(pool.db_url)
+        result[f"{url.hostname}:{url.port or 5432}/{url.path[1:]}"] = pool.snapshot()
+    return result
+
+
+def init_app(app):
+    """Flask アプリにリクエストスコープの接続管理を組み込む"""
+    app.extensions["db_pool"] = True
+    app.teardown_appcontext(release_request_connections)
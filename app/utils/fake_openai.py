@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAI クライアントの代用品（動作確認・テスト用）
+
+client.chat.completions.create(...) と同じ呼び方で、API を呼ばずに固定の口コミ文を返す。
+環境変数 REVIEW_AI_FAKE=1 のとき、口コミ生成ジョブはこのクライアントを使う。
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+FAKE_REVIEW_TEXT = (
+    "スタッフさんの対応がとても丁寧で、料理も温かいうちに出してもらえました。"
+    "お店の雰囲気も落ち着いていて、ゆっくり過ごせました。また利用したいと思います。"
+)
+
+
+def fake_enabled() -> bool:
+    return os.environ.get("REVIEW_AI_FAKE", "").lower() in ("1", "true", "yes")
+
+
+class _FakeCompletions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        owner = self._owner
+        owner.calls.append({"model": model, "messages": messages, "stream": stream, **kwargs})
+        if owner.fail_times > 0:
+            owner.fail_times -= 1
+            raise RuntimeError("fake OpenAI error")
+        if owner.delay:
+            time.sleep(owner.delay)
+        if stream:
+            return self._stream(owner.text)
+        message = SimpleNamespace(content=owner.text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _stream(self, text):
+        for i in range(0, len(text), 8):
+            delta = SimpleNamespace(content=text[i:i + 8])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeOpenAIClient:
+    """
+    text:       返す本文
+    fail_times: 最初の n 回は例外を投げる（リトライの確認用）
+    delay:      応答までの待ち秒数
+    """
+
+    def __init__(self, text=FAKE_REVIEW_TEXT, fail_times=0, delay=0.0):
+        self.text = text
+        self.fail_times = fail_times
+        self.delay = delay
+        self.calls = []
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+ファイルに保存する設定・データの読み書き
+
+- read_json() / write_json(): 設定ファイル（settings.json / config.json）
+  読み込みは (mtime, サイズ, inode) が変わるまでキャッシュし、書き込みは一時ファイル + rename で原子的に置き換える
+- JsonlLog: 追記専用の JSON Lines ログ（旧来の survey_responses.json の置き換え）
+  追記は O_APPEND + ファイルロックで1行ずつ書くため、複数ワーカーから同時に書いても行が混ざらない。
+  読み込み側は各行の開始位置（オフセット）の索引を持ち、前回以降に増えた部分だけを読み進める
+
+fcntl がない環境（Windows）ではファイルロックなしで動作する。
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .cache import TTLCache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# (パス, mtime, サイズ, inode) → 読み込んだ内容。ファイルが変われば別のキーになる
+_json_cache = TTLCache("json_files", ttl=300.0, maxsize=64)
+_MISSING = object()
+
+
+def _signature(st):
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """
+    JSON ファイルを読み込む（変更がなければキャッシュを返す）
+    ファイルがない・壊れている場合は default を返す。戻り値は呼び出し側で変更してよい（コピーを返す）
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return copy.deepcopy(default)
+    key = (path,) + _signature(st)
+    data = _json_cache.get(key, _MISSING)
+    if data is _MISSING:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ {path} を読み込めません: {e}")
+            return copy.deepcopy(default)
+        _json_cache.set(key, data)
+    return copy.deepcopy(data)
+
+
+def write_json(path: str, data: Any, indent: int = 2) -> None:
+    """JSON ファイルを原子的に書き換える（書きかけのファイルが読まれることはない）"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _lock(fd, exclusive=True):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class JsonlLog:
+    """
+    追記専用の JSON Lines ログ
+
+    legacy_json_path を指定すると、ログがまだない場合に旧形式（JSON 配列）のファイルを1回だけ取り込む。
+    """
+
+    def __init__(self, path: str, legacy_json_path: Optional[str] = None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self._lock = threading.Lock()
+        self._ident = None          # (st_dev, st_ino)
+        self._offsets: List[int] = []
+        self._indexed = 0           # 索引済みのバイト数（最後の改行の直後）
+        self._aggregates: Dict[str, list] = {}  # 名前 → [値, 集計済みのレコード数]
+
+    # ---- 書き込み ----
+    def append(self, record: Dict[str, Any], id_field: Optional[str] = None) -> Dict[str, Any]:
+        """
+        1件追記する（1回の write で1行を書く）
+        id_field を指定すると、ロック中に数えた件数 + 1 を連番としてその項目に入れる
+        """
+        self._import_legacy()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                _lock(fd)
+                try:
+                    if id_field:
+                        self._refresh()
+                        record[id_field] = len(self._offsets) + 1
+                    view = memoryview((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                    while view:
+                        view = view[os.write(fd, view):]
+                finally:
+                    _unlock(fd)
+            finally:
+                os.close(fd)
+        return record
+
+    def _import_legacy(self) -> None:
+        if not self.legacy_json_path or os.path.exists(self.path) \
+                or not os.path.exists(self.legacy_json_path):
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lock_fd = os.open(self.path + ".lock", os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            _lock(lock_fd)
+            try:
+                if os.path.exists(self.path):
+                    return  # 他のワーカーが取り込み済み
+                with open(self.legacy_json_path, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".tmp-")
+                with os.fdopen(fd, "w", encoding="utf-8") as out:
+                    for record in records:
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path, self.path)
+                print(f"✅ {self.legacy_json_path} の {len(records)} 件を {self.path} に移行しました")
+            finally:
+                _unlock(lock_fd)
+        finally:
+            os.close(lock_fd)
+
+    # ---- 索引 ----
+    def _refresh(self) -> None:
+        """前回から増えた部分だけ読み、行の開始位置を索引に加える（呼び出し側で self._lock を持つ）"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        ident = (st.st_dev, st.st_ino)
+        if ident != self._ident or st.st_size < self._indexed:
+            self._reset(ident)  # 別のファイルに置き換わった・切り詰められた
+        if st.st_size == self._indexed:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed)
+            data = f.read(st.st_size - self._indexed)
+        # 書きかけの最終行は次回に回す
+        end = data.rfind(b"\n") + 1
+        pos = 0
+        while pos < end:
+            nl = data.index(b"\n", pos)
+            if data[pos:nl].strip():
+                self._offsets.append(self._indexed + pos)
+            pos = nl + 1
+        self._indexed += end
+
+    def _reset(self, ident) -> None:
+        self._ident = ident
+        self._offsets = []
+        self._indexed = 0
+        self._aggregates = {}
+
+    def _read_from(self, index: int) -> List[Dict[str, Any]]:
+        """index 番目以降のレコード（索引済みの範囲）を読む"""
+        if index >= len(self._offsets):
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[index])
+            data = f.read(self._indexed - self._offsets[index])
+        records = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"⚠️ {self.path} に壊れた行があります（スキップ）")
+        return records
+
+    # ---- 読み込み ----
+    def __len__(self) -> int:
+        self._import_legacy()
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def tail(self, n: int) -> List[Dict[str, Any]]:
+        """最新 n 件（古い順）"""
+        self._import_legacy()
+        with self._lock:
+            self._refresh()
+            return self._read_from(max(0, len(self._offsets) - n))
+
+    def records(self) -> List[Dict[str, Any]]:
+        """全件（古い順）"""
+        self._import_legacy()
+        with self._lock:
+            self._refresh()
+            return self._read_from(0)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records())
+
+    def aggregate(self, name: str, initial: Callable[[], Any], step: Callable[[Any, Dict[str, Any]], Any]) -> Any:
+        """
+        全レコードを step(acc, record) で畳み込んだ値（initial() から開始）
+        結果はキャッシュし、次回からは追記された分だけを畳み込む
+        """
+        self._import_legacy()
+        with self._lock:
+            self._refresh()
+            entry = self._aggregates.get(name)
+            if entry is None:
+                entry = self._aggregates[name] = [initial(), 0]
+            if entry[1] < len(self._offsets):
+                for record in self._read_from(entry[1]):
+                    entry[0] = step(entry[0], record)
+                entry[1] = len(self._offsets)
+            return copy.deepcopy(entry[0])
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+リクエストごとの計測と /metrics（Prometheus テキスト形式）
+
+- エンドポイントごとのレイテンシのヒストグラムとステータス別のリクエスト数
+- DB 接続の取得数、実行したクエリ数と DB 内の時間（1リクエストあたりのクエリ数のヒストグラム付き）
+- OpenAI 呼び出しの回数と時間
+- 遅いリクエスト・クエリの多いリクエストの WARNING ログ（発行した SQL を同一文ごとに集計して statements に出す）
+
+クエリは接続レベルで数える。SQLite は instrumented_sqlite_connect() の Connection/Cursor、
+PostgreSQL は db_pool.PooledConnection.cursor() が返すカーソルのラッパーが計測する。
+リクエスト外（バックグラウンドの口コミ生成など）の計測は endpoint="(background)" に集計する。
+
+値は gunicorn ワーカー（プロセス）ごと。/healthz の db_pool と同じく、スクレイプ先のワーカーの値になる。
+
+環境変数:
+  METRICS_ENABLED        0 なら計測しない（既定 1）
+  METRICS_TOKEN          設定すると /metrics に Authorization: Bearer <token> が必要
+  SLOW_REQUEST_MS        この時間（ミリ秒）を超えたリクエストをログに出す（既定 0 = 出さない）
+  SLOW_REQUEST_QUERIES   このクエリ数を超えたリクエストをログに出す（N+1 の検出用、既定 0 = 出さない）
+"""
+
+import collections
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from flask import g, has_request_context, request
+except Exception:
+    g = request = None
+
+    def has_request_context():
+        return False
+
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_QUERIES = int(os.environ.get("SLOW_REQUEST_QUERIES", "0"))
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = "(background)"
+_CAPTURE_SQL = SLOW_REQUEST_MS > 0 or SLOW_REQUEST_QUERIES > 0
+_MAX_CAPTURED = 500
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+OPENAI_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+# ===== 集計器 =====
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra="") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+
+class Counter(_Metric):
+    """単調増加のカウンタ"""
+
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """累積バケットのヒストグラム"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        with self._lock:
+            item = self._values.get(labels)
+            if item is None:
+                item = self._values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    item[0][i] += 1
+            item[1] += 1
+            item[2] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for labels, (buckets, count, total) in items:
+            for bound, n in zip(self.buckets, buckets):
+                le = _labels(self.labelnames, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {n}")
+            inf = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+_registry = []
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "リクエストの処理時間",
+                            ("endpoint", "method"))
+REQUESTS = Counter("http_requests_total", "リクエスト数", ("endpoint", "method", "status"))
+DB_CONNECTIONS = Counter("db_connections_opened_total", "DB 接続の取得数", ("endpoint", "backend"))
+DB_QUERIES = Counter("db_queries_total", "実行したクエリ数", ("endpoint",))
+DB_TIME = Counter("db_query_seconds_total", "クエリの実行時間の合計", ("endpoint",))
+DB_QUERIES_PER_REQUEST = Histogram("db_queries_per_request", "1リクエストあたりのクエリ数",
+                                   ("endpoint",), QUERY_COUNT_BUCKETS)
+OPENAI_LATENCY = Histogram("openai_request_duration_seconds", "OpenAI 呼び出しの時間",
+                           ("endpoint", "outcome"), OPENAI_BUCKETS)
+
+
+def render() -> str:
+    """登録済みの全メトリクスを Prometheus テキスト形式で返す"""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== リクエスト単位の状態 =====
+class _RequestStats:
+    __slots__ = ("started", "queries", "db_time", "openai_calls", "openai_time", "statements", "status")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.openai_calls = 0
+        self.openai_time = 0.0
+        self.statements = [] if _CAPTURE_SQL else None
+        self.status = None
+
+
+def _current():
+    """リクエスト中なら計測中の _RequestStats（セッション読み込みなど before_request 前の分も含める）"""
+    if not METRICS_ENABLED or not has_request_context():
+        return None
+    stats = g.get("_metrics")
+    if stats is None:
+        stats = g._metrics = _RequestStats()
+    return stats
+
+
+def _endpoint() -> str:
+    if not has_request_context():
+        return BACKGROUND
+    return request.endpoint or "(unmatched)"
+
+
+def record_connection(backend: str) -> None:
+    """DB 接続ハンドルを1つ取得した"""
+    if METRICS_ENABLED:
+        DB_CONNECTIONS.inc((_endpoint(), backend))
+
+
+def record_query(sql, elapsed: float) -> None:
+    """クエリを1回実行した"""
+    stats = _current()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.statements is not None and len(stats.statements) < _MAX_CAPTURED:
+            stats.statements.append((sql, elapsed))
+        return
+    if METRICS_ENABLED:
+        DB_QUERIES.inc((BACKGROUND,))
+        DB_TIME.inc((BACKGROUND,), elapsed)
+
+
+@contextmanager
+def track_openai():
+    """OpenAI 呼び出しを囲んで時間を計る（例外は outcome="error" として記録して送出）"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        OPENAI_LATENCY.observe((_endpoint(), outcome), elapsed)
+        stats = _current()
+        if stats is not None:
+            stats.openai_calls += 1
+            stats.openai_time += elapsed
+
+
+# ===== DB の計測 =====
+def _sql_text(sql) -> str:
+    return sql.decode("utf-8", "replace") if isinstance(sql, bytes) else str(sql)
+
+
+class _TimedCursor:
+    """DB-API カーソルのラッパー（PostgreSQL 用。execute / executemany の時間を記録）"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+
+def instrument_cursor(cursor):
+    return _TimedCursor(cursor) if METRICS_ENABLED else cursor
+
+
+class _SQLiteCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        return super().cursor(factory or _SQLiteCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def instrumented_sqlite_connect(path, **kwargs):
+    """sqlite3.connect() と同じ。クエリ数と時間を計測する接続を返す"""
+    record_connection("sqlite")
+    if METRICS_ENABLED:
+        kwargs.setdefault("factory", _SQLiteConnection)
+    return sqlite3.connect(path, **kwargs)
+
+
+# ===== Flask への組み込み =====
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _log_request(stats, endpoint, elapsed):
+    counts, times = collections.Counter(), collections.Counter()
+    for sql, t in stats.statements or ():
+        key = _WHITESPACE.sub(" ", _sql_text(sql)).strip()
+        counts[key] += 1
+        times[key] += t
+    logger.warning(
+        "遅い/クエリの多いリクエスト: %s %s endpoint=%s %.0fms DB %d件 %.0fms / OpenAI %d回 %.0fms",
+        request.method, request.path, endpoint, elapsed * 1000,
+        stats.queries, stats.db_time * 1000, stats.openai_calls, stats.openai_time * 1000,
+        extra={
+            "status": stats.status,
+            "statements": [
+                {"count": n, "ms": round(times[sql] * 1000, 1), "sql": sql[:300]}
+                for sql, n in counts.most_common(20)
+            ],
+            "statements_truncated": len(stats.statements or ()) >= _MAX_CAPTURED,
+        },
+    )
+
+
+def init_app(app) -> None:
+    """リクエストの計測フックを登録する（/metrics は health blueprint）"""
+
+    @app.before_request
+    def _metrics_start():
+        _current()
+
+    @app.after_request
+    def _metrics_status(response):
+        stats = _current()
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(exc=None):
+        stats = g.pop("_metrics", None) if METRICS_ENABLED else None
+        if stats is None:
+            return
+        if stats.status is None:
+            stats.status = 500 if exc is not None else 200
+        elapsed = time.perf_counter() - stats.started
+        endpoint = _endpoint()
+        REQUEST_LATENCY.observe((endpoint, request.method), elapsed)
+        REQUESTS.inc((endpoint, request.method, str(stats.status)))
+        DB_QUERIES.inc((endpoint,), stats.queries)
+        DB_TIME.inc((endpoint,), stats.db_time)
+        DB_QUERIES_PER_REQUEST.observe((endpoint,), stats.queries)
+        if ((SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS)
+                or (SLOW_REQUEST_QUERIES > 0 and stats.queries > SLOW_REQUEST_QUERIES)):
+            _log_request(stats, endpoint, elapsed)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAI クライアントのレジストリ
+
+- API キーの解決（アプリ設定 > 店舗設定 > テナント設定 > 環境変数）を TTL 付きでキャッシュする
+- クライアントは API キーごとに1つだけ作って使い回す（HTTP の keep-alive 接続を再利用）
+
+APIキーを保存・変更したら invalidate_openai_keys() を呼ぶこと
+（他のワーカーには OPENAI_KEY_CACHE_TTL 秒後に反映）。
+
+環境変数:
+  OPENAI_KEY_CACHE_TTL   解決済みキーのキャッシュ秒数（既定 300）
+  OPENAI_API_KEY         どの設定にもキーがない場合に使うキー
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from db_config import get_db_connection, get_cursor, execute_query
+from .cache import TTLCache
+
+OPENAI_KEY_CACHE_TTL = float(os.environ.get("OPENAI_KEY_CACHE_TTL", "300"))
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+
+# キーごとに保持するクライアントの上限（超えたら最も長く使われていないものを手放す）
+_MAX_CLIENTS = 64
+
+_MISSING = object()
+
+# アプリ種別 → 設定テーブル
+_APP_TABLES = {
+    'survey': 'T_店舗_アンケート設定',
+    'slot': 'T_店舗_スロット設定',
+}
+
+# (app_type, app_id, store_id, tenant_id) → DB に設定されたキー（なければ None）
+_key_cache = TTLCache("openai_api_key", ttl=OPENAI_KEY_CACHE_TTL, maxsize=4096)
+
+_clients = OrderedDict()  # API キー → OpenAI
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def _lookup_key(app_type, app_id, store_id, tenant_id) -> Optional[str]:
+    """DB から API キーを探す（1接続・最大2クエリ）"""
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+
+        # 1. アプリ設定（app_id がなければ店舗のアプリ設定）
+        table = _APP_TABLES.get(app_type)
+        if table and (app_id or store_id):
+            if app_id:
+                execute_query(cur, f'SELECT openai_api_key, store_id FROM "{table}" WHERE id = ?', (app_id,))
+            else:
+                execute_query(cur, f'SELECT openai_api_key, store_id FROM "{table}" WHERE store_id = ?', (store_id,))
+            row = cur.fetchone()
+            if row:
+                if row[0]:
+                    return row[0]
+                if not store_id and row[1]:
+                    store_id = row[1]
+
+        # 2. 店舗設定、3. テナント設定（まとめて取得）
+        if store_id:
+            execute_query(cur, """
+                SELECT s.openai_api_key, t.openai_api_key
+                FROM "T_店舗" s
+                LEFT JOIN "T_テナント" t ON t.id = s.tenant_id
+                WHERE s.id = ?
+            """, (store_id,))
+            row = cur.fetchone()
+            if row:
+                return row[0] or row[1] or None
+        elif tenant_id:
+            execute_query(cur, 'SELECT openai_api_key FROM "T_テナント" WHERE id = ?', (tenant_id,))
+            row = cur.fetchone()
+            if row and row[0]:
+                return row[0]
+        return None
+    finally:
+        conn.close()
+
+
+def _cache_key(app_type, app_id, store_id, tenant_id) -> Tuple:
+    return (
+        app_type if app_type in _APP_TABLES else None,
+        int(app_id) if app_id else None,
+        int(store_id) if store_id else None,
+        int(tenant_id) if tenant_id else None,
+    )
+
+
+def resolve_api_key(app_type=None, app_id=None, store_id=None, tenant_id=None) -> Optional[str]:
+    """
+    API キーを階層的に解決する。
+    優先順位: アプリ設定 > 店舗設定 > テナント設定 > 環境変数
+    app_id を省略した場合は store_id の店舗の app_type アプリ設定を使う
+    """
+    key = _cache_key(app_type, app_id, store_id, tenant_id)
+    api_key = _key_cache.get(key, _MISSING)
+    if api_key is _MISSING:
+        api_key = None
+        try:
+            api_key = _lookup_key(*key)
+            _key_cache.set(key, api_key)
+        except Exception as e:
+            # DB エラーはキャッシュしない
+            print(f"⚠️ OpenAI APIキーの取得に失敗: {e}")
+    return api_key or os.environ.get('OPENAI_API_KEY')
+
+
+def get_client_for_key(api_key: str):
+    """API キーごとに1つの OpenAI クライアントを返す（fork 後は作り直す）"""
+    global _clients_pid
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(api_key)
+        if client is not None:
+            _clients.move_to_end(api_key)
+            return client
+        from openai import OpenAI
+        client = OpenAI(api_key=api_key, base_url=OPENAI_BASE_URL)
+        _clients[api_key] = client
+        while len(_clients) > _MAX_CLIENTS:
+            _clients.popitem(last=False)
+        return client
+
+
+def get_openai_client(app_type=None, app_id=None, store_id=None, tenant_id=None):
+    """
+    OpenAI クライアントを階層的に取得。
+    優先順位: アプリ設定 > 店舗設定 > テナント設定 > 環境変数
+    """
+    api_key = resolve_api_key(app_type, app_id, store_id, tenant_id)
+    if not api_key:
+        raise ValueError("OpenAI APIキーが設定されていません。アプリ、店舗、またはテナントの管理画面でAPIキーを設定してください。")
+    return get_client_for_key(api_key)
+
+
+def invalidate_openai_keys(store_id: Optional[int] = None) -> None:
+    """解決済みキーを破棄（store_id 省略時は全件。テナントのキー変更時は全件を破棄する）"""
+    if store_id is None:
+        _key_cache.clear()
+        return
+    store_id = int(store_id)
+    # app_id だけで引いたキーはどの店舗のものか分からないため一緒に破棄する
+    _key_cache.invalidate_where(lambda k, v: k[2] == store_id or (k[1] is not None and k[2] is None))
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+合計配当の確率分布
+
+spins 回スピンしたときの合計配当の分布（pmf と累積分布）を設定ごとに一度だけ計算し、
+任意の閾値・範囲の確率を累積分布の二分探索で返す。
+
+- 配当は小数桁に合わせて整数化したうえで最大公約数で割り、配列を最小限にする
+- NumPy があれば FFT（小さい場合は np.convolve）で畳み込む
+- NumPy がなければ出現する合計値だけを持つ疎な畳み込みで計算する
+- 合計値の範囲が PAYOUT_DIST_MAX_SIZE を超える設定は DistributionTooLarge（ValueError）にする
+"""
+
+import hashlib
+import json
+import math
+import os
+from bisect import bisect_left, bisect_right
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..models import Symbol
+from .cache import TTLCache
+from .slot_logic import decimal_scale
+from . import slot_engine
+
+# ---- NumPy の有無（なくても動作する） ----
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+PAYOUT_DIST_TTL = float(os.environ.get("PAYOUT_DIST_TTL", "600"))
+STORE_DIST_CACHE_SIZE = int(os.environ.get("STORE_DIST_CACHE_SIZE", "512"))
+PAYOUT_DIST_MAX_SIZE = int(os.environ.get("PAYOUT_DIST_MAX_SIZE", "2000000"))
+
+# この長さを超える配列は直接畳み込みではなく FFT を使う
+_FFT_MIN_SIZE = 2048
+
+
+class DistributionTooLarge(ValueError):
+    """配当の桁数・スピン数が多すぎて分布を計算できない"""
+
+
+class PayoutDistribution:
+    """合計配当の分布（生成後は読み取り専用）"""
+
+    def __init__(self, payouts: Sequence[float], probs: Sequence[float], spins: int):
+        self.spins = max(1, int(spins))
+        vs = [float(v) for v in payouts]
+        ps = [float(p) for p in probs]
+        S = sum(ps) or 1.0
+        ps = [p / S for p in ps]
+
+        if not all(math.isfinite(v) for v in vs):
+            raise DistributionTooLarge("配当に数値以外が含まれています")
+
+        # 配当を「unit の整数倍」で表す（unit = gcd / scale）
+        self.scale = decimal_scale(vs) if vs else 1
+        ivs = [int(round(v * self.scale)) for v in vs]
+        g = 0
+        for v in ivs:
+            g = math.gcd(g, abs(v))
+        self.step = g or 1
+        ks = [v // self.step for v in ivs]
+
+        if ks:
+            size = self.spins * (max(ks) - min(min(ks), 0)) + 1
+            if size > PAYOUT_DIST_MAX_SIZE:
+                raise DistributionTooLarge(
+                    "配当の小数桁またはスピン数が多すぎるため確率を計算できません"
+                    f"（合計値 {size} 通り、上限 {PAYOUT_DIST_MAX_SIZE}）")
+
+        # 同じ配当のシンボルはまとめる（確率0は除外）
+        single: Dict[int, float] = {}
+        for k, p in zip(ks, ps):
+            if p > 0.0:
+                single[k] = single.get(k, 0.0) + p
+
+        if not single:
+            self.values: List[int] = [0]
+            self.pmf: List[float] = [1.0]
+        elif np is not None and min(single) >= 0:
+            self.values, self.pmf = _convolve_numpy(single, self.spins)
+        else:
+            self.values, self.pmf = _convolve_sparse(single, self.spins)
+
+        acc = 0.0
+        self.cdf: List[float] = []
+        for p in self.pmf:
+            acc += p
+            self.cdf.append(acc)
+
+    # ---- 配当・閾値 → 整数単位 ----
+    def units_of(self, payout: float) -> int:
+        """配当を分布と同じ単位（payout * scale / step）の整数にする"""
+        return int(round(float(payout) * self.scale)) // self.step
+
+    def _units(self, threshold: float) -> Fraction:
+        return Fraction(threshold) * self.scale / self.step
+
+    def _cdf_upto(self, k_incl: int) -> float:
+        """P(合計 <= k_incl 単位)"""
+        i = bisect_right(self.values, k_incl)
+        return self.cdf[i - 1] if i > 0 else 0.0
+
+    # ---- 問い合わせ ----
+    def prob_ge(self, threshold: float) -> float:
+        """合計配当が threshold 以上となる確率"""
+        k = math.ceil(self._units(threshold))
+        i = bisect_left(self.values, k)
+        below = self.cdf[i - 1] if i > 0 else 0.0
+        return max(0.0, min(1.0, self.cdf[-1] - below))
+
+    def prob_le(self, threshold: Optional[float]) -> float:
+        """合計配当が threshold 以下となる確率（None は上限なし）"""
+        if threshold is None:
+            return 1.0
+        return max(0.0, min(1.0, self._cdf_upto(math.floor(self._units(threshold)))))
+
+    def prob_range(self, tmin: float, tmax: Optional[float]) -> Tuple[float, float, float]:
+        """(prob_ge, prob_le, prob_range) を返す（calc_prob と同じ定義）"""
+        prob_ge = self.prob_ge(tmin)
+        prob_le = self.prob_le(tmax)
+        return prob_ge, prob_le, max(0.0, prob_le - (1.0 - prob_ge))
+
+
+def _convolve_sparse(single: Dict[int, float], spins: int) -> Tuple[List[int], List[float]]:
+    """出現する合計値だけを辞書で持つ畳み込み"""
+    items = list(single.items())
+    cur = {0: 1.0}
+    for _ in range(spins):
+        nxt: Dict[int, float] = {}
+        for ssum, pcur in cur.items():
+            for k, p in items:
+                key = ssum + k
+                nxt[key] = nxt.get(key, 0.0) + pcur * p
+        cur = nxt
+    values = sorted(cur)
+    return values, [cur[v] for v in values]
+
+
+def _convolve_numpy(single: Dict[int, float], spins: int) -> Tuple[List[int], List[float]]:
+    """NumPy による畳み込み（大きい配列は FFT のべき乗）"""
+    base = np.zeros(max(single) + 1)
+    for k, p in single.items():
+        base[k] = p
+    size = spins * (len(base) - 1) + 1
+    if size >= _FFT_MIN_SIZE:
+        n = 1 << (size - 1).bit_length()
+        pmf = np.fft.irfft(np.fft.rfft(base, n) ** spins, n)[:size]
+        pmf[pmf < 1e-15] = 0.0
+    else:
+        pmf = np.ones(1)
+        for _ in range(spins):
+            pmf = np.convolve(pmf, base)
+    idx = np.nonzero(pmf > 0.0)[0]
+    return idx.tolist(), pmf[idx].tolist()
+
+
+# ===== 設定ごとのキャッシュ =====
+_dist_cache = TTLCache("payout_distribution", ttl=PAYOUT_DIST_TTL, maxsize=256)
+
+
+def distribution_key(symbols: Sequence[Any], spins: int) -> Tuple:
+    """分布を一意に決める値（配当・確率・スピン数）"""
+    return (int(spins), tuple((float(s.payout_3), float(s.prob)) for s in symbols))
+
+
+def get_distribution(symbols: Sequence[Any], spins: int) -> PayoutDistribution:
+    """
+    シンボル（payout_3, prob [%]）の合計配当分布を取得する。
+    ハズレを含める場合は配当0のシンボルとして symbols に加えておくこと。
+    """
+    key = distribution_key(symbols, spins)
+    return _dist_cache.get_or_load(
+        key, lambda: PayoutDistribution([p for p, _ in key[1]], [q for _, q in key[1]], spins))
+
+
+def symbols_with_miss(symbols: Sequence[Any], miss_probability: float) -> List[Symbol]:
+    """
+    確率計算用のシンボル一覧
+    ハズレ（0点）をシンボルとして加え、ハズレ確率＋シンボル確率の合計が100%になるよう正規化する
+    """
+    items = [Symbol(id=s.id, label=s.label, payout_3=float(s.payout_3), prob=float(s.prob), color=s.color)
+             for s in symbols]
+    items.append(Symbol(id="miss", label="ハズレ", payout_3=0.0, prob=float(miss_probability), color="#000000"))
+    psum = sum(s.prob for s in items) or 100.0
+    for s in items:
+        s.prob = s.prob * 100.0 / psum
+    return items
+
+
+def config_hash(symbols: Sequence[Any], miss_probability: float) -> str:
+    """配当・確率・ハズレ確率から求めた設定のハッシュ"""
+    payload = json.dumps([[float(s.payout_3), float(s.prob)] for s in symbols] + [float(miss_probability)])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# ===== 店舗ごとのキャッシュ =====
+# (store_id, 設定ハッシュ, spins) → PayoutDistribution。満杯時は LRU で追い出す。
+_store_dist_cache = TTLCache("store_payout_distribution", ttl=PAYOUT_DIST_TTL,
+                             maxsize=STORE_DIST_CACHE_SIZE)
+
+
+def get_store_distribution(store_id: int, spins: int = 5) -> PayoutDistribution:
+    """店舗のスロット設定（DB）による合計配当分布を取得"""
+    cfg = slot_engine.get_store_engine(store_id).config
+    h = config_hash(cfg.symbols, cfg.miss_probability)
+    key = (store_id, h, int(spins))
+    dist = _store_dist_cache.get(key)
+    if dist is None:
+        # 設定が変わった店舗の古い分布は捨てる
+        _store_dist_cache.invalidate_where(lambda k, v: k[0] == store_id and k[1] != h)
+        syms = symbols_with_miss(cfg.symbols, cfg.miss_probability)
+        dist = PayoutDistribution([s.payout_3 for s in syms], [s.prob for s in syms], spins)
+        _store_dist_cache.set(key, dist)
+    return dist
+
+
+def prize_odds(dist: PayoutDistribution, prizes: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """景品ごとの当選確率（min_score 以上 max_score 以下、max_score なしは上限なし）"""
+    result = []
+    for p in prizes:
+        min_score = float(p.get("min_score", 0) or 0)
+        max_score = p.get("max_score")
+        max_score = None if max_score in (None, "") else float(max_score)
+        result.append({
+            "rank": p.get("rank"),
+            "name": p.get("name"),
+            "min_score": min_score,
+            "max_score": max_score,
+            "prob": dist.prob_range(min_score, max_score)[2],
+        })
+    return result
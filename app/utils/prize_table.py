@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+コンパイル済みの景品判定表
+
+景品設定（点数範囲 → 景品）を、重なりのない区間の表に変換しておき、
+スピンごとの判定を二分探索（O(log n)）で行う。
+
+判定は従来と同じく「設定の並び順で最初に範囲に入った景品」。
+範囲が重なっている場合は、先の景品が優先される部分を区間表に反映し、重なりを警告する。
+景品の書式は {min_score, max_score, rank, name} と {min, max, label} の両方を受け付ける。
+
+店舗ごとの表は T_店舗_景品設定.updated_at をバージョンとしてキャッシュする（slot_engine と同じ方式）。
+景品の保存時は invalidate_store_prizes() を呼ぶこと（他ワーカーは TTL 後にバージョン比較で反映）。
+共通設定（data/settings.json）の表はファイルの更新で作り直す。
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from .cache import TTLCache
+
+PRIZE_TABLE_TTL = float(os.environ.get("PRIZE_TABLE_TTL", os.environ.get("SLOT_ENGINE_TTL", "60")))
+
+
+def normalize_prize(prize: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """景品1件を {'min', 'max', 'result'} にする（点数範囲が不正なら None）"""
+    try:
+        low = float(prize.get("min_score", prize.get("min")))
+        high = prize.get("max_score", prize.get("max"))
+        high = None if high in (None, "") else float(high)
+    except (TypeError, ValueError):
+        return None
+    if high is not None and high < low:
+        return None
+    return {
+        "min": low,
+        "max": high,
+        "result": {"rank": prize.get("rank", ""), "name": prize.get("name", prize.get("label", ""))},
+    }
+
+
+class PrizeTable:
+    """点数 → 景品の判定表（生成後は読み取り専用）"""
+
+    def __init__(self, prizes: Optional[List[Dict[str, Any]]], version: Any = None):
+        self.version = version
+        self.prizes = []
+        for p in prizes or []:
+            normalized = normalize_prize(p) if isinstance(p, dict) else None
+            if normalized is None:
+                print(f"⚠️ 点数範囲が不正な景品を無視します: {p}")
+                continue
+            self.prizes.append(normalized)
+
+        # 範囲の端点で数直線を「端点」と「端点の間」に分け、それぞれの景品を先に決めておく
+        self._points = sorted({x for p in self.prizes for x in (p["min"], p["max"]) if x is not None})
+        samples_between = self._gap_samples()
+        self._at_point = [self._winner(x) for x in self._points]
+        self._between = [self._winner(x) for x in samples_between]
+
+        # 重なり（後の景品が一部または全部当たらなくなる範囲）を検出
+        self.overlaps = []
+        for x in self._points + samples_between:
+            covering = [p["result"]["name"] for p in self.prizes if self._covers(p, x)]
+            for shadowed in covering[1:]:
+                pair = (covering[0], shadowed)
+                if pair not in self.overlaps:
+                    self.overlaps.append(pair)
+        for winner, shadowed in self.overlaps:
+            print(f"⚠️ 景品「{shadowed}」の点数範囲が「{winner}」と重なっています（「{winner}」を優先）")
+
+    def _gap_samples(self) -> List[float]:
+        """各「端点の間」（最初の端点より下・最後の端点より上を含む）の代表点"""
+        points = self._points
+        if not points:
+            return []
+        return ([points[0] - 1.0]
+                + [(a + b) / 2.0 for a, b in zip(points, points[1:])]
+                + [points[-1] + 1.0])
+
+    @staticmethod
+    def _covers(prize, score) -> bool:
+        return prize["min"] <= score and (prize["max"] is None or score <= prize["max"])
+
+    def _winner(self, score) -> Optional[Dict[str, Any]]:
+        for p in self.prizes:
+            if self._covers(p, score):
+                return p["result"]
+        return None
+
+    def lookup(self, score: float) -> Optional[Dict[str, Any]]:
+        """点数に該当する景品 {'rank', 'name'}（なければ None）"""
+        if not self._points:
+            return None
+        i = bisect_left(self._points, score)
+        if i < len(self._points) and self._points[i] == score:
+            result = self._at_point[i]
+        else:
+            result = self._between[i]
+        return dict(result) if result else None
+
+
+# ===== 店舗ごとの判定表 =====
+_table_cache = TTLCache("prize_table", ttl=PRIZE_TABLE_TTL, maxsize=2048)
+# TTL 切れ後に updated_at が変わっていなければ作り直さずに使い回す
+_compiled: Dict[int, PrizeTable] = {}
+
+
+def get_store_prize_table(store_id: int) -> PrizeTable:
+    """店舗の景品判定表を取得（景品設定がなければ空の表）"""
+    table = _table_cache.get(store_id)
+    if table is not None:
+        return table
+
+    import store_db
+    prizes, version = store_db.get_prizes_with_version(store_id)
+    table = _compiled.get(store_id)
+    if table is None or version is None or table.version != version:
+        table = PrizeTable(prizes, version)
+        _compiled[store_id] = table
+    _table_cache.set(store_id, table)
+    return table
+
+
+def invalidate_store_prizes(store_id: Optional[int] = None) -> None:
+    """店舗の景品判定表を破棄（store_id 省略時は全店舗）"""
+    if store_id is None:
+        _table_cache.clear()
+        _compiled.clear()
+        return
+    _table_cache.invalidate(store_id)
+    _compiled.pop(store_id, None)
+
+
+# ===== 共通設定（data/settings.json）の判定表 =====
+_file_tables: Dict[str, PrizeTable] = {}
+_file_lock = threading.Lock()
+
+
+def get_file_prize_table(settings_path: str) -> PrizeTable:
+    """settings.json の "prizes" の判定表（ファイルの更新時に作り直す）"""
+    from .file_store import read_json
+    try:
+        st = os.stat(settings_path)
+        version = (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        version = None
+    table = _file_tables.get(settings_path)
+    if table is not None and table.version == version:
+        return table
+    with _file_lock:
+        table = _file_tables.get(settings_path)
+        if table is None or table.version != version:
+            prizes = read_json(settings_path, default={}).get("prizes", []) if version else []
+            table = PrizeTable(prizes, version)
+            _file_tables[settings_path] = table
+    return table
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+AI口コミ生成ジョブ
+
+アンケート送信のリクエスト内で OpenAI を待たないよう、生成を "T_口コミ生成ジョブ" に積んで
+ワーカープロセス内のスレッドプールで実行する。
+
+- enqueue_review_job() はジョブを登録して job_id をすぐに返す
+- get_review_job() で状態（queued / running / done / failed）と結果を取得する（review_confirm がポーリング）
+- 失敗時は指数バックオフで再試行し、上限回数を超えたら failed にして定型文を結果にする
+- 完了した本文は T_アンケート回答.generated_review にも保存する
+- 別ワーカーで登録された・停止したワーカーに取り残されたジョブは、ポーリング時に拾い直す
+- ストリーミング時は登録を REVIEW_STREAM_GRACE 秒遅らせ、その間にブラウザの SSE 接続が
+  claim_review_job() で取得して stream_review_job() で断片を配信する（取得されなければ通常実行）
+  SSE 接続は生成が終わるまでリクエストのスレッドを占有するため、gunicorn は gthread ワーカーで動かす（Procfile）
+
+環境変数:
+  REVIEW_JOB_WORKERS         ワーカーあたりの実行スレッド数（既定 2）
+  REVIEW_JOB_MAX_ATTEMPTS    最大試行回数（既定 3）
+  REVIEW_JOB_BACKOFF         再試行の待ち秒数の基準（既定 2、2倍ずつ増える）
+  REVIEW_JOB_STALE_SECONDS   running のままこの秒数を超えたジョブは再実行（既定 120）
+  REVIEW_STREAMING           0 ならストリーミング配信を使わない（既定 1）
+  REVIEW_STREAM_GRACE        ストリーミング接続を待つ秒数（既定 3）
+  REVIEW_AI_FAKE             1 なら OpenAI の代わりに FakeOpenAIClient を使う
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+from .fake_openai import FakeOpenAIClient, fake_enabled
+
+REVIEW_JOB_WORKERS = int(os.environ.get("REVIEW_JOB_WORKERS", "2"))
+REVIEW_JOB_MAX_ATTEMPTS = int(os.environ.get("REVIEW_JOB_MAX_ATTEMPTS", "3"))
+REVIEW_JOB_BACKOFF = float(os.environ.get("REVIEW_JOB_BACKOFF", "2"))
+REVIEW_JOB_STALE_SECONDS = float(os.environ.get("REVIEW_JOB_STALE_SECONDS", "120"))
+REVIEW_STREAMING = os.environ.get("REVIEW_STREAMING", "1").lower() not in ("0", "false", "no")
+REVIEW_STREAM_GRACE = float(os.environ.get("REVIEW_STREAM_GRACE", "3"))
+
+FAILED_REVIEW_TEXT = "口コミ投稿文の生成に失敗しました。"
+
+# ---- ワーカー内のスレッドプール（fork 後は作り直す） ----
+_executor = None
+_executor_pid = None
+_inflight = set()  # このワーカーで実行待ち・実行中の job_id
+_lock = threading.Lock()
+
+# テストなどで差し替えるための生成関数とクライアント
+_generator: Optional[Callable[..., str]] = None
+_client_override = None
+
+
+def set_generator(func: Optional[Callable[..., str]] = None, client=None) -> None:
+    """
+    生成処理を差し替える（None で既定に戻す）
+    func(survey_data, store_id, taste, client) -> str
+    """
+    global _generator, _client_override
+    _generator = func
+    _client_override = client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=max(1, REVIEW_JOB_WORKERS),
+                                           thread_name_prefix="review-job")
+            _executor_pid = os.getpid()
+            _inflight.clear()
+        return _executor
+
+
+def _default_generate(survey_data, store_id, taste=None, client=None) -> str:
+    if taste:
+        from ..blueprints.review_regenerate import _generate_review_with_taste
+        return _generate_review_with_taste(survey_data, store_id, taste,
+                                           openai_client=client, raise_errors=True)
+    from ..blueprints.survey import _generate_review_text
+    return _generate_review_text(survey_data, store_id, openai_client=client, raise_errors=True)
+
+
+def _default_stream(survey_data, store_id, taste=None, client=None) -> Iterator[str]:
+    if taste:
+        from ..blueprints.review_regenerate import _generate_review_with_taste
+        return _generate_review_with_taste(survey_data, store_id, taste,
+                                           openai_client=client, raise_errors=True, stream=True)
+    from ..blueprints.survey import _generate_review_text
+    return _generate_review_text(survey_data, store_id, openai_client=client,
+                                 raise_errors=True, stream=True)
+
+
+def _client():
+    if _client_override is not None:
+        return _client_override
+    if fake_enabled():
+        return FakeOpenAIClient()
+    return None  # 生成関数がアプリ→店舗→テナントの順にキーを解決する
+
+
+# ===== 登録・取得 =====
+def enqueue_review_job(store_id: int, survey_data: Dict[str, Any],
+                       response_id: Optional[int] = None, taste: Optional[str] = None,
+                       defer: float = 0.0) -> int:
+    """
+    口コミ生成ジョブを登録して job_id を返す（生成はバックグラウンド）
+    defer: バックグラウンド実行を遅らせる秒数（その間は claim_review_job() で取得できる）
+    """
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    sql = """
+        INSERT INTO "T_口コミ生成ジョブ" (
+            store_id, response_id, taste, payload_json, status, max_attempts, run_after
+        ) VALUES (?, ?, ?, ?, 'queued', ?, ?)
+    """
+    params = (store_id, response_id, taste, json.dumps(survey_data, ensure_ascii=False),
+              REVIEW_JOB_MAX_ATTEMPTS, time.time() + defer)
+    if get_db_type() == 'postgresql':
+        execute_query(cur, sql + " RETURNING id", params)
+        job_id = cur.fetchone()[0]
+    else:
+        execute_query(cur, sql, params)
+        job_id = cur.lastrowid
+    conn.commit()
+    conn.close()
+    _submit(job_id, defer)
+    return job_id
+
+
+def get_review_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """
+    ジョブの状態を取得する。
+    実行されていない queued ジョブや、止まった running ジョブはこのワーカーで実行し直す。
+    """
+    row = _load(job_id)
+    if row is None:
+        return None
+    now = time.time()
+    if row["status"] == "running" and row["locked_at"] and now - row["locked_at"] > REVIEW_JOB_STALE_SECONDS:
+        if _requeue_stale(job_id, row["locked_at"]):
+            row["status"] = "queued"
+    if row["status"] == "queued" and row["run_after"] <= now:
+        _submit(job_id)
+    return row
+
+
+def _load(job_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    execute_query(cur, """
+        SELECT id, store_id, response_id, taste, payload_json, status, attempts,
+               max_attempts, run_after, locked_at, result_text, error
+        FROM "T_口コミ生成ジョブ"
+        WHERE id = ?
+    """, (job_id,))
+    row = cur.fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {key: row[key] for key in row.keys()}
+
+
+def _update(sql: str, params: tuple) -> int:
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    execute_query(cur, sql, params)
+    count = cur.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+
+def _requeue_stale(job_id: int, locked_at: float) -> bool:
+    return _update("""
+        UPDATE "T_口コミ生成ジョブ"
+        SET status = 'queued', locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'running' AND locked_at = ?
+    """, (job_id, locked_at)) == 1
+
+
+# ===== 実行 =====
+def _submit(job_id: int, delay: float = 0.0) -> None:
+    if delay > 0:
+        t = threading.Timer(delay, _submit, args=(job_id,))
+        t.daemon = True
+        t.start()
+        return
+    executor = _get_executor()
+    with _lock:
+        if job_id in _inflight:
+            return
+        _inflight.add(job_id)
+    try:
+        executor.submit(_run, job_id)
+    except RuntimeError:
+        # シャットダウン中
+        with _lock:
+            _inflight.discard(job_id)
+
+
+def _claim(job_id: int, ignore_schedule: bool = False) -> Optional[Dict[str, Any]]:
+    """queued のジョブを running にして取得（他のワーカーと取り合った場合は None）"""
+    now = time.time()
+    sql = """
+        UPDATE "T_口コミ生成ジョブ"
+        SET status = 'running', attempts = attempts + 1, locked_at = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'queued'
+    """
+    if ignore_schedule:
+        claimed = _update(sql, (now, job_id))
+    else:
+        claimed = _update(sql + " AND run_after <= ?", (now, job_id, now))
+    return _load(job_id) if claimed == 1 else None
+
+
+def _run(job_id: int) -> None:
+    retry_delay = None
+    try:
+        job = _claim(job_id)
+        if job is None:
+            return
+        survey_data = json.loads(job["payload_json"])
+        generate = _generator or _default_generate
+        try:
+            text = generate(survey_data, job["store_id"], job["taste"], _client())
+        except Exception as e:
+            retry_delay = _retry_or_fail(job, e)
+            return
+        _complete(job, text)
+    except Exception as e:
+        print(f"⚠️ 口コミ生成ジョブの実行に失敗 (job_id={job_id}): {e}")
+    finally:
+        with _lock:
+            _inflight.discard(job_id)
+        if retry_delay is not None:
+            _submit(job_id, retry_delay)
+
+
+def _complete(job: Dict[str, Any], text: str) -> None:
+    _update("""
+        UPDATE "T_口コミ生成ジョブ"
+        SET status = 'done', result_text = ?, error = NULL, locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (text, job["id"]))
+    if job["response_id"]:
+        save_generated_review(job["response_id"], text)
+
+
+def _retry_or_fail(job: Dict[str, Any], exc: Exception) -> Optional[float]:
+    """再試行するなら待ち秒数、失敗確定なら None を返す"""
+    error = f"{type(exc).__name__}: {exc}"
+    if job["attempts"] < job["max_attempts"]:
+        delay = REVIEW_JOB_BACKOFF * (2 ** (job["attempts"] - 1))
+        print(f"⚠️ 口コミ生成に失敗、{delay:.0f}秒後に再試行します (job_id={job['id']}, "
+              f"{job['attempts']}/{job['max_attempts']}): {error}")
+        _update("""
+            UPDATE "T_口コミ生成ジョブ"
+            SET status = 'queued', run_after = ?, error = ?, locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (time.time() + delay, error, job["id"]))
+        return delay
+    print(f"⚠️ 口コミ生成ジョブが失敗しました (job_id={job['id']}): {error}")
+    _update("""
+        UPDATE "T_口コミ生成ジョブ"
+        SET status = 'failed', result_text = ?, error = ?, locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (FAILED_REVIEW_TEXT, error, job["id"]))
+    return None
+
+
+# ===== ストリーミング配信 =====
+def claim_review_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """
+    SSE 接続からジョブを取得する（run_after を待たない）。
+    すでに実行中・完了済みなら None（呼び出し側は get_review_job() のポーリングに切り替える）
+    """
+    return _claim(job_id, ignore_schedule=True)
+
+
+def stream_review_job(job: Dict[str, Any]) -> Iterator[str]:
+    """
+    claim_review_job() で取得したジョブの本文を断片ごとに返す。
+    最後まで読み切ると完了として保存し、失敗時は通常の再試行に回す。
+    途中で接続が切れた場合はジョブを queued に戻し、バックグラウンドで生成し直す。
+    """
+    survey_data = json.loads(job["payload_json"])
+    parts = []
+    try:
+        if _generator is not None:
+            deltas = iter([_generator(survey_data, job["store_id"], job["taste"], _client())])
+        else:
+            deltas = _default_stream(survey_data, job["store_id"], job["taste"], _client())
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+        text = "".join(parts).strip()
+        if not text:
+            raise RuntimeError("empty completion")
+    except GeneratorExit:
+        _release(job)
+        raise
+    except Exception as e:
+        delay = _retry_or_fail(job, e)
+        if delay is not None:
+            _submit(job["id"], delay)
+        raise
+    _complete(job, text)
+
+
+def _release(job: Dict[str, Any]) -> None:
+    """実行中のジョブを試行回数を戻して queued に戻す"""
+    _update("""
+        UPDATE "T_口コミ生成ジョブ"
+        SET status = 'queued', attempts = attempts - 1, run_after = ?, locked_at = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'running'
+    """, (time.time(), job["id"]))
+    _submit(job["id"])
+
+
+def save_generated_review(response_id: int, text: str) -> None:
+    """T_アンケート回答.generated_review を更新"""
+    _update("""
+        UPDATE "T_アンケート回答" SET generated_review = ? WHERE id = ?
+    """, (text, response_id))
+
+
+def load_generated_review(response_id: int) -> Optional[str]:
+    """T_アンケート回答.generated_review を取得（未生成なら None）"""
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    execute_query(cur, """
+        SELECT generated_review FROM "T_アンケート回答" WHERE id = ?
+    """, (response_id,))
+    row = cur.fetchone()
+    conn.close()
+    return (row[0] or None) if row else None
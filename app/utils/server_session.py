@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+サーバー側セッション
+
+Flask 標準の署名付き Cookie セッションはセッションの中身をすべて Cookie に入れるため、
+アンケート本文（survey_data_*）・生成した口コミ・スロット履歴が入ると毎リクエスト数KBを送受信し、
+ブラウザの 4KB 制限を超えると黙って切り捨てられる。
+ここでは中身をサーバー側に置き、Cookie には署名付きの「セッションID.リビジョン」だけを入れる。
+
+保存先（SESSION_BACKEND）:
+  database  "T_セッション" テーブル（SQLite / PostgreSQL）+ ワーカー内の LRU キャッシュ（既定）
+  memory    ワーカー内の LRU キャッシュのみ（開発用。ワーカー間・再起動後は共有されない）
+  cookie    Flask 標準の署名付き Cookie セッション（従来どおり）
+
+- 書き込むたびにリビジョンを1つ進めて Cookie に入れる。LRU キャッシュの内容は Cookie のリビジョンと
+  一致するときだけ使い、別ワーカーで更新されたセッションは DB から読み直す
+- 変更のないリクエストでは書き込まない（有効期限の残りが半分を切ったときだけ延長する）
+- 空になったセッションは行ごと削除し、Cookie も消す
+- session.clear()（ログイン・ログアウト時の各ヘルパーが呼ぶ）は ID を捨て、次の保存で新しい ID を発行して
+  古い行を削除する（ログイン前に取得された Cookie でログイン後のセッションを使われないようにする）
+- Cookie のリビジョンが古くても（同時に送られたリクエストが先に保存した場合など）セッションは有効で、
+  DB の最新の中身を読む（リビジョンは LRU キャッシュを使ってよいかの判定にだけ使う）
+- 期限切れの行はワーカーごとのバックグラウンドスレッドが SESSION_GC_INTERVAL 秒ごとに削除する
+- 中身は Flask 標準と同じ TaggedJSONSerializer で保存する（flash のタプルなどもそのまま戻る）
+
+環境変数:
+  SESSION_BACKEND        database / memory / cookie（既定 database）
+  SESSION_LIFETIME       最後に書き込んでから期限切れになるまでの秒数（既定 604800 = 7日）
+  SESSION_CACHE_SIZE     ワーカー内 LRU キャッシュの件数（既定 2048）
+  SESSION_GC_INTERVAL    期限切れセッションを削除する間隔（秒、既定 600、0 なら削除しない）
+"""
+
+import os
+import secrets
+import threading
+import time
+from typing import Optional, Tuple
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from db_config import get_db_connection, get_cursor, execute_query
+from .cache import TTLCache
+
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "database").lower()
+SESSION_LIFETIME = int(os.environ.get("SESSION_LIFETIME", str(7 * 24 * 3600)))
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "2048"))
+SESSION_GC_INTERVAL = float(os.environ.get("SESSION_GC_INTERVAL", "600"))
+
+SESSION_TABLE = "T_セッション"
+
+# (rev, 直列化した中身, expires_at)
+StoredSession = Tuple[int, str, int]
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """サーバー側に中身を置くセッション（sid が None なら未保存）"""
+
+    def __init__(self, initial=None, sid: Optional[str] = None, rev: int = 0, expires_at: int = 0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.rev = rev
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        self.discarded_sid = None  # regenerate() で捨てた ID（保存時に行を削除する）
+
+    def regenerate(self) -> None:
+        """次の保存で新しい ID を発行し、今の ID の行を削除する（中身はそのまま）"""
+        if self.sid is not None:
+            self.discarded_sid = self.discarded_sid or self.sid
+        self.sid = None
+        self.rev = 0
+        self.expires_at = 0
+        self.modified = True
+
+    def clear(self) -> None:
+        self.regenerate()
+        super().clear()
+
+
+# ===== 保存先 =====
+class MemorySessionStore:
+    """ワーカー内の LRU キャッシュ（単独でも、DB の前段としても使う）"""
+
+    def __init__(self, maxsize: int = SESSION_CACHE_SIZE, lifetime: int = SESSION_LIFETIME):
+        self._cache = TTLCache("server_session", ttl=lifetime, maxsize=maxsize)
+
+    def load(self, sid: str, rev: Optional[int] = None) -> Optional[StoredSession]:
+        """保存されている最新の中身（単独で使う場合は rev によらず返す）"""
+        item = self._cache.get(sid)
+        if item is None or item[2] <= time.time():
+            return None
+        return item
+
+    def cached(self, sid: str, rev: int) -> Optional[StoredSession]:
+        """DB の前段として使う場合：Cookie のリビジョンと一致するときだけ返す"""
+        item = self.load(sid)
+        if item is None or item[0] != rev:
+            return None
+        return item
+
+    def save(self, sid: str, rev: int, data: str, expires_at: int) -> None:
+        self._cache.set(sid, (rev, data, expires_at), ttl=max(1, expires_at - time.time()))
+
+    def delete(self, sid: str) -> None:
+        self._cache.invalidate(sid)
+
+    def purge_expired(self) -> int:
+        # 期限切れは TTLCache が読み出し時・満杯時に捨てる
+        return 0
+
+
+class DatabaseSessionStore:
+    """"T_セッション" テーブル。memory を渡すと読み出しの前段キャッシュにする"""
+
+    def __init__(self, memory: Optional[MemorySessionStore] = None):
+        self.memory = memory
+
+    def load(self, sid: str, rev: Optional[int] = None) -> Optional[StoredSession]:
+        """
+        rev は Cookie のリビジョン。キャッシュが同じリビジョンならそれを返し、
+        違えば（別ワーカー・同時リクエストで更新済み）DB の最新の行を読む
+        """
+        if self.memory is not None and rev is not None:
+            item = self.memory.cached(sid, rev)
+            if item is not None:
+                return item
+        conn = get_db_connection()
+        try:
+            cur = get_cursor(conn)
+            execute_query(cur, f'SELECT rev, data, expires_at FROM "{SESSION_TABLE}" WHERE sid = ? AND expires_at > ?',
+                          (sid, int(time.time())))
+            row = cur.fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        item = (int(row[0]), row[1], int(row[2]))
+        if self.memory is not None:
+            self.memory.save(sid, *item)
+        return item
+
+    def save(self, sid: str, rev: int, data: str, expires_at: int) -> None:
+        conn = get_db_connection()
+        try:
+            cur = get_cursor(conn)
+            execute_query(cur, f'''
+                INSERT INTO "{SESSION_TABLE}" (sid, rev, data, expires_at, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (sid) DO UPDATE SET
+                    rev = excluded.rev,
+                    data = excluded.data,
+                    expires_at = excluded.expires_at,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (sid, rev, data, expires_at))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if self.memory is not None:
+            self.memory.save(sid, rev, data, expires_at)
+
+    def delete(self, sid: str) -> None:
+        if self.memory is not None:
+            self.memory.delete(sid)
+        conn = get_db_connection()
+        try:
+            cur = get_cursor(conn)
+            execute_query(cur, f'DELETE FROM "{SESSION_TABLE}" WHERE sid = ?', (sid,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def purge_expired(self) -> int:
+        """期限切れの行を削除し、削除件数を返す"""
+        conn = get_db_connection()
+        try:
+            cur = get_cursor(conn)
+            execute_query(cur, f'DELETE FROM "{SESSION_TABLE}" WHERE expires_at <= ?', (int(time.time()),))
+            count = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return count
+
+
+# ===== 期限切れセッションの削除（ワーカーごと、fork 後は作り直す） =====
+_gc_thread = None
+_gc_pid = None
+_gc_lock = threading.Lock()
+
+
+def _gc_loop(store, interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            count = store.purge_expired()
+            if count:
+                print(f"✅ 期限切れセッションを {count} 件削除しました")
+        except Exception as e:
+            print(f"⚠️ 期限切れセッションの削除に失敗: {e}")
+
+
+def _ensure_gc(store) -> None:
+    global _gc_thread, _gc_pid
+    if SESSION_GC_INTERVAL <= 0:
+        return
+    with _gc_lock:
+        if _gc_thread is not None and _gc_pid == os.getpid():
+            return
+        _gc_thread = threading.Thread(target=_gc_loop, args=(store, SESSION_GC_INTERVAL),
+                                      name="session-gc", daemon=True)
+        _gc_pid = os.getpid()
+        _gc_thread.start()
+
+
+# ===== Flask への組み込み =====
+class ServerSessionInterface(SessionInterface):
+    """Cookie には署名付きの「sid.rev」だけを入れ、中身は store に置く"""
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSession
+
+    def __init__(self, store, lifetime: int = SESSION_LIFETIME):
+        self.store = store
+        self.lifetime = lifetime
+
+    def _signer(self, app) -> Optional[Signer]:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt="server-session")
+
+    def open_session(self, app, request) -> Optional[ServerSession]:
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        raw = request.cookies.get(self.get_cookie_name(app))
+        if not raw:
+            return self.session_class()
+        try:
+            sid, rev = signer.unsign(raw).decode("ascii").rsplit(".", 1)
+            rev = int(rev)
+        except (BadSignature, ValueError, UnicodeDecodeError):
+            return self.session_class()
+        try:
+            item = self.store.load(sid, rev)
+        except Exception as e:
+            print(f"⚠️ セッションの読み込みに失敗: {e}")
+            item = None
+        if item is None:
+            # 期限切れ・削除済み：新しいIDで作り直す（古いIDは再利用しない）
+            return self.session_class()
+        stored_rev, data, expires_at = item
+        return self.session_class(self.serializer.loads(data), sid=sid, rev=stored_rev, expires_at=expires_at)
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        # clear() / regenerate() で捨てた ID と、空にされたセッションの行を消す
+        stale = [session.discarded_sid]
+        if not session and session.modified:
+            stale.append(session.sid)
+        for sid in filter(None, stale):
+            try:
+                self.store.delete(sid)
+            except Exception as e:
+                print(f"⚠️ セッションの削除に失敗: {e}")
+        session.discarded_sid = None
+
+        # 空のセッションは保存しない。空にされたら Cookie を消す
+        if not session:
+            if session.modified:
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       partitioned=partitioned, samesite=samesite, httponly=httponly)
+                response.vary.add("Cookie")
+            return
+
+        now = int(time.time())
+        if not session.modified and session.expires_at - now > self.lifetime // 2:
+            return
+
+        sid = session.sid or secrets.token_urlsafe(32)
+        rev = session.rev + 1 if session.modified else session.rev
+        try:
+            self.store.save(sid, rev, self.serializer.dumps(dict(session)), now + self.lifetime)
+        except Exception as e:
+            print(f"⚠️ セッションの保存に失敗: {e}")
+            return
+        _ensure_gc(self.store)
+
+        if sid == session.sid and rev == session.rev and not self.should_set_cookie(app, session):
+            return
+        value = self._signer(app).sign(f"{sid}.{rev}").decode("ascii")
+        response.set_cookie(name, value, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure,
+                            partitioned=partitioned, samesite=samesite)
+        response.vary.add("Cookie")
+
+
+def create_store(backend: str = SESSION_BACKEND):
+    """SESSION_BACKEND に対応する保存先（cookie なら None）"""
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "database":
+        return DatabaseSessionStore(MemorySessionStore())
+    raise ValueError(f"未対応の SESSION_BACKEND です: {backend}")
+
+
+def init_app(app, backend: str = SESSION_BACKEND) -> None:
+    """Flask アプリのセッションをサーバー側保存に切り替える（cookie なら何もしない）"""
+    store = create_store(backend)
+    if store is None:
+        return
+    app.session_interface = ServerSessionInterface(store)
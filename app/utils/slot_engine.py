@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+コンパイル済みスロットエンジン
+
+スロット設定（Config）から抽選に必要なテーブルを一度だけ組み立てておき、
+スピンはメモリ上の抽選だけで完結させる。
+
+- 確率の正規化とエイリアス表（AliasSampler、1回の抽選 O(1)）
+- 通常シンボル／リーチ専用シンボルの分類
+- ハズレ時の2コマ目、リーチ時の3コマ目に使う除外済み候補リスト
+
+店舗ごとのエンジンは T_店舗_スロット設定.updated_at をバージョンとしてキャッシュする。
+設定保存時は invalidate_store_engine() を呼ぶこと（他ワーカーは TTL 後にバージョン比較で反映）。
+共通設定（data/config.json）のエンジンはファイルの更新時刻で再構築する。
+"""
+
+import os
+import random
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models import Symbol, Config
+from .cache import TTLCache
+from .slot_logic import AliasSampler
+
+SLOT_ENGINE_TTL = float(os.environ.get("SLOT_ENGINE_TTL", "60"))
+
+# Symbol クラスに定義されているフィールド（店舗設定の is_disabled などは無視する）
+SYMBOL_FIELDS = {'id', 'label', 'payout_3', 'color', 'prob', 'is_reach', 'reach_symbol'}
+
+# ハズレ判定やリールの見た目の抽選にも OS の乱数を使う
+_rng = random.SystemRandom()
+
+
+def _reel(s: Symbol) -> Dict[str, Any]:
+    return {"id": s.id, "label": s.label, "color": s.color}
+
+
+def config_from_dict(config_dict: Dict[str, Any]) -> Config:
+    """store_db.get_slot_config() の辞書を Config に変換"""
+    symbols = [Symbol(**{k: v for k, v in s.items() if k in SYMBOL_FIELDS})
+               for s in config_dict.get('symbols', [])]
+    return Config(
+        symbols=symbols,
+        reels=config_dict.get('reels', 3),
+        base_bet=config_dict.get('base_bet', 1),
+        expected_total_5=config_dict.get('expected_total_5', 100.0),
+        miss_probability=config_dict.get('miss_probability', 0.0)
+    )
+
+
+class SlotMachine:
+    """抽選テーブルを事前計算したスロット（生成後は読み取り専用）"""
+
+    def __init__(self, config: Config, version: Any = None):
+        self.config = config
+        self.version = version
+        self.expected_total_5 = config.expected_total_5
+        self.miss_rate = float(config.miss_probability) / 100.0
+
+        # 確率の正規化（元の Config は書き換えない）
+        psum = sum(float(s.prob) for s in config.symbols) or 100.0
+        self.symbols = [
+            Symbol(id=s.id, label=s.label, payout_3=s.payout_3, color=s.color,
+                   prob=float(s.prob) / psum * 100.0,
+                   is_reach=s.is_reach, reach_symbol=s.reach_symbol)
+            for s in config.symbols
+        ]
+
+        # 当たり／リーチのシンボル抽選表
+        self._sampler = AliasSampler(self.symbols, [s.prob for s in self.symbols])
+
+        # 通常シンボルとリーチ専用シンボルを分類
+        self.normal_symbols = [s for s in self.symbols if not s.is_reach]
+        self.reach_symbols = [s for s in self.symbols if s.is_reach]
+
+        # ハズレ時の2コマ目候補（1コマ目と異なるシンボル）
+        self._reel2_choices = [
+            [o for o in self.normal_symbols if o.id != s.id] or [s]
+            for s in self.normal_symbols
+        ]
+
+        # リーチ専用シンボル → (揃える元シンボル, 3コマ目候補)
+        self._reach_table: Dict[str, Tuple[Symbol, List[Symbol]]] = {}
+        for s in self.reach_symbols:
+            reach_id = s.reach_symbol or s.id
+            original = next((n for n in self.normal_symbols if n.id == reach_id), s)
+            others = [n for n in self.normal_symbols if n.id != reach_id] or [original]
+            self._reach_table[s.id] = (original, others)
+
+    def draw_symbol(self) -> Symbol:
+        """確率に基づいてシンボルを1つ抽選"""
+        return self._sampler.draw_one()
+
+    def spin_once(self, symbol: Optional[Symbol] = None) -> Dict[str, Any]:
+        """1回分のスピン結果（symbol は当たり時に使う抽選済みシンボル）"""
+        # まずハズレかどうかを判定
+        if _rng.random() < self.miss_rate:
+            # ハズレ：1コマ目と2コマ目は必ず異なるシンボル
+            i = _rng.randrange(len(self.normal_symbols))
+            reel1 = self.normal_symbols[i]
+            reel2 = _rng.choice(self._reel2_choices[i])
+            reel3 = _rng.choice(self.normal_symbols)
+            return {
+                "reels": [_reel(reel1), _reel(reel2), _reel(reel3)],
+                "matched": False,
+                "is_reach": False,
+                "payout": 0
+            }
+
+        # 当たりまたはリーチハズレ：シンボルを確率で抽選
+        if symbol is None:
+            symbol = self.draw_symbol()
+        if symbol.is_reach:
+            # リーチハズレ：1,2コマ目は同じ、3コマ目は必ず異なる
+            original, others = self._reach_table[symbol.id]
+            reel3 = _rng.choice(others)
+            return {
+                "reels": [_reel(original), _reel(original), _reel(reel3)],
+                "matched": False,
+                "is_reach": True,
+                "reach_symbol": _reel(original),
+                "payout": 0
+            }
+
+        # 通常の当たり：3つ揃い
+        return {
+            "reels": [_reel(symbol), _reel(symbol), _reel(symbol)],
+            "matched": True,
+            "is_reach": False,
+            "symbol": _reel(symbol),
+            "payout": symbol.payout_3
+        }
+
+    def spin(self, n: int = 5) -> Tuple[List[Dict[str, Any]], float]:
+        """n 回スピンして (各スピン結果, 合計配当) を返す"""
+        spins = [self.spin_once(sym) for sym in self._sampler.draw(n)]
+        total_payout = 0.0
+        for sp in spins:
+            total_payout += sp["payout"]
+        return spins, total_payout
+
+
+# ===== 店舗ごとのエンジン =====
+_engine_cache = TTLCache("slot_engine", ttl=SLOT_ENGINE_TTL, maxsize=2048)
+# TTL 切れ後に updated_at が変わっていなければ再コンパイルせずに使い回す
+_compiled: Dict[int, SlotMachine] = {}
+
+
+def get_store_engine(store_id: int) -> SlotMachine:
+    """店舗のコンパイル済みスロットを取得"""
+    engine = _engine_cache.get(store_id)
+    if engine is not None:
+        return engine
+
+    import store_db
+    config_dict, version = store_db.get_slot_config_with_version(store_id)
+    engine = _compiled.get(store_id)
+    if engine is None or version is None or engine.version != version:
+        engine = SlotMachine(config_from_dict(config_dict), version)
+        _compiled[store_id] = engine
+    _engine_cache.set(store_id, engine)
+    return engine
+
+
+def invalidate_store_engine(store_id: Optional[int] = None) -> None:
+    """店舗のエンジンを破棄（store_id 省略時は全店舗）"""
+    if store_id is None:
+        _engine_cache.clear()
+        _compiled.clear()
+        return
+    _engine_cache.invalidate(store_id)
+    _compiled.pop(store_id, None)
+
+
+# ===== 共通設定（data/config.json）のエンジン =====
+_global_engine: Optional[SlotMachine] = None
+_global_lock = threading.Lock()
+
+
+def _config_file_version():
+    from .config import CONFIG_PATH
+    try:
+        st = os.stat(CONFIG_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_global_engine() -> SlotMachine:
+    """共通設定のコンパイル済みスロットを取得（config.json 更新時に再構築）"""
+    global _global_engine
+    from .config import load_config
+    version = _config_file_version()
+    engine = _global_engine
+    if engine is not None and version is not None and engine.version == version:
+        return engine
+    with _global_lock:
+        engine = _global_engine
+        if engine is None or version is None or engine.version != version:
+            cfg = load_config()
+            engine = SlotMachine(cfg, _config_file_version())
+            _global_engine = engine
+    return engine
+
+
+def invalidate_global_engine() -> None:
+    global _global_engine
+    with _global_lock:
+        _global_engine = None
@@ -3,28 +3,85 @@
 スロット機能のロジック
 """
 from __future__ import annotations
-from typing import List
+from typing import Any, List
 import secrets
 import math
 from decimal import Decimal
+from fractions import Fraction
 from ..models import Symbol, Config
 
 
-def choice_by_prob(symbols: List[Symbol]) -> Symbol:
-    """確率に基づいてシンボルを選択"""
-    buckets = []
-    acc = 0
-    for s in symbols:
-        w = max(0, int(round(float(s.prob) * 100)))
-        acc += w
-        buckets.append((acc, s))
-    if acc <= 0:
-        return symbols[-1]
-    r = secrets.randbelow(acc)
-    for edge, s in buckets:
-        if r < edge:
-            return s
-    return symbols[-1]
+class AliasSampler:
+    """
+    Walker/Vose のエイリアス法による重み付き抽選（構築 O(n)、1回の抽選 O(1)）
+
+    exact=True（既定）では確率の float 値をそのまま有理数として扱うため、
+    ごく小さい確率のシンボルも丸められずに抽選される。
+    exact=False では従来の choice_by_prob と同じ 0.01% 単位に丸める。
+    乱数は secrets（OS の暗号論的乱数）を使う。
+    """
+
+    def __init__(self, items: List[Any], weights: List[float], exact: bool = True):
+        if len(items) != len(weights):
+            raise ValueError("items と weights の長さが一致しません")
+        self.items = list(items)
+        self.n = len(self.items)
+        ints = self._integer_weights(weights, exact)
+        self.total = sum(ints)
+        self._prob: List[int] = [0] * self.n
+        self._alias: List[int] = list(range(self.n))
+        if self.total > 0:
+            self._build(ints)
+
+    @staticmethod
+    def _integer_weights(weights: List[float], exact: bool) -> List[int]:
+        if not exact:
+            return [max(0, int(round(float(w) * 100))) for w in weights]
+        # float は 2 進の有理数なので、分母をそろえれば誤差なく整数化できる
+        fracs = [Fraction(max(0.0, float(w))) for w in weights]
+        denom = max((f.denominator for f in fracs), default=1)
+        return [int(f * denom) for f in fracs]
+
+    def _build(self, ints: List[int]) -> None:
+        # 各列の容量を total とし、重み×n を列に詰め替える（すべて整数演算）
+        W = self.total
+        scaled = [w * self.n for w in ints]
+        small = [i for i, w in enumerate(scaled) if w < W]
+        large = [i for i, w in enumerate(scaled) if w >= W]
+        while small and large:
+            l = small.pop()
+            g = large.pop()
+            self._prob[l] = scaled[l]
+            self._alias[l] = g
+            scaled[g] = scaled[g] + scaled[l] - W
+            (small if scaled[g] < W else large).append(g)
+        for i in small + large:
+            self._prob[i] = W
+
+    def _pick(self, x: int) -> Any:
+        col, r = divmod(x, self.total)
+        return self.items[col if r < self._prob[col] else self._alias[col]]
+
+    def draw_one(self) -> Any:
+        """1件抽選（重みがすべて0なら最後の要素）"""
+        if self.total <= 0:
+            return self.items[-1]
+        return self._pick(secrets.randbelow(self.n * self.total))
+
+    def draw(self, n: int) -> List[Any]:
+        """n 件をまとめて抽選"""
+        if self.total <= 0:
+            return [self.items[-1]] * n
+        span = self.n * self.total
+        return [self._pick(secrets.randbelow(span)) for _ in range(n)]
+
+
+def choice_by_prob(symbols: List[Symbol], exact: bool = True) -> Symbol:
+    """
+    確率に基づいてシンボルを選択
+    同じ設定で繰り返し抽選する場合は AliasSampler を一度だけ作って使い回すこと。
+    """
+    return AliasSampler(symbols, [s.prob for s in symbols], exact=exact).draw_one()
 
 
 def expected_total5_from_inverse(payouts: List[float]) -> float:
@@ -91,10 +148,13 @@ def solve_probs_for_target_expectation(payouts: List[float], target_e1: float) -
 
 
 def decimal_scale(values: List[float]) -> int:
-    """小数点以下の桁数に基づいてスケールを計算"""
+    """
+    小数点以下の桁数に基づいてスケールを計算
+    桁数は float の最短表記（repr）で数える（Decimal(0.1) は2進展開の55桁になるため）
+    """
     max_dec = 0
     for v in values:
-        s = f"{Decimal(v):f}"
+        s = f"{Decimal(repr(float(v))):f}"
         if "." in s:
             d = len(s.split(".")[1].rstrip("0"))
             if d > max_dec:
@@ -104,49 +164,15 @@ def decimal_scale(values: List[float]) -> int:
 
 def prob_total_ge(symbols: List[Symbol], spins: int, threshold: float) -> float:
     """spins回の合計配当がthreshold以上となる確率"""
-    vs = [float(s.payout_3) for s in symbols]
-    ps = [float(s.prob) / 100.0 for s in symbols]
-    if not vs or not ps:
+    if not symbols:
         return 0.0
-    S = sum(ps) or 1.0
-    ps = [p / S for p in ps]
-    scale = decimal_scale(vs + [threshold])
-    ivs = [int(round(v * scale)) for v in vs]
-    thr = int(round(threshold * scale))
-    max_sum = spins * max(ivs)
-    pmf = [0.0] * (max_sum + 1)
-    pmf[0] = 1.0
-    for _ in range(spins):
-        nxt = [0.0] * (max_sum + 1)
-        for ssum, pcur in enumerate(pmf):
-            if pcur == 0.0:
-                continue
-            for vi, pi in zip(ivs, ps):
-                nxt[ssum + vi] += pcur * pi
-        pmf = nxt
-    return float(sum(pmf[thr:]))
+    from .payout_dist import get_distribution
+    return get_distribution(symbols, spins).prob_ge(threshold)
 
 
 def prob_total_le(symbols: List[Symbol], spins: int, threshold: float) -> float:
     """spins回の合計配当がthreshold以下となる確率"""
-    vs = [float(s.payout_3) for s in symbols]
-    ps = [float(s.prob) / 100.0 for s in symbols]
-    if not vs or not ps:
+    if not symbols:
         return 0.0
-    S = sum(ps) or 1.0
-    ps = [p / S for p in ps]
-    scale = decimal_scale(vs + [threshold])
-    ivs = [int(round(v * scale)) for v in vs]
-    thr = int(round(threshold * scale))
-    max_sum = spins * max(ivs)
-    pmf = [0.0] * (max_sum + 1)
-    pmf[0] = 1.0
-    for _ in range(spins):
-        nxt = [0.0] * (max_sum + 1)
-        for ssum, pcur in enumerate(pmf):
-            if pcur == 0.0:
-                continue
-            for vi, pi in zip(ivs, ps):
-                nxt[ssum + vi] += pcur * pi
-        pmf = nxt
-    return float(sum(pmf[:thr + 1]))
+    from .payout_dist import get_distribution
+    return get_distribution(symbols, spins).prob_le(threshold)
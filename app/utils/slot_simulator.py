@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+スロット設定のモンテカルロ検証
+
+店舗のスロット設定（T_店舗_スロット設定）と景品設定（T_店舗_景品設定）、
+または共通設定（data/config.json / data/settings.json）を読み込み、
+1プレイ（既定 5 回転）の合計配当を大量に抽選して景品ごとの当選率を集計する。
+結果は信頼区間（Wilson）付きで、合計配当分布の厳密計算（payout_dist）と突き合わせる。
+
+- 抽選は SlotMachine.spin_once と同じ規則: ハズレ確率でハズレ（0点）、
+  それ以外は正規化した確率でシンボルを選び、リーチ専用シンボルは 0 点、通常シンボルは payout_3
+- 配当は payout_dist と同じく整数単位に直して合計するため、浮動小数の誤差で景品の境界がずれない
+- NumPy があれば batch プレイ分をまとめて配列で抽選し、合計値ごとの件数（bincount）だけを持ち帰る
+  NumPy がなければ random.Random による逐次抽選になる（遅いが結果の形は同じ）
+- 複数プロセスに分割し、各分割は SeedSequence.spawn による独立した乱数列を使う（--seed で再現可能）
+
+使い方:
+  python -m app.utils.slot_simulator                       # 共通設定で 100万プレイ
+  python -m app.utils.slot_simulator --store 3 --plays 100000000 --workers 8 --seed 1
+
+終了コード: 0 = 全景品の厳密値が信頼区間内 / 1 = 区間外の景品あり
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .payout_dist import DistributionTooLarge, PayoutDistribution
+from .prize_table import PrizeTable
+
+# ---- NumPy の有無（なくても動作する） ----
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+SIM_BATCH = int(os.environ.get("SLOT_SIM_BATCH", "1000000"))
+
+# 合計値の最大がこれ以下なら bincount、超える場合は unique で数える
+_BINCOUNT_MAX = 1 << 22
+
+NO_PRIZE = "（景品なし）"
+
+
+class SpinModel:
+    """1回転の配当の分布（整数単位）と、プレイの合計配当の厳密分布"""
+
+    def __init__(self, engine, spins: int = 5):
+        self.spins = max(1, int(spins))
+        miss = min(1.0, max(0.0, engine.miss_rate))
+        payouts = [0.0] + [0.0 if s.is_reach else float(s.payout_3) for s in engine.symbols]
+        probs = [miss] + [(1.0 - miss) * float(s.prob) / 100.0 for s in engine.symbols]
+        total = sum(probs) or 1.0
+        self.probs = [p / total for p in probs]
+        self.exact = PayoutDistribution(payouts, self.probs, self.spins)
+        # PayoutDistribution と同じ単位（payout * scale / step）の整数配当
+        self.units = [self.exact.units_of(v) for v in payouts]
+
+    def to_score(self, units: int) -> float:
+        return units * self.exact.step / self.exact.scale
+
+    def expected_units(self) -> float:
+        return self.spins * sum(k * p for k, p in zip(self.units, self.probs))
+
+
+# ===== 抽選（プロセスプールで実行される） =====
+def _simulate_shard(args) -> Tuple[Dict[int, int], int]:
+    """1分割分のプレイを抽選し、(合計配当[単位] → 件数, プレイ数) を返す"""
+    units, probs, spins, plays, batch, seed = args
+    counts: Counter = Counter()
+    if np is None:
+        rng = random.Random(seed)
+        population = range(len(units))
+        for _ in range(plays):
+            picks = rng.choices(population, weights=probs, k=spins)
+            counts[sum(units[i] for i in picks)] += 1
+        return dict(counts), plays
+
+    rng = np.random.Generator(np.random.PCG64(seed))
+    cdf = np.cumsum(np.asarray(probs, dtype=np.float64))
+    cdf /= cdf[-1]
+    values = np.asarray(units, dtype=np.int64)
+    use_bincount = values.min() >= 0 and int(values.max()) * spins <= _BINCOUNT_MAX
+    hist = np.zeros(int(values.max()) * spins + 1 if use_bincount else 0, dtype=np.int64)
+    done = 0
+    while done < plays:
+        n = min(batch, plays - done)
+        idx = np.searchsorted(cdf, rng.random((n, spins)), side="right")
+        np.minimum(idx, len(values) - 1, out=idx)
+        totals = values[idx].sum(axis=1)
+        if use_bincount:
+            hist += np.bincount(totals, minlength=len(hist))
+        else:
+            keys, cnt = np.unique(totals, return_counts=True)
+            counts.update(dict(zip(keys.tolist(), cnt.tolist())))
+        done += n
+    if use_bincount:
+        nz = np.nonzero(hist)[0]
+        counts.update(dict(zip(nz.tolist(), hist[nz].tolist())))
+    return dict(counts), plays
+
+
+def _shard_seeds(seed: Optional[int], shards: int) -> List[Any]:
+    if np is None:
+        base = random.Random(seed)
+        return [base.getrandbits(64) for _ in range(shards)]
+    return np.random.SeedSequence(seed).spawn(shards)
+
+
+def simulate(model: SpinModel, plays: int, workers: int = 1, seed: Optional[int] = None,
+             batch: int = SIM_BATCH) -> Counter:
+    """plays 回プレイした合計配当[単位]ごとの件数"""
+    workers = max(1, int(workers))
+    # 分割数はワーカー数の数倍にして、遅いプロセスに仕事が偏らないようにする
+    shards = max(1, min(plays, workers * 4))
+    sizes = [plays // shards + (1 if i < plays % shards else 0) for i in range(shards)]
+    tasks = [(model.units, model.probs, model.spins, size, batch, s)
+             for size, s in zip(sizes, _shard_seeds(seed, shards))]
+    counts: Counter = Counter()
+    if workers == 1:
+        for hist, _ in map(_simulate_shard, tasks):
+            counts.update(hist)
+        return counts
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for hist, _ in pool.map(_simulate_shard, tasks):
+            counts.update(hist)
+    return counts
+
+
+# ===== 集計 =====
+def wilson_interval(hits: int, n: int, z: float) -> Tuple[float, float]:
+    """二項比率の Wilson スコア区間"""
+    if n <= 0:
+        return 0.0, 1.0
+    p = hits / n
+    denom = 1.0 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1.0 - p) / n + z * z / (4 * n * n)) / denom
+    # 0件・全件のときは端がちょうど 0 / 1 になる（浮動小数の誤差で区間から外れないようにする）
+    low = 0.0 if hits <= 0 else max(0.0, center - half)
+    high = 1.0 if hits >= n else min(1.0, center + half)
+    return low, high
+
+
+def _band(table: PrizeTable, score: float) -> str:
+    result = table.lookup(score)
+    if not result:
+        return NO_PRIZE
+    return f"{result.get('rank') or ''} {result.get('name') or ''}".strip() or NO_PRIZE
+
+
+def band_report(model: SpinModel, table: PrizeTable, counts: Counter,
+                confidence: float = 0.99) -> List[Dict[str, Any]]:
+    """
+    景品ごとの結果
+    [{'band', 'hits', 'observed', 'low', 'high', 'exact', 'within'}]（設定の並び順、景品なしは最後）
+    """
+    n = sum(counts.values())
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+    exact: Dict[str, float] = {}
+    for k, p in zip(model.exact.values, model.exact.pmf):
+        band = _band(table, model.to_score(k))
+        exact[band] = exact.get(band, 0.0) + p
+    hits: Dict[str, int] = {}
+    for k, c in counts.items():
+        band = _band(table, model.to_score(k))
+        hits[band] = hits.get(band, 0) + c
+
+    order = []
+    for p in table.prizes:
+        band = f"{p['result'].get('rank') or ''} {p['result'].get('name') or ''}".strip() or NO_PRIZE
+        if band not in order and band != NO_PRIZE:
+            order.append(band)
+    order.append(NO_PRIZE)
+
+    report = []
+    for band in order:
+        h = hits.get(band, 0)
+        low, high = wilson_interval(h, n, z)
+        p = exact.get(band, 0.0)
+        report.append({
+            'band': band,
+            'hits': h,
+            'observed': h / n if n else 0.0,
+            'low': low,
+            'high': high,
+            'exact': p,
+            'within': low <= p <= high,
+        })
+    return report
+
+
+# ===== 設定の読み込み =====
+def load_store(store_id: int, spins: int) -> Tuple[SpinModel, PrizeTable]:
+    """店舗のスロット設定と景品設定（DB）"""
+    import store_db
+    from .slot_engine import SlotMachine, config_from_dict
+    config, version = store_db.get_slot_config_with_version(store_id)
+    prizes, prize_version = store_db.get_prizes_with_version(store_id)
+    return SpinModel(SlotMachine(config_from_dict(config), version), spins), PrizeTable(prizes, prize_version)
+
+
+def load_global(spins: int) -> Tuple[SpinModel, PrizeTable]:
+    """共通設定（data/config.json と data/settings.json の景品）"""
+    from .config import SETTINGS_PATH
+    from .prize_table import get_file_prize_table
+    from .slot_engine import get_global_engine
+    return SpinModel(get_global_engine(), spins), get_file_prize_table(SETTINGS_PATH)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="スロット設定のモンテカルロ検証")
+    parser.add_argument("--store", type=int, help="店舗ID（省略時は共通設定）")
+    parser.add_argument("--plays", type=int, default=1_000_000, help="プレイ数（既定 100万）")
+    parser.add_argument("--spins", type=int, default=5, help="1プレイの回転数（既定 5）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="プロセス数")
+    parser.add_argument("--seed", type=int, help="乱数シード（指定すると再現可能）")
+    parser.add_argument("--batch", type=int, default=SIM_BATCH, help="1回に配列で抽選するプレイ数")
+    parser.add_argument("--confidence", type=float, default=0.99, help="信頼係数（既定 0.99）")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.store is not None:
+            model, table = load_store(args.store, args.spins)
+            title = f"store_id={args.store}"
+        else:
+            model, table = load_global(args.spins)
+            title = "共通設定"
+    except DistributionTooLarge as e:
+        print(f"⚠️ {e}")
+        return 2
+    if np is None:
+        print("⚠️ NumPy がないため逐次抽選で実行します（大量のプレイには NumPy を入れてください）")
+
+    started = time.perf_counter()
+    counts = simulate(model, args.plays, args.workers, args.seed, args.batch)
+    elapsed = time.perf_counter() - started
+    n = sum(counts.values())
+
+    mean = model.to_score(sum(k * c for k, c in counts.items()) / n) if n else 0.0
+    print(f"{title}: {n:,} プレイ（{n * model.spins:,} 回転）を {elapsed:.1f} 秒で抽選"
+          f"（{args.workers} プロセス, seed={args.seed}）")
+    print(f"平均合計配当: {mean:.4f}（理論値 {model.to_score(model.expected_units()):.4f}）")
+    print(f"景品 / 件数 / 観測 / {args.confidence:.0%}信頼区間 / 理論値")
+
+    report = band_report(model, table, counts, args.confidence)
+    for r in report:
+        mark = "✅" if r['within'] else "⚠️"
+        print(f"{mark} {r['band']}: {r['hits']:,} 件 / {r['observed']:.6%} "
+              f"[{r['low']:.6%}, {r['high']:.6%}] / 理論値 {r['exact']:.6%}")
+
+    outside = [r['band'] for r in report if not r['within']]
+    if outside:
+        print(f"⚠️ 理論値が信頼区間外の景品: {', '.join(outside)}")
+        return 1
+    print("✅ すべての景品の理論値が信頼区間内です")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
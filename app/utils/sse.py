@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Server-Sent Events（SSE）ヘルパー
+
+AI口コミ生成のトークンをブラウザへ逐次送るために使う。
+イベント: token（本文の断片）/ done（完成した本文）/ pending（バックグラウンド生成中）/ error
+"""
+
+import json
+
+from flask import Response, stream_with_context
+
+from .metrics import track_openai
+
+
+def sse_event(event, data) -> str:
+    """SSE の1イベント分の文字列"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events) -> Response:
+    """イベント文字列のイテレータをストリーミングレスポンスにする"""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx 等のバッファリングを無効化
+        },
+    )
+
+
+def iter_completion_text(openai_client, request_kwargs):
+    """chat.completions.create(stream=True) の本文の断片を順に返す（計測は最後の断片まで）"""
+    with track_openai():
+        for chunk in openai_client.chat.completions.create(stream=True, **request_kwargs):
+            if not chunk.choices:
+                continue
+            delta = getattr(chunk.choices[0].delta, "content", None)
+            if delta:
+                yield delta
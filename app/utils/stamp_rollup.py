@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+スタンプ・特典利用の日別集計（"T_スタンプ集計_日別"）
+
+店舗 × 日付ごとに付与回数・付与スタンプ数・削除スタンプ数・特典利用回数を持ち、
+付与（app.utils.stamps）と特典利用（stampcard.use_reward / use_multi_reward）と同じトランザクションで加算する。
+統計画面は履歴テーブルを日付で GROUP BY せず、この表と顧客数を1クエリで読む。
+
+- record_activity(): 当日の集計に加算する（commit は呼び出し側）
+- store_stats(): 統計画面の数値と推移（直近 days 日、TREND_WINDOWS のいずれか）
+- rebuild() / reconcile(): 履歴テーブルから作り直す・突き合わせる
+
+日付は DB の CURRENT_DATE / DATE(created_at) 基準（survey_rollup と同じ）。
+期間の下限は Python 側で日付文字列にして渡すため、INTERVAL 構文に依存しない（SQLite でも動作する）。
+
+使い方:
+  python -m app.utils.stamp_rollup --check              # 不整合があれば終了コード 1
+  python -m app.utils.stamp_rollup --check --fix        # 不整合のある店舗を作り直す
+  python -m app.utils.stamp_rollup --rebuild [--store ID]
+"""
+
+import sys
+from typing import Any, Dict, List, Optional
+
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+
+ROLLUP_TABLE = "T_スタンプ集計_日別"
+TREND_WINDOWS = (7, 30, 90, 365)
+DEFAULT_WINDOW = 30
+
+_COUNT_COLUMNS = ['stamp_grants', 'stamps_added', 'stamps_removed', 'rewards_redeemed']
+_COLUMNS = 'store_id, stat_date, ' + ', '.join(_COUNT_COLUMNS)
+
+
+def _aggregate_sql(where: str) -> str:
+    """履歴テーブルを (store_id, 日付) で集計する SELECT（列順は _COLUMNS と同じ、where は両表に適用）"""
+    return f'''
+        SELECT store_id, stat_date, SUM(grants), SUM(added), SUM(removed), SUM(redeemed)
+        FROM (
+            SELECT store_id, CAST(DATE(created_at) AS TEXT) AS stat_date,
+                   CASE WHEN action_type = 'add' THEN 1 ELSE 0 END AS grants,
+                   CASE WHEN action_type = 'add' THEN stamps_added ELSE 0 END AS added,
+                   CASE WHEN action_type = 'remove' THEN -stamps_added ELSE 0 END AS removed,
+                   0 AS redeemed
+            FROM "T_スタンプ履歴"
+            WHERE {where}
+            UNION ALL
+            SELECT store_id, CAST(DATE(created_at) AS TEXT), 0, 0, 0, 1
+            FROM "T_特典利用履歴"
+            WHERE {where}
+        ) activity
+        GROUP BY store_id, stat_date
+    '''
+
+
+def record_activity(cur, store_id: int, stamp_grants: int = 0, stamps_added: int = 0,
+                    stamps_removed: int = 0, rewards_redeemed: int = 0) -> None:
+    """
+    当日の集計に加算する。
+    履歴の INSERT と同じトランザクション内で呼ぶこと（commit は呼び出し側）。
+    """
+    increments = ',\n            '.join(
+        f'{c} = "{ROLLUP_TABLE}".{c} + excluded.{c}' for c in _COUNT_COLUMNS)
+    execute_query(cur, f'''
+        INSERT INTO "{ROLLUP_TABLE}" ({_COLUMNS})
+        VALUES (?, CAST(CURRENT_DATE AS TEXT), ?, ?, ?, ?)
+        ON CONFLICT (store_id, stat_date) DO UPDATE SET
+            {increments},
+            updated_at = CURRENT_TIMESTAMP
+    ''', (store_id, stamp_grants, stamps_added, stamps_removed, rewards_redeemed))
+
+
+# ===== 読み出し =====
+def window_days(days: Any) -> int:
+    """推移の表示日数（TREND_WINDOWS にない値は既定の30日）"""
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        return DEFAULT_WINDOW
+    return days if days in TREND_WINDOWS else DEFAULT_WINDOW
+
+
+def store_stats(store_id: int, days: int = DEFAULT_WINDOW) -> Dict[str, Any]:
+    """
+    統計画面のデータ（1クエリ）
+    戻り値: {'total_customers', 'active_customers', 'total_stamps', 'total_rewards',
+            'stamp_trend': [(日付, 付与回数)], 'reward_trend': [(日付, 特典利用回数)]}
+    active_customers は直近 days 日にログインした顧客数
+    """
+    days = window_days(days)
+    # 期間の境界も DB の時計で求める（stat_date・last_login と同じ基準）
+    if get_db_type() == 'postgresql':
+        since_date = "CAST(CURRENT_DATE - CAST(? AS INTEGER) AS TEXT)"
+        since_login = "CURRENT_TIMESTAMP - CAST(? AS INTEGER) * INTERVAL '1 day'"
+        bounds = (days - 1, days)
+    else:
+        since_date = "DATE('now', ?)"
+        since_login = "DATETIME('now', ?)"
+        bounds = (f'-{days - 1} days', f'-{days} days')
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        execute_query(cur, f'''
+            SELECT 'day', stat_date, stamp_grants, rewards_redeemed
+            FROM "{ROLLUP_TABLE}"
+            WHERE store_id = ? AND stat_date >= {since_date}
+            UNION ALL
+            SELECT 'total', NULL, COALESCE(SUM(stamps_added), 0), COALESCE(SUM(rewards_redeemed), 0)
+            FROM "{ROLLUP_TABLE}"
+            WHERE store_id = ?
+            UNION ALL
+            SELECT 'customers', NULL, COUNT(*), COALESCE(SUM(CASE WHEN last_login >= {since_login} THEN 1 ELSE 0 END), 0)
+            FROM "T_顧客"
+            WHERE store_id = ?
+        ''', (store_id, bounds[0], store_id, bounds[1], store_id))
+        rows = [tuple(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+    result = {'total_customers': 0, 'active_customers': 0, 'total_stamps': 0, 'total_rewards': 0}
+    daily = []
+    for kind, stat_date, a, b in rows:
+        if kind == 'total':
+            result['total_stamps'], result['total_rewards'] = a, b
+        elif kind == 'customers':
+            result['total_customers'], result['active_customers'] = a, b
+        else:
+            daily.append((stat_date, a, b))
+    daily.sort()
+    result['stamp_trend'] = [(d, grants) for d, grants, _ in daily if grants]
+    result['reward_trend'] = [(d, redeemed) for d, _, redeemed in daily if redeemed]
+    return result
+
+
+# ===== 作り直しと突き合わせ =====
+def _lock_rollup(cur) -> None:
+    """作り直しの間、付与・特典利用側の加算を待たせる（取りこぼし・二重計上を防ぐ）"""
+    if get_db_type() == 'postgresql':
+        cur.execute(f'LOCK TABLE "{ROLLUP_TABLE}" IN SHARE ROW EXCLUSIVE MODE')
+    else:
+        cur.execute('BEGIN IMMEDIATE')
+
+
+def rebuild(store_id: Optional[int] = None) -> int:
+    """
+    履歴テーブルから日別集計を作り直す（store_id 省略時は全店舗）
+    戻り値: 作成した集計行数
+    """
+    where, params = ('store_id = ?', (store_id,)) if store_id is not None else ('1 = 1', ())
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        _lock_rollup(cur)
+        execute_query(cur, f'DELETE FROM "{ROLLUP_TABLE}" WHERE {where}', params)
+        execute_query(cur, f'INSERT INTO "{ROLLUP_TABLE}" ({_COLUMNS}) {_aggregate_sql(where)}', params * 2)
+        count = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return count
+
+
+def reconcile(store_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    履歴テーブルの集計と日別集計を比べ、食い違う行を返す
+    戻り値: [{'store_id', 'stat_date', 'expected': {...}, 'actual': {...} or None}]
+    """
+    where, params = ('store_id = ?', (store_id,)) if store_id is not None else ('1 = 1', ())
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        execute_query(cur, _aggregate_sql(where), params * 2)
+        expected = {(r[0], r[1]): tuple(r[2:]) for r in cur.fetchall()}
+        execute_query(cur, f'SELECT {_COLUMNS} FROM "{ROLLUP_TABLE}" WHERE {where}', params)
+        actual = {(r[0], r[1]): tuple(r[2:]) for r in cur.fetchall()}
+    finally:
+        conn.close()
+
+    zero = (0,) * len(_COUNT_COLUMNS)
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: (k[0], str(k[1]))):
+        want, have = expected.get(key, zero), actual.get(key)
+        if have == want or (have is None and want == zero):
+            continue
+        mismatches.append({
+            'store_id': key[0],
+            'stat_date': key[1],
+            'expected': dict(zip(_COUNT_COLUMNS, want)),
+            'actual': dict(zip(_COUNT_COLUMNS, have)) if have is not None else None,
+        })
+    return mismatches
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    store_id = int(argv[argv.index("--store") + 1]) if "--store" in argv else None
+
+    if "--rebuild" in argv:
+        count = rebuild(store_id)
+        print(f"✅ スタンプの日別集計を作り直しました（{count} 行）")
+        return 0
+
+    if "--check" in argv:
+        mismatches = reconcile(store_id)
+        if not mismatches:
+            print("✅ スタンプの日別集計は履歴テーブルと一致しています")
+            return 0
+        for m in mismatches:
+            print(f"⚠️ store_id={m['store_id']} {m['stat_date']}: 期待値 {m['expected']} / 集計 {m['actual']}")
+        print(f"⚠️ {len(mismatches)} 件の不一致があります")
+        if "--fix" in argv:
+            for sid in sorted({m['store_id'] for m in mismatches}):
+                rebuild(sid)
+            print("✅ 不一致のあった店舗の集計を作り直しました")
+            return 0
+        return 1
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
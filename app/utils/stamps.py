@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+スタンプの付与・取り消し（カードの更新と履歴の記録を1回の原子的な操作で行う）
+
+「本日付与済みか確認 → カード取得 → UPDATE → 履歴 INSERT」と分けて実行すると、
+二度押しや同時リクエストで両方が確認を通過し、スタンプが2個付与されてしまう。
+ここでは T_スタンプ履歴 の UNIQUE (customer_id, store_id, stamp_date) で1日1回を保証し、
+付与できた場合だけカードを加算して、新しいスタンプ数を RETURNING で受け取る。
+
+- PostgreSQL: データ変更 CTE（WITH ... INSERT / UPDATE ... RETURNING）の1文で実行する
+- SQLite: BEGIN IMMEDIATE の中で INSERT ... ON CONFLICT DO NOTHING と UPDATE ... RETURNING を実行する
+- 管理者による手動の追加・削除も同じ方式（カードの更新と履歴を1文で記録し、削除は残数が足りる場合だけ）
+- 同じトランザクションで日別集計（stamp_rollup）にも加算する
+
+stamp_date は QR スキャンによる付与にだけ入れる（手動付与は1日に何回でも可能）。
+日付は DB の CURRENT_DATE を使う（created_at・日別集計・v0009 の埋め戻しと同じ時計）。
+
+マイページの表示データ（load_mypage）は、カード・設定・特典の利用可否を1クエリ、
+スタンプ履歴と特典利用履歴を1クエリで取得し、顧客ごとにキャッシュする。
+付与・取り消しでは自動的に破棄し、特典利用や設定の保存では invalidate_mypage() を呼ぶこと。
+（他ワーカーのキャッシュは TTL で切れる。顧客自身の操作は呼び出し側が revision を変えて即時反映する）
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+from .cache import TTLCache
+from . import stamp_rollup
+
+STAMPCARD_MYPAGE_TTL = float(os.environ.get("STAMPCARD_MYPAGE_TTL", "60"))
+
+# 店舗に設定がない場合の (必要スタンプ数, 特典内容, カード名, 複数特典モード)
+DEFAULT_CARD_SETTINGS = (10, '1品無料', 'スタンプカード', 0)
+
+
+class StampCardNotFound(Exception):
+    """顧客のスタンプカードがない"""
+
+
+class StampAlreadyGranted(Exception):
+    """本日は既にスタンプを付与済み"""
+
+
+class InsufficientStamps(Exception):
+    """削除するスタンプ数が現在のスタンプ数より多い"""
+
+    def __init__(self, current_stamps: int):
+        super().__init__(f'スタンプが足りません（現在: {current_stamps}個）')
+        self.current_stamps = current_stamps
+
+
+_HISTORY_COLUMNS = 'card_id, customer_id, store_id, stamps_added, action_type, note, created_by, created_at'
+
+
+def _current_stamps(cur, customer_id: int, store_id: int) -> Optional[int]:
+    """カードの現在のスタンプ数（カードがなければ None）。失敗理由の判定にだけ使う"""
+    execute_query(cur, '''
+        SELECT current_stamps FROM "T_スタンプカード"
+        WHERE customer_id = ? AND store_id = ?
+    ''', (customer_id, store_id))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _run(statement):
+    """statement(cur, is_pg) を1トランザクションで実行し、その戻り値を返す（例外時はロールバック）"""
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        is_pg = get_db_type() == 'postgresql'
+        if not is_pg:
+            cur.execute('BEGIN IMMEDIATE')
+        result = statement(cur, is_pg)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def grant_daily_stamp(customer_id: int, store_id: int, note: str = 'QRコードスキャン',
+                      created_by: str = 'customer', stamp_date: Optional[str] = None) -> int:
+    """
+    1日1回のスタンプを1個付与する（QR スキャン）
+    戻り値: 付与後のスタンプ数
+    本日付与済みなら StampAlreadyGranted、カードがなければ StampCardNotFound を送出する
+    stamp_date を省略すると DB の現在日付（CURRENT_DATE）になる
+    """
+    params = (note, created_by, stamp_date, customer_id, store_id)
+    insert = f'''
+        INSERT INTO "T_スタンプ履歴" ({_HISTORY_COLUMNS}, stamp_date)
+        SELECT id, customer_id, store_id, 1, 'add', ?, ?, CURRENT_TIMESTAMP, COALESCE(?, CAST(CURRENT_DATE AS TEXT))
+        FROM "T_スタンプカード"
+        WHERE customer_id = ? AND store_id = ?
+        ON CONFLICT (customer_id, store_id, stamp_date) DO NOTHING
+    '''
+
+    def statement(cur, is_pg):
+        if is_pg:
+            execute_query(cur, f'''
+                WITH granted AS ({insert} RETURNING card_id)
+                UPDATE "T_スタンプカード" AS c
+                SET current_stamps = c.current_stamps + 1,
+                    total_stamps = c.total_stamps + 1,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM granted
+                WHERE c.id = granted.card_id
+                RETURNING c.current_stamps
+            ''', params)
+            row = cur.fetchone()
+        else:
+            execute_query(cur, insert, params)
+            row = None
+            if cur.rowcount == 1:
+                execute_query(cur, '''
+                    UPDATE "T_スタンプカード"
+                    SET current_stamps = current_stamps + 1,
+                        total_stamps = total_stamps + 1,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE customer_id = ? AND store_id = ?
+                    RETURNING current_stamps
+                ''', (customer_id, store_id))
+                row = cur.fetchone()
+        if row is None:
+            if _current_stamps(cur, customer_id, store_id) is None:
+                raise StampCardNotFound('スタンプカードが見つかりません')
+            raise StampAlreadyGranted('本日は既にスタンプを取得しています')
+        stamp_rollup.record_activity(cur, store_id, stamp_grants=1, stamps_added=1)
+        return row[0]
+
+    current_stamps = _run(statement)
+    invalidate_mypage(store_id, customer_id)
+    return current_stamps
+
+
+def adjust_stamps(customer_id: int, store_id: int, delta: int, note: str = '',
+                  created_by: str = 'admin') -> int:
+    """
+    スタンプを delta 個増減する（管理者の手動操作）
+    増やす場合は累計（total_stamps）も加算し、減らす場合は残数が足りるときだけ減らす
+    戻り値: 変更後のスタンプ数
+    カードがなければ StampCardNotFound、残数が足りなければ InsufficientStamps を送出する
+    """
+    delta = int(delta)
+    action_type = 'add' if delta >= 0 else 'remove'
+    total_delta = max(delta, 0)
+    update = '''
+        UPDATE "T_スタンプカード"
+        SET current_stamps = current_stamps + ?,
+            total_stamps = total_stamps + ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE customer_id = ? AND store_id = ? AND current_stamps + ? >= 0
+        RETURNING id, current_stamps
+    '''
+    update_params = (delta, total_delta, customer_id, store_id, delta)
+
+    def statement(cur, is_pg):
+        if is_pg:
+            execute_query(cur, f'''
+                WITH changed AS ({update}),
+                logged AS (
+                    INSERT INTO "T_スタンプ履歴" ({_HISTORY_COLUMNS})
+                    SELECT id, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP FROM changed
+                )
+                SELECT id, current_stamps FROM changed
+            ''', update_params + (customer_id, store_id, delta, action_type, note, created_by))
+            row = cur.fetchone()
+        else:
+            execute_query(cur, update, update_params)
+            row = cur.fetchone()
+            if row is not None:
+                execute_query(cur, f'''
+                    INSERT INTO "T_スタンプ履歴" ({_HISTORY_COLUMNS})
+                    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (row[0], customer_id, store_id, delta, action_type, note, created_by))
+        if row is None:
+            current = _current_stamps(cur, customer_id, store_id)
+            if current is None:
+                raise StampCardNotFound('スタンプカードが見つかりません')
+            raise InsufficientStamps(current)
+        if delta >= 0:
+            stamp_rollup.record_activity(cur, store_id, stamp_grants=1, stamps_added=delta)
+        else:
+            stamp_rollup.record_activity(cur, store_id, stamps_removed=-delta)
+        return row[1]
+
+    current_stamps = _run(statement)
+    invalidate_mypage(store_id, customer_id)
+    return current_stamps
+
+
+# ===== マイページの表示データ =====
+_mypage_cache = TTLCache("stampcard_mypage", ttl=STAMPCARD_MYPAGE_TTL, maxsize=4096)
+
+# カード・店舗設定・有効な特典を1行ずつ結合し、初回のみの特典が利用済みかを反結合で求める
+_MYPAGE_SQL = '''
+    SELECT c.id, c.current_stamps, c.total_stamps, c.rewards_used, c.created_at,
+           s.id, s.required_stamps, s.reward_description, s.card_title, s.use_multi_rewards,
+           r.id, r.required_stamps, r.reward_description, r.is_repeatable,
+           CASE WHEN used.reward_id IS NULL THEN 0 ELSE 1 END
+    FROM "T_スタンプカード" c
+    LEFT JOIN "T_店舗_スタンプカード設定" s ON s.store_id = c.store_id
+    LEFT JOIN "T_特典設定" r ON r.store_id = c.store_id AND r.enabled = 1
+    LEFT JOIN (
+        SELECT DISTINCT reward_id FROM "T_特典利用履歴"
+        WHERE customer_id = ? AND store_id = ? AND reward_id IS NOT NULL
+    ) used ON used.reward_id = r.id
+    WHERE c.customer_id = ? AND c.store_id = ?
+    ORDER BY r.required_stamps, r.id
+'''
+
+# スタンプ履歴（最新10件）と特典利用履歴（最新5件）をまとめて取得
+_HISTORY_SQL = '''
+    SELECT * FROM (
+        SELECT 'stamp' AS kind, stamps_added, action_type, note, created_at
+        FROM "T_スタンプ履歴"
+        WHERE customer_id = ? AND store_id = ?
+        ORDER BY created_at DESC
+        LIMIT 10
+    ) stamp_history
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'reward' AS kind, stamps_used, NULL, reward_description, created_at
+        FROM "T_特典利用履歴"
+        WHERE customer_id = ? AND store_id = ?
+        ORDER BY created_at DESC
+        LIMIT 5
+    ) reward_history
+'''
+
+
+def _create_card(cur, customer_id: int, store_id: int) -> None:
+    execute_query(cur, '''
+        INSERT INTO "T_スタンプカード" (customer_id, store_id, current_stamps, total_stamps, rewards_used,
+                                      created_at, updated_at)
+        VALUES (?, ?, 0, 0, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT (customer_id, store_id) DO NOTHING
+    ''', (customer_id, store_id))
+
+
+def _load_mypage(customer_id: int, store_id: int) -> Dict[str, Any]:
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        params = (customer_id, store_id, customer_id, store_id)
+        execute_query(cur, _MYPAGE_SQL, params)
+        rows = [tuple(r) for r in cur.fetchall()]
+        if not rows:
+            # スタンプカードがない場合は作成する
+            _create_card(cur, customer_id, store_id)
+            conn.commit()
+            execute_query(cur, _MYPAGE_SQL, params)
+            rows = [tuple(r) for r in cur.fetchall()]
+        execute_query(cur, _HISTORY_SQL, params)
+        history_rows = [tuple(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+    first = rows[0]
+    settings = first[6:10] if first[5] is not None else DEFAULT_CARD_SETTINGS
+    required_stamps, reward_description, card_title, use_multi_rewards = settings
+    use_multi_rewards = use_multi_rewards or 0
+    current_stamps = first[1] or 0
+
+    rewards_list = []
+    if use_multi_rewards:
+        for r in rows:
+            reward_id, req_stamps, desc, is_repeatable, used = r[10:15]
+            if reward_id is None:
+                continue
+            achieved = current_stamps >= req_stamps
+            rewards_list.append({
+                'id': reward_id,
+                'required_stamps': req_stamps,
+                'description': desc,
+                'is_repeatable': is_repeatable,
+                # 繰り返し可能なら常に、初回のみなら未利用の場合だけ利用可能
+                'can_use': achieved and (bool(is_repeatable) or not used),
+                'achieved': achieved,
+            })
+
+    card = {
+        'id': first[0],
+        'current_stamps': current_stamps,
+        'total_stamps': first[2],
+        'rewards_used': first[3],
+        'created_at': first[4],
+        'required_stamps': required_stamps,
+        'reward_description': reward_description,
+        'card_title': card_title,
+        'can_use_reward': current_stamps >= required_stamps if not use_multi_rewards else False,
+        'use_multi_rewards': use_multi_rewards,
+        'rewards_list': rewards_list,
+    }
+    history = sorted((r[1:] for r in history_rows if r[0] == 'stamp'), key=lambda h: h[3], reverse=True)
+    reward_history = sorted(((r[1], r[3], r[4]) for r in history_rows if r[0] == 'reward'),
+                            key=lambda h: h[2], reverse=True)
+    return {'card': card, 'history': history, 'reward_history': reward_history}
+
+
+def load_mypage(customer_id: int, store_id: int, revision: Any = None) -> Dict[str, Any]:
+    """
+    マイページの表示データ {'card', 'history', 'reward_history'}
+    card: スタンプカードと設定、rewards_list（特典ごとの achieved / can_use）
+    history: (stamps_added, action_type, note, created_at) の最新10件
+    reward_history: (stamps_used, reward_description, created_at) の最新5件
+    revision: 顧客自身の操作ごとに変わる値（セッションに保持）。変わると他ワーカーのキャッシュも使わない
+    """
+    key = (store_id, customer_id, revision)
+    return _mypage_cache.get_or_load(key, lambda: _load_mypage(customer_id, store_id))
+
+
+def invalidate_mypage(store_id: int, customer_id: Optional[int] = None) -> None:
+    """マイページのキャッシュを破棄（customer_id 省略時は店舗の全顧客）"""
+    if customer_id is None:
+        _mypage_cache.invalidate_where(lambda k, v: k[0] == store_id)
+    else:
+        _mypage_cache.invalidate_where(lambda k, v: k[0] == store_id and k[1] == customer_id)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+アンケート回答のエクスポート（CSV / JSONL をストリーミングで出力）
+
+"T_アンケート回答" をサーバーサイドカーソルで少しずつ読み、1行ずつ整形して返す。
+件数が増えてもメモリ使用量は一定（EXPORT_BATCH 行分）に保たれる。
+
+- PostgreSQL: 名前付きカーソル（itersize = EXPORT_BATCH）で取得する
+- SQLite: カーソルを fetchmany で読み進める（行は逐次読み出される）
+- response_json の動的な質問（q1, q2, ...）は店舗のアンケート設定に合わせて列に展開する
+  設定にない項目は「その他の回答」列に JSON でまとめる
+
+環境変数:
+  SURVEY_EXPORT_BATCH   1回に読み込む行数（既定 500）
+"""
+
+import csv
+import json
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+
+EXPORT_BATCH = int(os.environ.get("SURVEY_EXPORT_BATCH", "500"))
+
+# response_json のうち質問の回答として扱わないキー
+_RESERVED_KEYS = {'rating', 'generated_review'}
+
+
+class _LineBuffer:
+    """csv.writer の出力をそのまま返す（writerow の戻り値が1行分の文字列になる）"""
+
+    def write(self, value):
+        return value
+
+
+def question_columns(store_ids: Sequence[int]) -> List[Dict[str, str]]:
+    """
+    エクスポートする質問列 [{'key': 'q1', 'label': ...}]
+    1店舗なら質問文を見出しにし、複数店舗なら最も多い質問数に合わせて q1, q2, ... とする
+    """
+    import store_db
+    configs = [store_db.get_survey_config(sid) for sid in store_ids]
+    count = max((len(c.get('questions') or []) for c in configs), default=0)
+    columns = []
+    for i in range(count):
+        key = f"q{i + 1}"
+        label = key
+        if len(configs) == 1:
+            text = configs[0]['questions'][i].get('text', '')
+            label = f"Q{i + 1} {text}".strip()
+        columns.append({'key': key, 'label': label})
+    return columns
+
+
+def _day_bounds(since: Optional[str], until: Optional[str]):
+    """'YYYY-MM-DD' の期間を created_at の半開区間 [start, end) にする"""
+    start = f"{since} 00:00:00" if since else None
+    end = None
+    if until:
+        end = (datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
+    return start, end
+
+
+def _flatten(answer: Any) -> Any:
+    if isinstance(answer, list):
+        return '、'.join(str(a) for a in answer)
+    if isinstance(answer, dict):
+        return json.dumps(answer, ensure_ascii=False)
+    return answer
+
+
+def iter_response_rows(store_ids: Sequence[int], since: Optional[str] = None,
+                       until: Optional[str] = None, batch: int = EXPORT_BATCH) -> Iterator[tuple]:
+    """
+    (id, store_id, created_at, rating, generated_review, response_json) を古い順に返す
+    store_ids の各店舗について (store_id, created_at) のインデックスで範囲を読む
+    """
+    start, end = _day_bounds(since, until)
+    where, params = [f"store_id IN ({', '.join('?' for _ in store_ids)})"], list(store_ids)
+    if start:
+        where.append('created_at >= ?')
+        params.append(start)
+    if end:
+        where.append('created_at < ?')
+        params.append(end)
+    sql = f'''
+        SELECT id, store_id, created_at, rating, generated_review, response_json
+        FROM "T_アンケート回答"
+        WHERE {' AND '.join(where)}
+        ORDER BY store_id, created_at, id
+    '''
+
+    conn = get_db_connection()
+    try:
+        if get_db_type() == 'postgresql':
+            # 名前付きカーソル = サーバーサイドカーソル（itersize 行ずつ取り寄せる）
+            cur = conn.cursor(name=f"survey_export_{secrets.token_hex(4)}")
+            cur.itersize = batch
+        else:
+            cur = get_cursor(conn)
+        execute_query(cur, sql, params)
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+        cur.close()
+    finally:
+        conn.close()
+
+
+def _records(rows: Iterable[tuple], columns: List[Dict[str, str]]) -> Iterator[Dict[str, Any]]:
+    keys = [c['key'] for c in columns]
+    known = set(keys) | _RESERVED_KEYS
+    for response_id, store_id, created_at, rating, generated_review, response_json in rows:
+        try:
+            data = json.loads(response_json) if response_json else {}
+        except (TypeError, ValueError):
+            data = {}
+        yield {
+            'id': response_id,
+            'store_id': store_id,
+            'created_at': str(created_at) if created_at is not None else '',
+            'rating': rating,
+            'answers': {k: data.get(k) for k in keys},
+            'extra': {k: v for k, v in data.items() if k not in known},
+            'generated_review': generated_review or data.get('generated_review') or '',
+        }
+
+
+def iter_csv(rows: Iterable[tuple], columns: List[Dict[str, str]], batch: int = EXPORT_BATCH) -> Iterator[str]:
+    """CSV（Excel で開けるよう先頭に BOM を付ける）を batch 行ずつの文字列で返す"""
+    writer = csv.writer(_LineBuffer())
+    header = ['ID', '店舗ID', '回答日時', '評価'] + [c['label'] for c in columns] + ['その他の回答', 'AI生成口コミ']
+    yield '\ufeff' + writer.writerow(header)
+    chunk = []
+    for rec in _records(rows, columns):
+        chunk.append(writer.writerow(
+            [rec['id'], rec['store_id'], rec['created_at'], rec['rating']]
+            + [_flatten(rec['answers'][c['key']]) if rec['answers'][c['key']] is not None else ''
+               for c in columns]
+            + [json.dumps(rec['extra'], ensure_ascii=False) if rec['extra'] else '', rec['generated_review']]
+        ))
+        if len(chunk) >= batch:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_jsonl(rows: Iterable[tuple], columns: List[Dict[str, str]], batch: int = EXPORT_BATCH) -> Iterator[str]:
+    """1行1オブジェクトの JSON Lines を batch 行ずつの文字列で返す（回答は q1, q2, ... のキーで展開）"""
+    chunk = []
+    for rec in _records(rows, columns):
+        obj = {'id': rec['id'], 'store_id': rec['store_id'], 'created_at': rec['created_at'],
+               'rating': rec['rating']}
+        obj.update(rec['answers'])
+        if rec['extra']:
+            obj['extra'] = rec['extra']
+        obj['generated_review'] = rec['generated_review']
+        chunk.append(json.dumps(obj, ensure_ascii=False) + '\n')
+        if len(chunk) >= batch:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
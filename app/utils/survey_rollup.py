@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+アンケート統計の日別集計（"T_アンケート集計_日別"）
+
+店舗 × 日付ごとに回答数・評価の合計・評価別件数（1〜5）を持ち、
+回答の保存と同じトランザクションで加算する（store_db.save_survey_response）。
+統計画面は回答を数え直さず、この表を日数分だけ合計して答える。
+
+- record_response(): 保存した回答1件を集計に加算する（commit は呼び出し側）
+- store_summary() / daily_stats(): 集計から店舗の統計を返す
+- rebuild(): 回答テーブルから集計を作り直す（初回投入・不整合の修正）
+- reconcile(): 回答テーブルと集計を突き合わせ、食い違う (店舗, 日付) を返す
+
+日付は回答の created_at の日付（DB の DATE() と同じ基準）。
+
+使い方:
+  python -m app.utils.survey_rollup --check              # 不整合があれば終了コード 1
+  python -m app.utils.survey_rollup --check --fix        # 不整合のある店舗を作り直す
+  python -m app.utils.survey_rollup --rebuild [--store ID]
+"""
+
+import sys
+from typing import Any, Dict, List, Optional
+
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+
+ROLLUP_TABLE = "T_アンケート集計_日別"
+RATINGS = (1, 2, 3, 4, 5)
+
+_DAY_EXPR = 'CAST(DATE(created_at) AS TEXT)'
+_COUNT_COLUMNS = ['response_count', 'rating_sum'] + [f'rating_{i}' for i in RATINGS]
+_COLUMNS = 'store_id, stat_date, ' + ', '.join(_COUNT_COLUMNS)
+
+
+def _aggregate_sql(where: str) -> str:
+    """回答テーブルを (store_id, 日付) で集計する SELECT（列順は _COLUMNS と同じ）"""
+    histogram = ', '.join(f'SUM(CASE WHEN rating = {i} THEN 1 ELSE 0 END)' for i in RATINGS)
+    return f'''
+        SELECT store_id, {_DAY_EXPR}, COUNT(*), COALESCE(SUM(rating), 0), {histogram}
+        FROM "T_アンケート回答"
+        WHERE {where}
+        GROUP BY store_id, {_DAY_EXPR}
+    '''
+
+
+def record_response(cur, response_id: int) -> None:
+    """
+    保存した回答1件を日別集計に加算する。
+    回答の INSERT と同じトランザクション内で呼ぶこと（commit は呼び出し側）。
+    """
+    increments = ',\n            '.join(
+        f'{c} = "{ROLLUP_TABLE}".{c} + excluded.{c}' for c in _COUNT_COLUMNS)
+    execute_query(cur, f'''
+        INSERT INTO "{ROLLUP_TABLE}" ({_COLUMNS})
+        {_aggregate_sql('id = ?')}
+        ON CONFLICT (store_id, stat_date) DO UPDATE SET
+            {increments},
+            updated_at = CURRENT_TIMESTAMP
+    ''', (response_id,))
+
+
+# ===== 読み出し =====
+def _range_filter(store_id: int, since: Optional[str], until: Optional[str]):
+    where, params = 'store_id = ?', [store_id]
+    if since:
+        where += ' AND stat_date >= ?'
+        params.append(since)
+    if until:
+        where += ' AND stat_date <= ?'
+        params.append(until)
+    return where, params
+
+
+def store_summary(store_id: int, since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+    """
+    店舗の統計（since / until は 'YYYY-MM-DD'、両端を含む）
+    戻り値: {'total', 'rating_distribution': {1..5: 件数}, 'rating_sum', 'average_rating'}
+    """
+    where, params = _range_filter(store_id, since, until)
+    sums = ', '.join(f'COALESCE(SUM({c}), 0)' for c in _COUNT_COLUMNS)
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        execute_query(cur, f'SELECT {sums} FROM "{ROLLUP_TABLE}" WHERE {where}', params)
+        row = tuple(cur.fetchone())
+    finally:
+        conn.close()
+    total, rating_sum = row[0], row[1]
+    return {
+        'total': total,
+        'rating_distribution': dict(zip(RATINGS, row[2:])),
+        'rating_sum': rating_sum,
+        'average_rating': round(rating_sum / total, 2) if total else 0.0,
+    }
+
+
+def daily_stats(store_id: int, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+    """日付順の日別統計 [{'date', 'total', 'rating_distribution', 'average_rating'}]"""
+    where, params = _range_filter(store_id, since, until)
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        execute_query(cur, f'''
+            SELECT stat_date, {', '.join(_COUNT_COLUMNS)}
+            FROM "{ROLLUP_TABLE}"
+            WHERE {where}
+            ORDER BY stat_date
+        ''', params)
+        rows = [tuple(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+    return [{
+        'date': r[0],
+        'total': r[1],
+        'rating_distribution': dict(zip(RATINGS, r[3:])),
+        'average_rating': round(r[2] / r[1], 2) if r[1] else 0.0,
+    } for r in rows]
+
+
+# ===== 作り直しと突き合わせ =====
+def _lock_rollup(cur) -> None:
+    """作り直しの間、回答保存側の加算を待たせる（取りこぼし・二重計上を防ぐ）"""
+    if get_db_type() == 'postgresql':
+        cur.execute(f'LOCK TABLE "{ROLLUP_TABLE}" IN SHARE ROW EXCLUSIVE MODE')
+    else:
+        cur.execute('BEGIN IMMEDIATE')
+
+
+def rebuild(store_id: Optional[int] = None) -> int:
+    """
+    回答テーブルから日別集計を作り直す（store_id 省略時は全店舗）
+    戻り値: 作成した集計行数
+    """
+    where, params = ('store_id = ?', (store_id,)) if store_id is not None else ('1 = 1', ())
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        _lock_rollup(cur)
+        execute_query(cur, f'DELETE FROM "{ROLLUP_TABLE}" WHERE {where}', params)
+        execute_query(cur, f'INSERT INTO "{ROLLUP_TABLE}" ({_COLUMNS}) {_aggregate_sql(where)}', params)
+        count = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return count
+
+
+def reconcile(store_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    回答テーブルの集計と日別集計を比べ、食い違う行を返す
+    戻り値: [{'store_id', 'stat_date', 'expected': {...}, 'actual': {...} or None}]
+    """
+    where, params = ('store_id = ?', (store_id,)) if store_id is not None else ('1 = 1', ())
+    conn = get_db_connection()
+    try:
+        cur = get_cursor(conn)
+        execute_query(cur, _aggregate_sql(where), params)
+        expected = {(r[0], r[1]): tuple(r[2:]) for r in cur.fetchall()}
+        execute_query(cur, f'SELECT {_COLUMNS} FROM "{ROLLUP_TABLE}" WHERE {where}', params)
+        actual = {(r[0], r[1]): tuple(r[2:]) for r in cur.fetchall()}
+    finally:
+        conn.close()
+
+    zero = (0,) * len(_COUNT_COLUMNS)
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: (k[0], str(k[1]))):
+        want, have = expected.get(key, zero), actual.get(key)
+        if have == want or (have is None and want == zero):
+            continue
+        mismatches.append({
+            'store_id': key[0],
+            'stat_date': key[1],
+            'expected': dict(zip(_COUNT_COLUMNS, want)),
+            'actual': dict(zip(_COUNT_COLUMNS, have)) if have is not None else None,
+        })
+    return mismatches
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    store_id = int(argv[argv.index("--store") + 1]) if "--store" in argv else None
+
+    if "--rebuild" in argv:
+        count = rebuild(store_id)
+        print(f"✅ 日別集計を作り直しました（{count} 行）")
+        return 0
+
+    if "--check" in argv:
+        mismatches = reconcile(store_id)
+        if not mismatches:
+            print("✅ 日別集計は回答テーブルと一致しています")
+            return 0
+        for m in mismatches:
+            print(f"⚠️ store_id={m['store_id']} {m['stat_date']}: 期待値 {m['expected']} / 集計 {m['actual']}")
+        print(f"⚠️ {len(mismatches)} 件の不一致があります")
+        if "--fix" in argv:
+            for sid in sorted({m['store_id'] for m in mismatches}):
+                rebuild(sid)
+            print("✅ 不一致のあった店舗の集計を作り直しました")
+            return 0
+        return 1
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
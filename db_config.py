@@ -33,26 +33,29 @@ def get_db_connection():
     """データベース接続を取得（SQLiteまたはPostgreSQL）"""
     if DB_TYPE == 'postgresql':
         try:
-            import psycopg2
-            import psycopg2.extras
-            conn = psycopg2.connect(DATABASE_URL)
-            # DictCursorを使用してカラム名でアクセス可能にする
+            from app.utils import db_pool
+            # ワーカー共有のコネクションプールから取得（リクエスト中は close() 済みの接続を再利用）
+            conn = db_pool.connect(DATABASE_URL)
             return conn
         except ImportError:
             print("⚠️ psycopg2がインストールされていません。pip install psycopg2-binary を実行してください。")
             raise
+        except db_pool.PoolTimeout:
+            raise
         except Exception as e:
             print(f"⚠️ PostgreSQL接続エラー: {e}")
             print("⚠️ SQLiteにフォールバック: database/login_auth.db")
             # フォールバック: SQLiteを使用
+            from app.utils.metrics import instrumented_sqlite_connect
             os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-            conn = sqlite3.connect(DB_PATH)
+            conn = instrumented_sqlite_connect(DB_PATH)
             conn.row_factory = sqlite3.Row
             return conn
     else:
-        # SQLite
+        # SQLite（クエリ数と時間を計測する接続）
+        from app.utils.metrics import instrumented_sqlite_connect
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
+        conn = instrumented_sqlite_connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         return conn
 
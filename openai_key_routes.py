@@ -1,5 +1,6 @@
 from flask import Blueprint, request, redirect, url_for, flash, session
 from store_db import get_db_connection
+from app.utils.openai_clients import invalidate_openai_keys
 
 openai_key_bp = Blueprint('openai_key', __name__)
 
@@ -69,6 +70,7 @@ def save_openai_key():
             """, (store_id, openai_api_key if openai_api_key else None))
         
         conn.commit()
+        invalidate_openai_keys(store_id)
         print("Database commit successful")
         
         # 保存後の確認
@@ -4,38 +4,90 @@
 店舗ごとの設定を管理するデータベースヘルパー
 SQLiteとPostgreSQLの両方に対応
 """
+import os
 import json
-from typing import Optional, Dict, Any, List
-from db_config import get_db_connection, get_cursor, execute_query
+from typing import Optional, Dict, Any, List, Tuple
+from db_config import get_db_connection, get_cursor, execute_query, get_db_type
+from app.utils.cache import TTLCache
+from app.utils import slot_engine
+from app.utils import survey_rollup
+from app.utils import prize_table
 
 # ===== 店舗情報取得 =====
-def get_store_by_slug(slug: str) -> Optional[Dict[str, Any]]:
-    """
- slugから店舗情報を取得"""
+# slug → 店舗メタデータ（id, tenant_id, name, slug, active）のワーカー内キャッシュ。
+# 店舗の作成・編集・削除時は invalidate_store() を呼ぶこと（他ワーカーは TTL で反映）。
+STORE_CACHE_TTL = float(os.environ.get("STORE_CACHE_TTL", "60"))
+STORE_CACHE_MISS_TTL = float(os.environ.get("STORE_CACHE_MISS_TTL", "5"))
+_store_cache = TTLCache("store_by_slug", ttl=STORE_CACHE_TTL, maxsize=4096)
+_NOT_CACHED = object()
+
+
+def _row_to_store(row) -> Dict[str, Any]:
+    # SQLite Rowオブジェクトを辞書に変換
+    if hasattr(row, 'keys'):
+        return {key: row[key] for key in row.keys()}
+    # タプルの場合（フォールバック）
+    return {
+        'id': row[0],
+        'tenant_id': row[1],
+        'name': row[2],
+        'slug': row[3],
+        'active': row[4]
+    }
+
+
+def _load_store_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    # slug はテナント内でだけ一意なので、同じ slug の店舗が複数あれば有効な店舗を優先する
+    # （他テナントの無効な店舗が有効な店舗を隠さないように）
     conn = get_db_connection()
     cur = get_cursor(conn)
     execute_query(cur, """
         SELECT id, tenant_id, 名称 as name, slug, 有効 as active
         FROM "T_店舗"
-        WHERE slug = ? AND 有効 = 1
+        WHERE slug = ?
+        ORDER BY CASE WHEN 有効 = 1 THEN 0 ELSE 1 END, id
+        LIMIT 1
     """, (slug,))
     row = cur.fetchone()
     conn.close()
-    
-    if row:
-        # SQLite Rowオブジェクトを辞書に変換
-        if hasattr(row, 'keys'):
-            return {key: row[key] for key in row.keys()}
-        else:
-            # タプルの場合（フォールバック）
-            return {
-                'id': row[0],
-                'tenant_id': row[1],
-                'name': row[2],
-                'slug': row[3],
-                'active': row[4]
-            }
+    return _row_to_store(row) if row else None
+
+
+def resolve_store(slug: str) -> Optional[Dict[str, Any]]:
+    """
+    slugから店舗情報を取得（有効な店舗を優先し、なければ無効な店舗も返す・キャッシュ経由）
+    戻り値の辞書は呼び出し側で変更してよい（コピーを返す）
+    """
+    if not slug:
+        return None
+    store = _store_cache.get(slug, _NOT_CACHED)
+    if store is _NOT_CACHED:
+        store = _load_store_by_slug(slug)
+        _store_cache.set(slug, store, None if store else STORE_CACHE_MISS_TTL)
+    return dict(store) if store else None
+
+
+def get_store_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    """slugから有効な店舗情報を取得（キャッシュ経由）"""
+    store = resolve_store(slug)
+    if store and store.get('active') == 1:
+        return store
     return None
+
+
+def invalidate_store(store_id: Optional[int] = None, slug: Optional[str] = None) -> None:
+    """店舗キャッシュを破棄（store_id 指定時は旧slugのエントリも含めて削除）"""
+    if slug:
+        _store_cache.invalidate(slug)
+    if store_id is not None:
+        _store_cache.invalidate_where(lambda k, v: v is not None and v.get('id') == store_id)
+
+
+def store_cache_stats() -> Dict[str, Any]:
+    """店舗キャッシュのヒット率など"""
+    return _store_cache.stats()
+
+
 def get_store_by_id(store_id: int) -> Optional[Dict[str, Any]]:
     """IDから店舗情報を取得"""
     conn = get_db_connection()
@@ -47,21 +99,7 @@ def get_store_by_id(store_id: int) -> Optional[Dict[str, Any]]:
     """, (store_id,))
     row = cur.fetchone()
     conn.close()
-    
-    if row:
-        # SQLite Rowオブジェクトを辞書に変換
-        if hasattr(row, 'keys'):
-            return {key: row[key] for key in row.keys()}
-        else:
-            # タプルの場合（フォールバック）
-            return {
-                'id': row[0],
-                'tenant_id': row[1],
-                'name': row[2],
-                'slug': row[3],
-                'active': row[4]
-            }
-    return None
+    return _row_to_store(row) if row else None
 
 # ===== アンケート設定 =====
 def get_survey_config(store_id: int) -> Dict[str, Any]:
@@ -161,10 +199,15 @@ def save_ai_review_settings(store_id: int, business_type: str, ai_instruction: s
 # ===== スロット設定 =====
 def get_slot_config(store_id: int) -> Dict[str, Any]:
     """店舗のスロット設定を取得"""
+    return get_slot_config_with_version(store_id)[0]
+
+
+def get_slot_config_with_version(store_id: int) -> Tuple[Dict[str, Any], Any]:
+    """店舗のスロット設定と、そのバージョン（updated_at、未保存なら None）を取得"""
     conn = get_db_connection()
     cur = get_cursor(conn)
     execute_query(cur, """
-        SELECT config_json
+        SELECT config_json, updated_at
         FROM "T_店舗_スロット設定"
         WHERE store_id = ?
     """, (store_id,))
@@ -172,9 +215,14 @@ def get_slot_config(store_id: int) -> Dict[str, Any]:
     conn.close()
     
     if row and row['config_json']:
-        return json.loads(row['config_json'])
+        return json.loads(row['config_json']), row['updated_at']
     
     # デフォルト設定
+    return _default_slot_config(), None
+
+
+def _default_slot_config() -> Dict[str, Any]:
+    """デフォルトのスロット設定"""
     return {
         "symbols": [
             {"id": "seven", "label": "7", "payout_3": 100, "color": "#ff0000", "prob": 0.0},
@@ -203,6 +251,7 @@ def save_slot_config(store_id: int, config: Dict[str, Any]) -> None:
     """, (store_id, json.dumps(config, ensure_ascii=False)))
     conn.commit()
     conn.close()
+    slot_engine.invalidate_store_engine(store_id)
 
 # ===== 景品設定 =====
 def get_prizes_config(store_id: int) -> List[Dict[str, Any]]:
@@ -229,6 +278,25 @@ def get_prizes_config(store_id: int) -> List[Dict[str, Any]]:
         {"min_score": 0, "max_score": 99, "rank": "🎊 参加賞", "name": "参加賞"}
     ]
 
+def get_prizes_with_version(store_id: int) -> Tuple[List[Dict[str, Any]], Any]:
+    """店舗の景品設定と、そのバージョン（updated_at、未保存なら None）を取得（未保存なら景品なし）"""
+    conn = get_db_connection()
+    cur = get_cursor(conn)
+    execute_query(cur, """
+        SELECT prizes_json, updated_at
+        FROM "T_店舗_景品設定"
+        WHERE store_id = ?
+    """, (store_id,))
+    row = cur.fetchone()
+    conn.close()
+    
+    if row and row['prizes_json']:
+        try:
+            return json.loads(row['prizes_json']), row['updated_at']
+        except ValueError:
+            print(f"⚠️ store_id={store_id} の景品設定が JSON として読めません")
+    return [], None
+
 def save_prizes_config(store_id: int, prizes: List[Dict[str, Any]]) -> None:
     """店舗の景品設定を保存"""
     conn = get_db_connection()
@@ -242,6 +310,7 @@ def save_prizes_config(store_id: int, prizes: List[Dict[str, Any]]) -> None:
     """, (store_id, json.dumps(prizes, ensure_ascii=False)))
     conn.commit()
     conn.close()
+    prize_table.invalidate_store_prizes(store_id)
 
 # ===== Google口コミ設定 =====
 def get_google_review_url(store_id: int) -> str:
@@ -281,12 +350,14 @@ def save_survey_response(store_id: int, response_data: Dict[str, Any]) -> int:
     cur = get_cursor(conn)
     
     # 動的な質問に対応：response_jsonのみを保存
+    # PostgreSQL では lastrowid が使えないため RETURNING で採番されたIDを受け取る
+    returning = " RETURNING id" if get_db_type() == 'postgresql' else ""
     execute_query(cur, """
         INSERT INTO "T_アンケート回答" (
             store_id, rating, visit_purpose, atmosphere, 
             recommend, comment, generated_review, response_json
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    """ + returning, (
         store_id,
         response_data.get('rating', 3),  # デフォルト値を設定
         response_data.get('visit_purpose', 'その他'),
@@ -297,48 +368,20 @@ def save_survey_response(store_id: int, response_data: Dict[str, Any]) -> int:
         json.dumps(response_data, ensure_ascii=False)
     ))
     
-    response_id = cur.lastrowid
+    response_id = cur.fetchone()[0] if returning else cur.lastrowid
+    # 日別集計も同じトランザクションで加算する（統計画面は集計だけを読む）
+    survey_rollup.record_response(cur, response_id)
     conn.commit()
     conn.close()
     
     return response_id
 
 # ===== 統計データ取得 =====
-def get_survey_stats(store_id: int) -> Dict[str, Any]:
-    """店舗のアンケート統計を取得"""
-    conn = get_db_connection()
-    cur = get_cursor(conn)
-    
-    # 総回答数
-    execute_query(cur, """
-        SELECT COUNT(*) as total
-        FROM "T_アンケート回答"
-        WHERE store_id = ?
-    """, (store_id,))
-    total = cur.fetchone()['total']
-    
-    # 評価分布
-    execute_query(cur, """
-        SELECT rating, COUNT(*) as count
-        FROM "T_アンケート回答"
-        WHERE store_id = ?
-        GROUP BY rating
-        ORDER BY rating DESC
-    """, (store_id,))
-    rating_dist = {row['rating']: row['count'] for row in cur.fetchall()}
-    
-    # 平均評価
-    execute_query(cur, """
-        SELECT AVG(rating) as avg_rating
-        FROM "T_アンケート回答"
-        WHERE store_id = ?
-    """, (store_id,))
-    avg_rating = cur.fetchone()['avg_rating'] or 0.0
-    
-    conn.close()
-    
+def get_survey_stats(store_id: int, since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+    """店舗のアンケート統計を取得（日別集計を合計する。since / until は 'YYYY-MM-DD'）"""
+    summary = survey_rollup.store_summary(store_id, since, until)
     return {
-        'total': total,
-        'rating_distribution': rating_dist,
-        'average_rating': round(avg_rating, 2)
+        'total': summary['total'],
+        'rating_distribution': summary['rating_distribution'],
+        'average_rating': summary['average_rating']
     }
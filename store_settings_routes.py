@@ -5,6 +5,7 @@
 from flask import render_template, request, redirect, url_for, flash, session
 from app.utils import require_roles, ROLES, get_db_connection
 from app.utils.db import _sql
+from app.utils import prize_table
 import json
 
 
@@ -140,6 +141,7 @@ def register_store_settings_routes(app):
         
         conn.commit()
         conn.close()
+        prize_table.invalidate_store_prizes(store_id)
         
         flash('景品を追加しました', 'success')
         return redirect(url_for('store_settings_prizes', store_id=store_id))
@@ -171,6 +173,7 @@ def register_store_settings_routes(app):
                 '''), (prizes_json, store_id))
                 
                 conn.commit()
+                prize_table.invalidate_store_prizes(store_id)
                 flash('景品を削除しました', 'success')
             except:
                 flash('景品の削除に失敗しました', 'error')
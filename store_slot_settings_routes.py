@@ -5,6 +5,8 @@
 from flask import request, redirect, url_for, flash, render_template, jsonify, session
 from app.utils import require_roles, ROLES, get_db_connection
 from app.utils.db import _sql
+from app.utils import slot_engine, prize_table
+from app.utils.payout_dist import DistributionTooLarge, get_store_distribution, prize_odds
 import json
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Any
@@ -77,63 +79,6 @@ def _solve_probs_for_target_expectation(payouts: List[float], target_e1: float)
     Z = sum(ws)
     return [w / Z for w in ws]
 
-def _decimal_scale(values: List[float]) -> int:
-    max_dec = 0
-    for v in values:
-        s = f"{Decimal(v):f}"
-        if "." in s:
-            d = len(s.split(".")[1].rstrip("0"))
-            if d > max_dec:
-                max_dec = d
-    return 10 ** max_dec
-
-def _prob_total_ge(symbols: List[Symbol], spins: int, threshold: float) -> float:
-    vs = [float(s.payout_3) for s in symbols]
-    ps = [float(s.prob) / 100.0 for s in symbols]
-    if not vs or not ps:
-        return 0.0
-    S = sum(ps) or 1.0
-    ps = [p / S for p in ps]
-    scale = _decimal_scale(vs + [threshold])
-    ivs = [int(round(v * scale)) for v in vs]
-    thr = int(round(threshold * scale))
-    max_sum = spins * max(ivs)
-    pmf = [0.0] * (max_sum + 1)
-    pmf[0] = 1.0
-    for _ in range(spins):
-        nxt = [0.0] * (max_sum + 1)
-        for ssum, pcur in enumerate(pmf):
-            if pcur == 0.0:
-                continue
-            for vi, pi in zip(ivs, ps):
-                nxt[ssum + vi] += pcur * pi
-        pmf = nxt
-    return float(sum(pmf[thr:]))
-
-def _prob_total_le(symbols: List[Symbol], spins: int, threshold: float) -> float:
-    """spins 回の合計配当が threshold 以下となる確率"""
-    vs = [float(s.payout_3) for s in symbols]
-    ps = [float(s.prob) / 100.0 for s in symbols]
-    if not vs or not ps:
-        return 0.0
-    S = sum(ps) or 1.0
-    ps = [p / S for p in ps]
-    scale = _decimal_scale(vs + [threshold])
-    ivs = [int(round(v * scale)) for v in vs]
-    thr = int(round(threshold * scale))
-    max_sum = spins * max(ivs)
-    pmf = [0.0] * (max_sum + 1)
-    pmf[0] = 1.0
-    for _ in range(spins):
-        nxt = [0.0] * (max_sum + 1)
-        for ssum, pcur in enumerate(pmf):
-            if pcur == 0.0:
-                continue
-            for vi, pi in zip(ivs, ps):
-                nxt[ssum + vi] += pcur * pi
-        pmf = nxt
-    return float(sum(pmf[:thr + 1]))
-
 def _default_config() -> Config:
     """デフォルトのスロット設定"""
     defaults = [
@@ -422,6 +367,7 @@ def register_store_slot_settings_routes(app):
             
             conn.commit()
             conn.close()
+            prize_table.invalidate_store_prizes(store_id)
             print(f"[DEBUG] admin_save_prizes: 保存成功 store_id={store_id}")
             
             return jsonify({"ok": True})
@@ -513,6 +459,7 @@ def register_store_slot_settings_routes(app):
             
             conn.commit()
             conn.close()
+            slot_engine.invalidate_store_engine(store_id)
             
             flash('スロット設定を保存しました', 'success')
             return redirect(url_for('store_slot_settings', store_id=store_id))
@@ -627,32 +574,9 @@ def register_store_slot_settings_routes(app):
             spins = int(body.get("spins", 5))
             spins = max(1, spins)
             
-            # データベースから設定を取得
-            cfg_dict = store_db.get_slot_config(store_id)
-            symbols = [Symbol(**s) for s in cfg_dict["symbols"]]
-            miss_probability = cfg_dict.get("miss_probability", 0.0)
-            
-            # ハズレ確率を考慮するため、ハズレ（0点）をシンボルリストに追加
-            symbols_with_miss = list(symbols)
-            
-            # ハズレシンボルを追加
-            miss_symbol = Symbol(
-                id="miss",
-                label="ハズレ",
-                payout_3=0.0,
-                prob=miss_probability,
-                color="#000000"
-            )
-            symbols_with_miss.append(miss_symbol)
-            
-            # 確率を正規化（ハズレ確率 + シンボル確率の合計 = 100%）
-            psum = sum(float(s.prob) for s in symbols_with_miss)
-            for s in symbols_with_miss:
-                s.prob = float(s.prob) * 100.0 / psum
-            
-            prob_ge = _prob_total_ge(symbols_with_miss, spins, tmin)
-            prob_le = 1.0 if tmax is None else _prob_total_le(symbols_with_miss, spins, tmax)
-            prob_range = max(0.0, prob_le - (1.0 - prob_ge))
+            # 店舗のスロット設定による分布（設定ハッシュごとにキャッシュ）
+            dist = get_store_distribution(store_id, spins)
+            prob_ge, prob_le, prob_range = dist.prob_range(tmin, tmax)
             
             return jsonify({
                 "ok": True,
@@ -661,8 +585,11 @@ def register_store_slot_settings_routes(app):
                 "prob_range": prob_range,
                 "tmin": tmin,
                 "tmax": tmax,
-                "spins": spins
+                "spins": spins,
+                "prizes": prize_odds(dist, store_db.get_prizes_config(store_id))
             })
             
+        except DistributionTooLarge as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
         except Exception as e:
             return jsonify({"ok": False, "error": str(e)}), 500
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+予約の同時実行ストレステスト
+
+1つの時間帯に多数の予約を並列に送り、テーブル数を超えて確定予約が入らないことを確認する。
+DATABASE_URL が未設定なら一時ファイルの SQLite、設定されていればその PostgreSQL に対して実行する
+（PostgreSQL ではテスト用の店舗 ID の行を作成し、終了時に削除する）。
+
+使い方:
+  python stress_reservations.py                          # 300件を32スレッドで送信
+  python stress_reservations.py --bookings 1000 --threads 64 --tables 3
+
+終了コード: 0 = 超過なし / 1 = 超過あり
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db_config
+from app.migrations import run_migrations
+from app.utils.booking import book_reservation, BookingUnavailable
+
+STRESS_STORE_ID = 990001
+SLOT_DATE = '2099-01-01'
+SLOT_TIME = '19:00'
+
+
+def _setup(table_count):
+    conn = db_config.get_db_connection()
+    cur = db_config.get_cursor(conn)
+    _cleanup(cur)
+    db_config.execute_query(cur, '''
+        INSERT INTO "T_テーブル設定" (store_id, テーブル名, 座席数, テーブル数, 有効)
+        VALUES (?, ?, ?, ?, 1)
+    ''', (STRESS_STORE_ID, '4人席', 4, table_count))
+    conn.commit()
+    conn.close()
+
+
+def _cleanup(cur):
+    db_config.execute_query(cur, 'DELETE FROM "T_予約" WHERE store_id = ?', (STRESS_STORE_ID,))
+    db_config.execute_query(cur, 'DELETE FROM "T_テーブル設定" WHERE store_id = ?', (STRESS_STORE_ID,))
+
+
+def _confirmed_count():
+    conn = db_config.get_db_connection()
+    cur = db_config.get_cursor(conn)
+    db_config.execute_query(cur, '''
+        SELECT COUNT(*) FROM "T_予約"
+        WHERE store_id = ? AND 予約日 = ? AND 予約時刻 = ? AND ステータス = 'confirmed'
+    ''', (STRESS_STORE_ID, SLOT_DATE, SLOT_TIME))
+    count = cur.fetchone()[0]
+    conn.close()
+    return count
+
+
+def run(bookings, threads, tables):
+    _setup(tables)
+    results = {'ok': 0, 'full': 0, 'error': 0}
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def one(i):
+        start.wait()
+        try:
+            book_reservation(STRESS_STORE_ID, SLOT_DATE, SLOT_TIME, 2, {
+                'name': f'ストレス{i}', 'phone': '090-0000-0000',
+            })
+            key = 'ok'
+        except BookingUnavailable:
+            key = 'full'
+        except Exception as e:
+            print(f"⚠️ 予約 {i} がエラーになりました: {e}")
+            key = 'error'
+        with lock:
+            results[key] += 1
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(one, i) for i in range(bookings)]
+        start.set()
+        for f in futures:
+            f.result()
+
+    confirmed = _confirmed_count()
+    print(f"送信 {bookings} 件 / 成功 {results['ok']} / 満席 {results['full']} / エラー {results['error']}")
+    print(f"テーブル数 {tables} / 確定予約 {confirmed}")
+    return confirmed, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='予約の同時実行ストレステスト')
+    parser.add_argument('--bookings', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--tables', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tmp_path = None
+    if db_config.get_db_type() == 'sqlite':
+        fd, tmp_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        db_config.DB_PATH = tmp_path
+        conn = sqlite3.connect(tmp_path)
+        run_migrations(conn)
+        conn.close()
+
+    try:
+        confirmed, results = run(args.bookings, args.threads, args.tables)
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+        else:
+            conn = db_config.get_db_connection()
+            _cleanup(db_config.get_cursor(conn))
+            conn.commit()
+            conn.close()
+
+    if confirmed > args.tables:
+        print("❌ テーブル数を超えて予約が確定しました")
+        return 1
+    if results['error'] or results['ok'] != confirmed:
+        print("❌ エラーになった予約、または成功数と確定予約数の不一致があります")
+        return 1
+    print("✅ 超過予約はありません")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+口コミ生成ジョブの動作確認
+
+OpenAI の代わりに FakeOpenAIClient を review_jobs.set_generator() で差し込み、
+バックグラウンド実行・再試行・SSE 取得の各経路を確認する。
+
+- 最初の数回だけ失敗するクライアントで、再試行の末に done になる
+- 失敗し続けるクライアントで、REVIEW_JOB_MAX_ATTEMPTS 回試行したら failed になる
+- 多数のスレッドから同時に claim_review_job() しても取得できるのは1つだけ
+- 配信途中で切断された（release された）ジョブはバックグラウンドで生成し直される
+- running のまま止まったジョブはポーリング時に拾い直される
+
+DATABASE_URL が未設定なら一時ファイルの SQLite、設定されていればその PostgreSQL に対して実行する
+（PostgreSQL ではテスト用の店舗 ID のジョブを作成し、終了時に削除する）。
+
+使い方:
+  python stress_review_jobs.py
+  python stress_review_jobs.py --threads 64 --max-attempts 4
+
+終了コード: 0 = すべて期待どおり / 1 = 期待と異なる結果あり
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db_config
+from app.migrations import run_migrations
+from app.utils import review_jobs
+from app.utils.fake_openai import FakeOpenAIClient, FAKE_REVIEW_TEXT
+
+STRESS_STORE_ID = 990003
+SURVEY_DATA = {'rating': 5, 'comment': '動作確認'}
+
+
+def _cleanup(cur):
+    db_config.execute_query(cur, 'DELETE FROM "T_口コミ生成ジョブ" WHERE store_id = ?', (STRESS_STORE_ID,))
+
+
+def _wait(job_id, timeout):
+    """done / failed になるまでポーリングする（get_review_job が再実行も拾う）"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = review_jobs.get_review_job(job_id)
+        if job and job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    return review_jobs.get_review_job(job_id)
+
+
+def check_retry_success(max_attempts):
+    client = FakeOpenAIClient(fail_times=max_attempts - 1)
+    review_jobs.set_generator(client=client)
+    job = _wait(review_jobs.enqueue_review_job(STRESS_STORE_ID, SURVEY_DATA), 30)
+    ok = job['status'] == 'done' and job['attempts'] == max_attempts and job['result_text'] == FAKE_REVIEW_TEXT
+    return ok, f"{max_attempts - 1}回失敗後に成功: status={job['status']} attempts={job['attempts']}"
+
+
+def check_retry_exhausted(max_attempts):
+    client = FakeOpenAIClient(fail_times=max_attempts + 5)
+    review_jobs.set_generator(client=client)
+    job = _wait(review_jobs.enqueue_review_job(STRESS_STORE_ID, SURVEY_DATA), 30)
+    ok = (job['status'] == 'failed' and job['attempts'] == max_attempts
+          and job['result_text'] == review_jobs.FAILED_REVIEW_TEXT and len(client.calls) == max_attempts)
+    return ok, (f"失敗し続ける: status={job['status']} attempts={job['attempts']} "
+                f"呼び出し {len(client.calls)}回")
+
+
+def check_concurrent_claim(threads):
+    review_jobs.set_generator(client=FakeOpenAIClient())
+    # defer の間はバックグラウンドで実行されず、SSE 接続だけが取得できる
+    job_id = review_jobs.enqueue_review_job(STRESS_STORE_ID, SURVEY_DATA, defer=60)
+    start = threading.Event()
+
+    def one():
+        start.wait()
+        return review_jobs.claim_review_job(job_id)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(one) for _ in range(threads)]
+        start.set()
+        winners = [job for job in (f.result() for f in futures) if job is not None]
+    if len(winners) == 1:
+        text = "".join(review_jobs.stream_review_job(winners[0]))
+        job = review_jobs.get_review_job(job_id)
+        ok = job['status'] == 'done' and text == FAKE_REVIEW_TEXT
+    else:
+        job, ok = review_jobs.get_review_job(job_id), False
+    return ok, f"{threads}スレッドで同時に取得: 取得 {len(winners)}件 / status={job['status']}"
+
+
+def check_stream_release():
+    review_jobs.set_generator(client=FakeOpenAIClient())
+    job_id = review_jobs.enqueue_review_job(STRESS_STORE_ID, SURVEY_DATA, defer=60)
+    stream = review_jobs.stream_review_job(review_jobs.claim_review_job(job_id))
+    next(stream)
+    stream.close()  # ブラウザの切断
+    job = _wait(job_id, 30)
+    ok = job['status'] == 'done' and job['attempts'] == 1
+    return ok, f"配信途中で切断: status={job['status']} attempts={job['attempts']}"
+
+
+def check_stale_requeue():
+    review_jobs.set_generator(client=FakeOpenAIClient())
+    job_id = review_jobs.enqueue_review_job(STRESS_STORE_ID, SURVEY_DATA, defer=1)
+    review_jobs.claim_review_job(job_id)  # 取得したまま止まったワーカー
+    stale_seconds = review_jobs.REVIEW_JOB_STALE_SECONDS
+    review_jobs.REVIEW_JOB_STALE_SECONDS = 0
+    try:
+        job = _wait(job_id, 30)
+    finally:
+        review_jobs.REVIEW_JOB_STALE_SECONDS = stale_seconds
+    ok = job['status'] == 'done' and job['attempts'] == 2
+    return ok, f"running のまま停止: status={job['status']} attempts={job['attempts']}"
+
+
+def run(threads, max_attempts):
+    review_jobs.REVIEW_JOB_MAX_ATTEMPTS = max_attempts
+    review_jobs.REVIEW_JOB_BACKOFF = 0.05
+    checks = [
+        lambda: check_retry_success(max_attempts),
+        lambda: check_retry_exhausted(max_attempts),
+        lambda: check_concurrent_claim(threads),
+        check_stream_release,
+        check_stale_requeue,
+    ]
+    failures = 0
+    try:
+        for check in checks:
+            ok, message = check()
+            print(f"{'✅' if ok else '❌'} {message}")
+            failures += not ok
+    finally:
+        review_jobs.set_generator()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='口コミ生成ジョブの動作確認')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tmp_path = None
+    if db_config.get_db_type() == 'sqlite':
+        fd, tmp_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        db_config.DB_PATH = tmp_path
+        conn = sqlite3.connect(tmp_path)
+        run_migrations(conn)
+        conn.close()
+
+    try:
+        failures = run(args.threads, max(1, args.max_attempts))
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+        else:
+            conn = db_config.get_db_connection()
+            _cleanup(db_config.get_cursor(conn))
+            conn.commit()
+            conn.close()
+
+    if failures:
+        print("❌ 期待と異なる結果があります")
+        return 1
+    print("✅ すべて期待どおりです")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
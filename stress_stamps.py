@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+スタンプ付与の同時実行ストレステスト
+
+複数の顧客について、同じ日の QR スキャンを多数のスレッドから同時に送り、
+各顧客にスタンプがちょうど1個だけ付与される（カードの数と履歴が一致する）ことを確認する。
+DATABASE_URL が未設定なら一時ファイルの SQLite、設定されていればその PostgreSQL に対して実行する
+（PostgreSQL ではテスト用の店舗 ID の行を作成し、終了時に削除する）。
+
+使い方:
+  python stress_stamps.py                          # 20人 × 各15回を32スレッドで送信
+  python stress_stamps.py --customers 50 --taps 40 --threads 64
+
+終了コード: 0 = 全員ちょうど1回 / 1 = 二重付与・付与漏れあり
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db_config
+from app.migrations import run_migrations
+from app.utils.stamps import grant_daily_stamp, StampAlreadyGranted
+
+STRESS_STORE_ID = 990002
+STAMP_DATE = '2099-01-01'
+
+
+def _setup(customers):
+    conn = db_config.get_db_connection()
+    cur = db_config.get_cursor(conn)
+    _cleanup(cur)
+    ids = []
+    for i in range(customers):
+        db_config.execute_query(cur, '''
+            INSERT INTO "T_顧客" (store_id, phone, name, created_at, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ''', (STRESS_STORE_ID, f'090-9999-{i:04d}', f'ストレス{i}'))
+        db_config.execute_query(cur, 'SELECT id FROM "T_顧客" WHERE store_id = ? AND phone = ?',
+                                (STRESS_STORE_ID, f'090-9999-{i:04d}'))
+        customer_id = cur.fetchone()[0]
+        db_config.execute_query(cur, '''
+            INSERT INTO "T_スタンプカード" (customer_id, store_id, current_stamps, total_stamps, rewards_used,
+                                          created_at, updated_at)
+            VALUES (?, ?, 0, 0, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ''', (customer_id, STRESS_STORE_ID))
+        ids.append(customer_id)
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def _cleanup(cur):
+    for table in ("T_スタンプ履歴", "T_スタンプカード", "T_顧客"):
+        db_config.execute_query(cur, f'DELETE FROM "{table}" WHERE store_id = ?', (STRESS_STORE_ID,))
+
+
+def _results():
+    """顧客ID → (カードのスタンプ数, 当日の付与履歴数)"""
+    conn = db_config.get_db_connection()
+    cur = db_config.get_cursor(conn)
+    db_config.execute_query(cur, '''
+        SELECT c.customer_id, c.current_stamps,
+               (SELECT COUNT(*) FROM "T_スタンプ履歴" h
+                WHERE h.customer_id = c.customer_id AND h.store_id = c.store_id AND h.stamp_date = ?)
+        FROM "T_スタンプカード" c
+        WHERE c.store_id = ?
+    ''', (STAMP_DATE, STRESS_STORE_ID))
+    rows = {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+    conn.close()
+    return rows
+
+
+def run(customers, taps, threads):
+    ids = _setup(customers)
+    results = {'ok': 0, 'duplicate': 0, 'error': 0}
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def one(customer_id):
+        start.wait()
+        try:
+            grant_daily_stamp(customer_id, STRESS_STORE_ID, stamp_date=STAMP_DATE)
+            key = 'ok'
+        except StampAlreadyGranted:
+            key = 'duplicate'
+        except Exception as e:
+            print(f"⚠️ customer_id={customer_id} の付与がエラーになりました: {e}")
+            key = 'error'
+        with lock:
+            results[key] += 1
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(one, cid) for _ in range(taps) for cid in ids]
+        start.set()
+        for f in futures:
+            f.result()
+
+    rows = _results()
+    print(f"送信 {customers * taps} 件 / 付与 {results['ok']} / 付与済み {results['duplicate']} / "
+          f"エラー {results['error']}")
+    return rows, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='スタンプ付与の同時実行ストレステスト')
+    parser.add_argument('--customers', type=int, default=20)
+    parser.add_argument('--taps', type=int, default=15)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    tmp_path = None
+    if db_config.get_db_type() == 'sqlite':
+        fd, tmp_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        db_config.DB_PATH = tmp_path
+        conn = sqlite3.connect(tmp_path)
+        run_migrations(conn)
+        conn.close()
+
+    try:
+        rows, results = run(args.customers, args.taps, args.threads)
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+        else:
+            conn = db_config.get_db_connection()
+            _cleanup(db_config.get_cursor(conn))
+            conn.commit()
+            conn.close()
+
+    wrong = {cid: v for cid, v in rows.items() if v != (1, 1)}
+    for cid, (card, history) in sorted(wrong.items()):
+        print(f"❌ customer_id={cid}: カード {card}個 / 付与履歴 {history}件")
+    if wrong or results['error'] or results['ok'] != args.customers:
+        print("❌ 二重付与・付与漏れ、またはエラーがあります")
+        return 1
+    print("✅ 全員にちょうど1回だけ付与されました")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())